@@ -0,0 +1,239 @@
+# ALERT RULES — Data-driven alert rule engine
+#
+# Alert thresholds are declared as data (see DEFAULT_RULES) and compiled
+# once into a list of CompiledRule objects. Each rule watches one reading
+# metric:
+#
+#   {"name": " Heatwave Alert",   # alert text stored on the station
+#    "metric": "temp_c",          # reading field
+#    "comparator": ">",           # >, >=, <, <=
+#    "threshold": 40,
+#    "window": 1,                 # rolling mean over the last N readings
+#    "hysteresis": 0}             # distance back past the threshold
+#                                 # needed before the alert clears
+#
+# Evaluating a new reading costs O(1) per rule: each rule keeps a rolling
+# window (a deque plus a running sum) and an active flag.
+#
+# That state lives on the station document, not in the process, so every
+# worker sees the same windows and alerts:
+#   alerts        — a rule is active when its alert is in the array
+#   rule_windows  — [{"rule": name, "values": [...]}] for rules with window > 1
+#   rule_seq      — bumped by every write of either
+# apply_reading(s) loads them, runs the readings and writes the new alerts
+# and windows in one update guarded by rule_seq. If another write got there
+# first, the state is reloaded and the readings re-run.
+
+from globals import weather_collection, settings
+from collections import deque
+from conditional import touch
+import alerts_index
+import operator
+import json
+
+DEFAULT_RULES = [
+    {"name": " Heatwave Alert", "metric": "temp_c", "comparator": ">", "threshold": 40,
+     "window": 1, "hysteresis": 0},
+    {"name": " Frost Warning", "metric": "temp_c", "comparator": "<", "threshold": 0,
+     "window": 1, "hysteresis": 0},
+    {"name": " Storm Warning", "metric": "wind_kmh", "comparator": ">", "threshold": 100,
+     "window": 1, "hysteresis": 0},
+]
+
+# Station-level fields that stand in for a reading metric
+STATION_FIELDS = {"temp_c": "avg_temp_c", "wind_kmh": "max_wind_kmh"}
+
+COMPARATORS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+
+# Internal station fields, left out of API responses
+HIDDEN_FIELDS = {"rule_windows": 0, "rule_seq": 0}
+
+# Guarded writes tried before the last write wins
+MAX_ATTEMPTS = 5
+
+
+class CompiledRule:
+    __slots__ = ("name", "metric", "raise_when", "clear_when", "window")
+
+    def __init__(self, spec):
+        comparator = spec["comparator"]
+        if comparator not in COMPARATORS:
+            raise ValueError(f"Unknown comparator {comparator!r} in rule {spec.get('name')!r}")
+        threshold = float(spec["threshold"])
+        hysteresis = float(spec.get("hysteresis", 0))
+        # The clear threshold sits on the safe side of the raise threshold
+        clear_threshold = threshold - hysteresis if comparator.startswith(">") else threshold + hysteresis
+        raise_op = COMPARATORS[comparator]
+
+        self.name = spec["name"]
+        self.metric = spec["metric"]
+        self.window = max(int(spec.get("window", 1)), 1)
+        self.raise_when = lambda value: raise_op(value, threshold)
+        self.clear_when = lambda value: not raise_op(value, clear_threshold)
+
+
+class _WindowState:
+    __slots__ = ("values", "total", "active")
+
+    def __init__(self, active, values=()):
+        self.values = deque(values)
+        self.total = float(sum(self.values))
+        self.active = active
+
+
+class RuleEngine:
+    def __init__(self, rules=DEFAULT_RULES):
+        self.rules = [CompiledRule(spec) for spec in rules]
+
+    # Rule state of a station from its stored alerts and rule_windows.
+    def load_state(self, current_alerts=(), stored_windows=None):
+        windows = {entry["rule"]: entry["values"] for entry in stored_windows or []}
+        return [_WindowState(rule.name in current_alerts, windows.get(rule.name, ())[-rule.window:])
+                for rule in self.rules]
+
+    # The rule_windows value to store for `state` (rules with window > 1).
+    def dump_windows(self, state):
+        return [{"rule": rule.name, "values": list(window.values)}
+                for rule, window in zip(self.rules, state) if rule.window > 1 and window.values]
+
+    # Feeds one reading through every rule, updating `state` (see
+    # load_state), and returns (raised, cleared) alert names.
+    def evaluate(self, state, reading):
+        raised, cleared = [], []
+        for rule, window in zip(self.rules, state):
+            value = reading.get(rule.metric)
+            if value is None:
+                continue
+            window.values.append(value)
+            window.total += value
+            if len(window.values) > rule.window:
+                window.total -= window.values.popleft()
+            mean = window.total / len(window.values)
+
+            if not window.active and rule.raise_when(mean):
+                window.active = True
+                raised.append(rule.name)
+            elif window.active and rule.clear_when(mean):
+                window.active = False
+                cleared.append(rule.name)
+        return raised, cleared
+
+    # Stateless check of station-level values such as avg_temp_c.
+    def evaluate_snapshot(self, values):
+        return [rule.name for rule in self.rules
+                if values.get(rule.metric) is not None and rule.raise_when(values[rule.metric])]
+
+    def rule_names(self):
+        return [rule.name for rule in self.rules]
+
+
+def load_rules(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+# Station-level values mapped onto rule metrics
+def station_values(doc):
+    return {metric: float(doc[field]) for metric, field in STATION_FIELDS.items()
+            if doc.get(field) is not None}
+
+
+# Alerts of a station after its station-level values changed: alerts not
+# owned by a rule are kept, rule alerts are re-evaluated.
+def snapshot_alerts(current_alerts, values):
+    rule_engine = get_engine()
+    owned = set(rule_engine.rule_names())
+    kept = [alert for alert in current_alerts if alert not in owned]
+    return kept + rule_engine.evaluate_snapshot(values)
+
+
+def _state_pipeline(raised, cleared, windows):
+    fields = {
+        "rule_seq": {"$add": [{"$ifNull": ["$rule_seq", 0]}, 1]},
+        "rule_windows": {"$literal": windows},
+    }
+    if raised or cleared:
+        # Replaces `cleared` and adds `raised`; only alert changes touch
+        # the station's version
+        changed = list(raised) + list(cleared)
+        fields.update(touch()["$set"])
+        fields["version"] = {"$add": [{"$ifNull": ["$version", 0]}, 1]}
+        fields["alerts"] = {"$concatArrays": [
+            {"$filter": {
+                "input": {"$ifNull": ["$alerts", []]},
+                "as": "alert",
+                "cond": {"$not": {"$in": ["$$alert", changed]}}
+            }},
+            list(raised)
+        ]}
+    return [{"$set": fields}]
+
+
+# Runs a batch of one station's readings (in time order) through the rules,
+# starting from the state stored on the station, and stores the new alerts
+# and windows in one update. Returns the net (raised, cleared) alerts.
+def apply_readings(station_oid, readings):
+    engine = get_engine()
+    for attempt in range(MAX_ATTEMPTS):
+        doc = weather_collection.find_one(
+            {"_id": station_oid}, {"alerts": 1, "alert": 1, "rule_windows": 1, "rule_seq": 1}
+        )
+        if doc is None:
+            return [], []
+        state = engine.load_state(alerts_index.station_alerts(doc), doc.get("rule_windows"))
+        stored_windows = engine.dump_windows(state)
+
+        raised, cleared = [], []
+        for reading in readings:
+            up, down = engine.evaluate(state, reading)
+            for name in up:
+                if name in cleared:
+                    cleared.remove(name)
+                else:
+                    raised.append(name)
+            for name in down:
+                if name in raised:
+                    raised.remove(name)
+                else:
+                    cleared.append(name)
+
+        windows = engine.dump_windows(state)
+        if not (raised or cleared) and windows == stored_windows:
+            return raised, cleared
+
+        # Only if no other write changed the station since it was read;
+        # the last attempt is applied regardless
+        guard = {"_id": station_oid}
+        if attempt < MAX_ATTEMPTS - 1:
+            guard["rule_seq"] = doc.get("rule_seq", {"$exists": False})
+        result = weather_collection.update_one(guard, _state_pipeline(raised, cleared, windows))
+        if result.matched_count:
+            break
+
+    if raised or cleared:
+        alerts_index.sync_station_by_id(station_oid)
+    return raised, cleared
+
+
+# Runs a new reading through the rules and stores any change.
+# Returns (raised, cleared).
+def apply_reading(station_oid, reading):
+    return apply_readings(station_oid, [reading])
+
+
+# Replaces the engine, e.g. with rules from another file (see app.create_app).
+# Without a path the current ALERT_RULES_PATH setting is used.
+def configure(rules_path=None):
+    global engine
+    if rules_path is None:
+        rules_path = settings["ALERT_RULES_PATH"]
+    engine = RuleEngine(load_rules(rules_path) if rules_path else DEFAULT_RULES)
+    return engine
+
+
+# The engine is built on first use, after the app's settings are applied.
+def get_engine():
+    return engine if engine is not None else configure()
+
+
+engine = None
@@ -0,0 +1,136 @@
+# ALERTS INDEX — Materialized view of active station alerts
+#
+# /weather/alerts used to scan the weather collection for documents with
+# alerts and count alert types in Python on every request. Instead, the
+# routes that change a station keep two small collections up to date:
+#
+#   alerts          — one document per station that currently has alerts:
+#                     {"_id": station_id, station_name, city, state, region,
+#                      place, country, "loc": {...}, "loc_ngrams": [...],
+#                      "alerts": [...]}
+#   alert_counters  — precomputed counts per alert type, overall and per
+#                     normalized region:
+#                     {"scope": "type" | "region", "region": str | None,
+#                      "alert_type": str, "count": int}
+#
+# The summary of an unfiltered or region-filtered request is therefore read
+# from alert_counters in O(alert types).
+
+from pymongo import UpdateOne, ReturnDocument
+from globals import weather_collection, alerts_collection, alert_counters
+import locations
+import datetime
+
+DISPLAY_FIELDS = ["station_name", "city", "state", "region", "place", "country"]
+
+
+# HELPER FUNCTION: station_alerts()
+# Alerts of a station document (older records used an `alert` field).
+
+def station_alerts(doc):
+    return list(doc.get("alerts") or doc.get("alert") or [])
+
+
+def _counter_ops(entry, step):
+    ops = []
+    region = entry.get("loc", {}).get("region", "")
+    for alert_type in entry.get("alerts", []):
+        for scope, key in (("type", None), ("region", region)):
+            ops.append(UpdateOne(
+                {"scope": scope, "region": key, "alert_type": alert_type},
+                {"$inc": {"count": step}},
+                upsert=True
+            ))
+    return ops
+
+
+# Brings the alerts entry and counters of one station in line with the
+# station document (call after every create/update of a station).
+def sync_station(doc):
+    alerts = station_alerts(doc)
+
+    if alerts:
+        entry = {field: doc.get(field) for field in DISPLAY_FIELDS}
+        # Both location keys, so contains filters work here as on weather
+        keys = doc if doc.get("loc") and "loc_ngrams" in doc else locations.location_keys(doc)
+        entry["loc"] = keys["loc"]
+        entry["loc_ngrams"] = keys["loc_ngrams"]
+        entry["alerts"] = alerts
+        entry["updated_at"] = datetime.datetime.utcnow()
+        previous = alerts_collection.find_one_and_replace(
+            {"_id": doc["_id"]}, entry, upsert=True,
+            return_document=ReturnDocument.BEFORE
+        )
+    else:
+        entry = None
+        previous = alerts_collection.find_one_and_delete({"_id": doc["_id"]})
+
+    ops = []
+    if previous:
+        ops += _counter_ops(previous, -1)
+    if entry:
+        ops += _counter_ops(entry, 1)
+    if ops:
+        alert_counters.bulk_write(ops, ordered=False)
+        alert_counters.delete_many({"count": {"$lte": 0}})
+
+
+def sync_station_by_id(station_oid):
+    projection = dict.fromkeys(DISPLAY_FIELDS + ["loc", "loc_ngrams", "alerts", "alert"], 1)
+    doc = weather_collection.find_one({"_id": station_oid}, projection)
+    if doc is None:
+        remove_station(station_oid)
+    else:
+        sync_station(doc)
+
+
+def remove_station(station_oid):
+    previous = alerts_collection.find_one_and_delete({"_id": station_oid})
+    if previous:
+        alert_counters.bulk_write(_counter_ops(previous, -1), ordered=False)
+        alert_counters.delete_many({"count": {"$lte": 0}})
+
+
+# Alert counts per type, overall or for the regions matching region_clause
+# (a query clause on the normalized region key, see locations.match_filter).
+def summary_from_counters(region_clause=None):
+    query = {"scope": "type"}
+    if region_clause is not None:
+        query = {"scope": "region", "region": region_clause}
+    summary = {}
+    for counter in alert_counters.find(query, {"alert_type": 1, "count": 1}):
+        summary[counter["alert_type"]] = summary.get(counter["alert_type"], 0) + counter["count"]
+    return summary
+
+
+# Alert counts per type for arbitrary filters, over the (small) alerts collection.
+def summary_for(query):
+    pipeline = [
+        {"$match": query},
+        {"$unwind": "$alerts"},
+        {"$group": {"_id": "$alerts", "count": {"$sum": 1}}}
+    ]
+    return {row["_id"]: row["count"] for row in alerts_collection.aggregate(pipeline)}
+
+
+def list_alerts(query, page_start, page_size):
+    cursor = (alerts_collection.find(query, dict.fromkeys(DISPLAY_FIELDS + ["alerts"], 1))
+              .sort("_id", 1)
+              .skip(page_start)
+              .limit(page_size))
+    return list(cursor)
+
+
+# Rebuilds the alerts collection and counters from the weather collection.
+def rebuild():
+    alerts_collection.delete_many({})
+    alert_counters.delete_many({})
+    stations = 0
+    query = {"$or": [
+        {"alerts": {"$exists": True, "$ne": []}},
+        {"alert": {"$exists": True, "$ne": []}}
+    ]}
+    for doc in weather_collection.find(query, dict.fromkeys(DISPLAY_FIELDS + ["loc", "loc_ngrams", "alerts", "alert"], 1)):
+        sync_station(doc)
+        stations += 1
+    return stations
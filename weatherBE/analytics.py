@@ -0,0 +1,172 @@
+# ANALYTICS — Vectorized statistics over a station's readings
+#
+# Backs the analysis modes of GET /weather/<id>/trends (?mode=...):
+#   stats     — count, mean, standard deviation, min/max and percentiles
+#               of every metric
+#   rolling   — moving average of one metric over the last `window` readings
+#   resample  — one metric in hourly or daily buckets (count/mean/min/max)
+#   compare   — the same statistics of one metric for several stations
+#
+# Readings are loaded into contiguous NumPy arrays: timestamps as int64
+# milliseconds since the epoch, metrics as float32 (missing values are NaN).
+# The aggregation sends each bucket back as parallel arrays, one per field
+# ({"ts": [...], "temp_c": [...], ...}), so only one Python dict is built
+# per bucket instead of one per reading.
+#
+# numpy is optional and only needed here:
+#     pip install numpy
+
+from globals import readings_collection
+import readings_store
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+# Resampling periods in milliseconds
+PERIODS = {"hour": 3600 * 1000, "day": 24 * 3600 * 1000}
+
+MAX_WINDOW = 10000
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("Trend analysis modes require numpy (pip install numpy)")
+    return numpy
+
+
+def available():
+    try:
+        _numpy()
+    except RuntimeError:
+        return False
+    return True
+
+
+# Builds the aggregation behind load(): the readings pipeline of
+# readings_store, then one array per field for every bucket.
+def arrays_pipeline(station_oid, from_ts=None, to_ts=None, metrics=readings_store.METRICS):
+    pipeline = readings_store.readings_pipeline(station_oid, from_ts, to_ts)
+    columns = {"_id": 0, "ts": "$readings.ts"}
+    for metric in metrics:
+        # $map keeps readings without the field, so the arrays stay aligned
+        columns[metric] = {"$map": {"input": "$readings", "as": "r",
+                                    "in": {"$ifNull": [f"$$r.{metric}", None]}}}
+    pipeline.append({"$project": columns})
+    return pipeline
+
+
+# Loads a station's readings as (ts, {metric: values}) arrays in time order.
+# Raises ValueError for an invalid from_ts/to_ts.
+def load(station_oid, from_ts=None, to_ts=None, metrics=readings_store.METRICS):
+    np = _numpy()
+    ts_parts = []
+    columns = {metric: [] for metric in metrics}
+    pipeline = arrays_pipeline(station_oid, from_ts, to_ts, metrics)
+    for bucket in readings_collection.aggregate(pipeline):
+        ts_parts.append(bucket.get("ts") or [])
+        for metric in metrics:
+            columns[metric].append(bucket.get(metric) or [])
+
+    ts_strings = [ts for part in ts_parts for ts in part]
+    ts = np.array(ts_strings, dtype="datetime64[ms]").astype(np.int64)
+    values = {}
+    for metric, parts in columns.items():
+        values[metric] = np.array([v for part in parts for v in part], dtype=np.float32)
+
+    # Overflow buckets of an hour can interleave
+    order = np.argsort(ts, kind="stable")
+    return ts[order], {metric: column[order] for metric, column in values.items()}
+
+
+def _number(value, digits=2):
+    value = float(value)
+    return None if value != value else round(value, digits)
+
+
+def _iso(ms):
+    np = _numpy()
+    return str(np.datetime64(int(ms), "ms").astype("datetime64[s]"))
+
+
+# Count, mean, population standard deviation, min/max and percentiles of
+# the non-missing values.
+def describe(values, percentiles=DEFAULT_PERCENTILES):
+    np = _numpy()
+    present = values[~np.isnan(values)].astype(np.float64)
+    if not present.size:
+        return {"count": 0}
+    result = {
+        "count": int(present.size),
+        "mean": _number(present.mean()),
+        "std": _number(present.std()),
+        "min": _number(present.min()),
+        "max": _number(present.max()),
+    }
+    if percentiles:
+        points = np.percentile(present, percentiles)
+        result["percentiles"] = {f"p{p:g}": _number(v) for p, v in zip(percentiles, points)}
+    return result
+
+
+# Mean of each run of `window` consecutive readings, skipping missing
+# values; one point per reading from the window-th on, stamped with its ts.
+def rolling_mean(ts, values, window):
+    np = _numpy()
+    if window < 1 or window > MAX_WINDOW:
+        raise ValueError(f"window must be between 1 and {MAX_WINDOW}")
+    if values.size < window:
+        return []
+    present = ~np.isnan(values)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(present, values, 0), dtype=np.float64)))
+    counts = np.concatenate(([0], np.cumsum(present)))
+    window_sums = sums[window:] - sums[:-window]
+    window_counts = counts[window:] - counts[:-window]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = window_sums / window_counts
+    return [{"ts": _iso(t), "mean": _number(m)} for t, m in zip(ts[window - 1:], means)]
+
+
+# Groups readings into hour or day periods (UTC) with count/mean/min/max
+# of the non-missing values. `ts` must be sorted.
+def resample(ts, values, period="hour"):
+    np = _numpy()
+    if period not in PERIODS:
+        raise ValueError(f"granularity must be one of {', '.join(PERIODS)}")
+    if not ts.size:
+        return []
+    starts = ts - ts % PERIODS[period]
+    period_starts, first, inverse = np.unique(starts, return_index=True, return_inverse=True)
+
+    present = ~np.isnan(values)
+    counts = np.bincount(inverse, weights=present, minlength=first.size)
+    sums = np.bincount(inverse, weights=np.where(present, values, 0), minlength=first.size)
+    # fmin/fmax ignore NaN unless a whole period is missing
+    minimums = np.fmin.reduceat(values, first)
+    maximums = np.fmax.reduceat(values, first)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums / counts
+
+    return [{
+        "period_start": _iso(start),
+        "count": int(count),
+        "mean": _number(mean),
+        "min": _number(low),
+        "max": _number(high)
+    } for start, count, mean, low, high in zip(period_starts, counts, means, minimums, maximums)]
+
+
+# describe() of one metric for each station, in the given order, with each
+# station's mean difference from the first one. `stations` is a list of
+# (station ObjectId, label) pairs.
+def compare(stations, metric, from_ts=None, to_ts=None, percentiles=DEFAULT_PERCENTILES):
+    results = []
+    for station_oid, label in stations:
+        ts, values = load(station_oid, from_ts, to_ts, [metric])
+        stats = describe(values[metric], percentiles)
+        results.append(dict(stats, station_id=str(station_oid), station_name=label))
+    base = results[0].get("mean") if results else None
+    for result in results:
+        if base is not None and result.get("mean") is not None:
+            result["mean_diff"] = round(result["mean"] - base, 2)
+    return results
@@ -1,50 +1,135 @@
 # MAIN FLASK APP (Weather API)
+#
+# create_app(config) builds the app; `config` overrides the settings of
+# config.py (a dict or an object with upper-case attributes). Production
+# servers load it through wsgi.py, see gunicorn.conf.py.
 
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request
 from flask_cors import CORS
+from pymongo.errors import PyMongoError
 
 # Import blueprints
 from blueprints.auth.auth import auth_bp
 from blueprints.weather.weather import weather_bp
 from blueprints.comments.comments import comments_bp
-from blueprints.readings.readings import readings_bp  
+from blueprints.readings.readings import readings_bp
+from decorators import jwt_required, admin_required
+from cache import response_cache, backend_for
+from config import load_config
+import alert_rules
+import globals
+import indexes
+import metrics
+import slow_queries
+import station_model
+import serialization
 
-# Create Flask app
-app = Flask(__name__)
-CORS(app)
 
-# REGISTER BLUEPRINTS
-app.register_blueprint(auth_bp)
-app.register_blueprint(weather_bp)
-app.register_blueprint(comments_bp)
-app.register_blueprint(readings_bp)  
+def create_app(config=None):
+    settings = load_config(config)
+    globals.configure(settings)
+    response_cache.configure(
+        backend=backend_for(settings["REDIS_URL"], settings["CACHE_MAX_ENTRIES"]),
+        ttl=settings["CACHE_TTL_SECONDS"]
+    )
+    alert_rules.configure(settings["ALERT_RULES_PATH"])
+    if settings["METRICS_ENABLED"]:
+        globals.add_command_listener(metrics.command_listener)
+    if settings["SLOW_QUERY_ENABLED"]:
+        globals.add_command_listener(slow_queries.listener)
 
+    # Create Flask app
+    app = Flask(__name__)
+    app.config.update(settings)
+    serialization.install(app, settings["JSON_SERIALIZER"], settings["JSON_DATETIME_FORMAT"])
+    CORS(app)
 
-# HOME ROUTE (for quick testing)
-@app.route('/')
-def home():
-    return jsonify({
-        "message": "Welcome to the Weather API ",
-        "available_routes": {
-            "auth": ["/register", "/login", "/logout"],
-            "weather": ["/weather", "/weather/<id>"],
-            "comments": ["/weather/<id>/comments"],
-            "readings": ["/weather/<id>/readings"]
-        }
-    }), 200
+    # REGISTER BLUEPRINTS
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(weather_bp)
+    app.register_blueprint(comments_bp)
+    app.register_blueprint(readings_bp)
 
+    # Request/MongoDB instrumentation and GET /metrics (see metrics.py)
+    if settings["METRICS_ENABLED"]:
+        metrics.install(app, settings["METRICS_MULTIPROC_DIR"], settings["METRICS_FLUSH_SECONDS"])
 
-# ERROR HANDLERS 
-@app.errorhandler(404)
-def not_found(e):
-    return jsonify({"error": "Route not found"}), 404
+    # Create any declared index that does not exist yet (see indexes.py).
+    # Failures, including an unreachable server, are logged and the app
+    # starts anyway.
+    if settings["ENSURE_INDEXES"]:
+        failed = indexes.ensure_indexes()["failed"]
+        for collection, errors in failed.items():
+            for error in errors:
+                app.logger.warning("Index not created on %s: %s", collection, error)
+    if settings["SLOW_QUERY_ENABLED"]:
+        try:
+            slow_queries.ensure_collection()
+        except PyMongoError as e:
+            app.logger.warning("Slow query log collection not created: %s", e)
 
-@app.errorhandler(500)
-def server_error(e):
-    return jsonify({"error": "Internal server error"}), 500
 
+    # HOME ROUTE (for quick testing)
+    @app.route('/')
+    def home():
+        return jsonify({
+            "message": "Welcome to the Weather API ",
+            "available_routes": {
+                "auth": ["/register", "/login", "/logout"],
+                "weather": ["/weather", "/weather/<id>"],
+                "comments": ["/weather/<id>/comments"],
+                "readings": ["/weather/<id>/readings"]
+            }
+        }), 200
 
-# RUN SERVER
-if __name__ == '__main__':
-    app.run(debug=True)
 
+    # GET /cache/stats
+    # ADMIN - Response cache size and hit/miss counters
+    @app.route('/cache/stats')
+    @jwt_required
+    @admin_required
+    def cache_stats():
+        return jsonify(response_cache.stats()), 200
+
+
+    # GET /station-model/stats
+    # ADMIN - State, size, sync mode and drift of the station read model
+    @app.route('/station-model/stats')
+    @jwt_required
+    @admin_required
+    def station_model_stats():
+        return jsonify(station_model.model.stats()), 200
+
+
+    # GET /slow-queries
+    # ADMIN - Most recent slow MongoDB commands with their explain plans
+    # (?limit=, ?route=, ?collection=); see slow_queries.py
+    @app.route('/slow-queries')
+    @jwt_required
+    @admin_required
+    def slow_query_log():
+        limit = max(1, min(request.args.get("limit", default=100, type=int), 1000))
+        entries = slow_queries.recent(limit, request.args.get("route"), request.args.get("collection"))
+        return jsonify({
+            "enabled": settings["SLOW_QUERY_ENABLED"],
+            "threshold_ms": settings["SLOW_QUERY_THRESHOLD_MS"],
+            "count": len(entries),
+            "slow_queries": entries
+        }), 200
+
+
+    # ERROR HANDLERS
+    @app.errorhandler(404)
+    def not_found(e):
+        return jsonify({"error": "Route not found"}), 404
+
+    @app.errorhandler(500)
+    def server_error(e):
+        return jsonify({"error": "Internal server error"}), 500
+
+    return app
+
+
+# RUN SERVER (development only, see wsgi.py for production)
+if __name__ == '__main__':
+    create_app().run(debug=True)
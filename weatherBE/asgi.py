@@ -0,0 +1,270 @@
+# ASGI APP — Async serving mode for the hot public reads
+#
+# The Flask app blocks a worker thread on every PyMongo call. In async mode
+# the busiest public reads are served by async Quart handlers on the Motor
+# driver, so one event loop keeps many requests in flight while they wait
+# on MongoDB:
+#
+#   GET /weather                  (getAllWeather)
+#   GET /weather/<id>             (getOneWeather)
+#   GET /weather/<id>/readings    (get_readings)
+#
+# Every other request is resolved against the Flask URL map and handed to
+# the regular WSGI app through asgiref's WsgiToAsgi, so routes, auth and
+# response shapes stay the same. The async handlers go through the same
+# response cache (see cache.py) and ETag / Last-Modified checks (see
+# conditional.py) as the sync routes; only the MongoDB reads are async.
+#
+# Optional dependencies, only needed for this mode:
+#     pip install quart motor asgiref hypercorn
+#     hypercorn asgi:application --bind 0.0.0.0:8000      (from weatherBE/)
+#
+# Compare both modes with benchmarks/load_test.py.
+
+from quart import Quart, request, jsonify, make_response, g
+from motor.motor_asyncio import AsyncIOMotorClient
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.exceptions import HTTPException
+from functools import wraps
+from bson import ObjectId
+from globals import settings
+from config import mongo_client_options
+from app import create_app
+from cache import response_cache, MemoryBackend
+import readings_store
+import pagination
+import conditional
+import serialization
+import asyncio
+from blueprints.readings.readings import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from blueprints.weather.weather import list_options, DETAIL_EXCLUDED
+
+# Flask endpoints that async_app serves instead
+ASYNC_ENDPOINTS = {
+    "weather_bp.getAllWeather",
+    "weather_bp.getOneWeather",
+    "readings_bp.get_readings",
+}
+
+async_app = Quart(__name__)
+# Same JSON output as the Flask app (see serialization.py)
+serialization.install(async_app, settings["JSON_SERIALIZER"], settings["JSON_DATETIME_FORMAT"])
+motor_client = None
+
+
+def _db():
+    # The Motor client must be created inside the running event loop
+    global motor_client
+    if motor_client is None:
+        motor_client = AsyncIOMotorClient(settings["MONGO_URI"], **mongo_client_options(settings))
+    return motor_client[settings["DB_NAME"]]
+
+
+# Runs a response cache call; backends other than the in-process one
+# (Redis) block, so they run in a thread.
+async def _cache_call(func, *args):
+    if isinstance(response_cache.backend, MemoryBackend):
+        return func(*args)
+    return await asyncio.to_thread(func, *args)
+
+
+# DECORATOR: cached(tags)
+# Async counterpart of response_cache.cached(), same keys and entries.
+def cached(tags):
+    def decorator(func):
+        @wraps(func)
+        async def cached_wrapper(*args, **kwargs):
+            key = await _cache_call(response_cache.key_for, request.path, request.args,
+                                    tags(**kwargs), g.get("etag", ""))
+            entry = await _cache_call(response_cache.lookup, key)
+            if entry is not None:
+                response = await make_response(entry["body"], entry["status"])
+                response.content_type = entry["content_type"]
+                response.headers["X-Cache"] = "HIT"
+                return response
+
+            response = await make_response(await func(*args, **kwargs))
+            if response.status_code == 200:
+                body = await response.get_data(as_text=True)
+                await _cache_call(response_cache.store, key, body, response.status_code,
+                                  response.content_type)
+            response.headers["X-Cache"] = "MISS"
+            return response
+        return cached_wrapper
+    return decorator
+
+
+# DECORATOR: if_changed(version_fields, modified_fields)
+# Async counterpart of conditional.conditional(): ETag / Last-Modified
+# headers and 304 Not Modified from the station's version fields.
+def if_changed(version_fields=("version",), modified_fields=("last_updated_at",)):
+    def decorator(func):
+        @wraps(func)
+        async def conditional_wrapper(*args, **kwargs):
+            record_id = next(iter(kwargs.values()))
+            try:
+                oid = ObjectId(record_id)
+            except Exception:
+                return await func(*args, **kwargs)
+
+            projection = conditional.meta_projection(version_fields, modified_fields)
+            meta = await _db()["weather"].find_one({"_id": oid}, projection)
+            if meta is None:
+                return await func(*args, **kwargs)
+
+            etag, last_modified = conditional.validators(record_id, meta, version_fields,
+                                                         modified_fields, request.args)
+            if conditional.not_modified(request, etag, last_modified):
+                response = await make_response("", 304)
+            else:
+                g.etag = etag
+                response = await make_response(await func(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            return conditional.set_validators(response, etag, last_modified)
+        return conditional_wrapper
+    return decorator
+
+
+# Async counterpart of readings_store.iter_readings()
+async def _iter_readings(station_oid, from_ts=None, to_ts=None, after=None):
+    pipeline = readings_store.readings_pipeline(station_oid, from_ts, to_ts, after)
+    pending, pending_start = [], None
+    async for bucket in _db()["readings"].aggregate(pipeline):
+        if bucket["bucket_start"] != pending_start:
+            for reading in readings_store.in_order(pending):
+                yield reading
+            pending, pending_start = [], bucket["bucket_start"]
+        pending.extend(bucket.get("readings", []))
+    for reading in readings_store.in_order(pending):
+        yield reading
+
+
+# GET /weather
+# PUBLIC - Show all weather data, same options as the sync route
+@async_app.route('/weather', methods=['GET'])
+@cached(lambda: ["stations"])
+async def getAllWeather():
+    try:
+        query, projection, page_size = list_options(request.args)
+    except ValueError as ve:
+        return await make_response(jsonify({"error": str(ve)}), 400)
+
+    try:
+        cursor = _db()["weather"].find(query, projection).sort("_id", 1)
+        page_num = request.args.get('page', type=int)
+        if page_num and not request.args.get('cursor'):
+            cursor = cursor.skip((max(page_num, 1) - 1) * page_size)
+        data_to_return = await cursor.limit(page_size + 1).to_list(length=page_size + 1)
+
+        next_cursor = None
+        if len(data_to_return) > page_size:
+            data_to_return = data_to_return[:page_size]
+            next_cursor = pagination.encode_id_cursor(data_to_return[-1])
+
+        result = {
+            "count": len(data_to_return),
+            "size": page_size,
+            "next_cursor": next_cursor,
+            "data": data_to_return
+        }
+        if page_num:
+            result["page"] = page_num
+        if request.args.get('count', '').lower() in ("1", "true", "yes"):
+            result["total"] = await _db()["weather"].estimated_document_count()
+        return await make_response(jsonify(result), 200)
+    except Exception as e:
+        return await make_response(jsonify({
+            "error": "Failed to load weather data",
+            "details": str(e)
+        }), 500)
+
+
+# GET /weather/<id>
+# PUBLIC - Get single weather record
+@async_app.route('/weather/<string:record_id>', methods=['GET'])
+@if_changed()
+@cached(lambda record_id: [f"station:{record_id}"])
+async def getOneWeather(record_id):
+    try:
+        weather = await _db()["weather"].find_one({"_id": ObjectId(record_id)}, DETAIL_EXCLUDED)
+        if weather is not None:
+            return await make_response(jsonify(weather), 200)
+        else:
+            return await make_response(jsonify({"Error": "Weather record not found"}), 404)
+    except Exception as e:
+        return await make_response(jsonify({
+            "Error": "Invalid ID",
+            "Details": str(e)
+        }), 400)
+
+
+# GET /weather/<id>/readings
+# PUBLIC - Readings of a station, same options as the sync route
+@async_app.route("/weather/<string:station_id>/readings", methods=["GET"])
+@if_changed(("readings_version",), ("readings_updated_at",))
+async def get_readings(station_id):
+    try:
+        oid = ObjectId(station_id)
+    except Exception:
+        return jsonify({"error": "Invalid station id"}), 400
+
+    doc = await _db()["weather"].find_one({"_id": oid}, {"station_name": 1})
+    if not doc:
+        return jsonify({"error": "Station not found"}), 404
+
+    from_date = request.args.get("from")
+    to_date = request.args.get("to")
+
+    limit = request.args.get("limit", default=DEFAULT_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    after = None
+    if request.args.get("cursor"):
+        try:
+            after = pagination.decode_reading_cursor(request.args["cursor"])
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+
+    # Fetch one extra reading to know whether another page exists
+    readings = []
+    try:
+        async for reading in _iter_readings(oid, from_date, to_date, after=after):
+            readings.append(reading)
+            if len(readings) > limit:
+                break
+    except ValueError:
+        return jsonify({"error": "Invalid 'from' or 'to' timestamp"}), 400
+
+    next_cursor = None
+    if len(readings) > limit:
+        readings = readings[:limit]
+        next_cursor = pagination.encode_reading_cursor(readings[-1])
+
+    if not readings and not (from_date or to_date or after):
+        return jsonify({"message": "No readings available for this station"}), 200
+
+    return jsonify({
+        "station": doc.get("station_name"),
+        "count": len(readings),
+        "limit": limit,
+        "next_cursor": next_cursor,
+        "readings": readings
+    }), 200
+
+
+wsgi_app = create_app()
+sync_app = WsgiToAsgi(wsgi_app)
+_flask_routes = wsgi_app.url_map.bind("")
+
+
+# ASGI entry point: hot reads go to async_app, everything else to Flask.
+async def application(scope, receive, send):
+    if scope["type"] == "http":
+        try:
+            endpoint, _ = _flask_routes.match(scope["path"], method=scope["method"])
+        except HTTPException:
+            endpoint = None
+        if endpoint not in ASYNC_ENDPOINTS:
+            return await sync_app(scope, receive, send)
+    return await async_app(scope, receive, send)
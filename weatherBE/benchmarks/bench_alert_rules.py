@@ -0,0 +1,52 @@
+# BENCHMARK — Alert rule evaluation throughput
+#
+# Feeds synthetic readings through alert_rules.RuleEngine (no database
+# access) and reports rule evaluations per second.
+#
+#     python -m benchmarks.bench_alert_rules [readings] [stations]
+#
+# Run from weatherBE/.
+
+from alert_rules import RuleEngine, DEFAULT_RULES
+import random
+import time
+import sys
+
+
+def run(readings=200000, stations=100, window=5):
+    rules = [dict(rule, window=window, hysteresis=2) for rule in DEFAULT_RULES]
+    engine = RuleEngine(rules)
+    rng = random.Random(42)
+    batch = [
+        (i % stations, {"temp_c": rng.uniform(-10, 50), "wind_kmh": rng.uniform(0, 150)})
+        for i in range(readings)
+    ]
+
+    states = {}
+    transitions = 0
+    started = time.perf_counter()
+    for station_id, reading in batch:
+        state = states.get(station_id)
+        if state is None:
+            state = states[station_id] = engine.load_state()
+        raised, cleared = engine.evaluate(state, reading)
+        transitions += len(raised) + len(cleared)
+    elapsed = time.perf_counter() - started
+
+    evaluations = readings * len(engine.rules)
+    return {
+        "readings": readings,
+        "stations": stations,
+        "rules": len(engine.rules),
+        "seconds": round(elapsed, 4),
+        "readings_per_second": round(readings / elapsed),
+        "rules_per_second": round(evaluations / elapsed),
+        "transitions": transitions
+    }
+
+
+if __name__ == "__main__":
+    readings = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    stations = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    for key, value in run(readings, stations).items():
+        print(f"{key}: {value}")
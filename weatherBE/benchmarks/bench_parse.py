@@ -0,0 +1,90 @@
+# BENCHMARK — Request payload parsing throughput
+#
+# Parses synthetic form-style payloads (string values, as request.form
+# delivers them) with the compiled schemas of schemas.py and, for
+# comparison, with the hand-written float()/int() casts the routes used
+# before. No request context or database is needed.
+#
+#     python -m benchmarks.bench_parse [payloads]
+#
+# Run from weatherBE/.
+
+import schemas
+import readings_store
+import datetime
+import random
+import time
+import sys
+
+
+def _hand_reading(data):
+    return {
+        "ts": readings_store.normalize_ts(data.get("ts") or datetime.datetime.utcnow()),
+        "temp_c": float(data.get("temp_c", 0)),
+        "humidity": float(data.get("humidity", 0)),
+        "wind_kmh": float(data.get("wind_kmh", 0)),
+        "pressure_kpa": float(data.get("pressure_kpa", 0))
+    }
+
+
+def _hand_station(data):
+    return {
+        "station_name": data.get("station_name"),
+        "city": data.get("city"),
+        "state": data.get("state", ""),
+        "region": data.get("region", ""),
+        "place": data.get("place", ""),
+        "country": data.get("country"),
+        "avg_temp_c": float(data.get("avg_temp_c", 0)),
+        "max_wind_kmh": float(data.get("max_wind_kmh", 0)),
+        "overall_condition": data.get("overall_condition", "Unknown"),
+        "air_quality_index": int(data.get("air_quality_index", 0)),
+        "views": int(data.get("views", 0))
+    }
+
+
+def _payloads(count):
+    rng = random.Random(42)
+    start = datetime.datetime(2025, 1, 1)
+    readings = [{
+        "ts": (start + datetime.timedelta(seconds=i * 60)).isoformat(),
+        "temp_c": f"{rng.uniform(-10, 45):.1f}",
+        "humidity": f"{rng.uniform(0, 100):.1f}",
+        "wind_kmh": f"{rng.uniform(0, 120):.1f}",
+        "pressure_kpa": f"{rng.uniform(95, 105):.2f}"
+    } for i in range(count)]
+    stations = [{
+        "station_name": f"Station {i}",
+        "city": "Belfast",
+        "region": "Northern Ireland",
+        "country": "UK",
+        "avg_temp_c": f"{rng.uniform(-10, 45):.1f}",
+        "max_wind_kmh": f"{rng.uniform(0, 120):.1f}",
+        "air_quality_index": str(rng.randint(0, 300))
+    } for i in range(count)]
+    return readings, stations
+
+
+def _time(parse, payloads):
+    started = time.perf_counter()
+    for data in payloads:
+        parse(data)
+    elapsed = time.perf_counter() - started
+    return round(len(payloads) / elapsed)
+
+
+def run(count=100000):
+    readings, stations = _payloads(count)
+    return {
+        "payloads": count,
+        "reading_schema_per_second": _time(schemas.READING.parse, readings),
+        "reading_hand_parsed_per_second": _time(_hand_reading, readings),
+        "station_schema_per_second": _time(schemas.STATION.parse, stations),
+        "station_hand_parsed_per_second": _time(_hand_station, stations),
+    }
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    for key, value in run(count).items():
+        print(f"{key}: {value}")
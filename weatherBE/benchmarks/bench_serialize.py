@@ -0,0 +1,87 @@
+# BENCHMARK — JSON serialization of large list responses
+#
+# Serializes a GET /weather style page of synthetic station documents
+# (ObjectId ids, datetimes, nested readings) with:
+#   jsonify       — Flask's default provider after the _id -> str loop
+#                   the routes used to run
+#   json / orjson — serialization.JSONProvider with each encoder, with
+#                   HTTP-date and ISO datetimes
+# Runs inside a bare Flask app; no database is needed.
+#
+#     python -m benchmarks.bench_serialize [documents] [rounds]
+#
+# Run from weatherBE/.
+
+from flask import Flask, jsonify
+from flask.json.provider import DefaultJSONProvider
+from bson import ObjectId
+import serialization
+import datetime
+import random
+import time
+import sys
+
+
+def _documents(count):
+    rng = random.Random(42)
+    now = datetime.datetime(2025, 1, 1)
+    return [{
+        "_id": ObjectId(),
+        "station_name": f"Station {i}",
+        "city": "Belfast",
+        "region": "Northern Ireland",
+        "country": "UK",
+        "avg_temp_c": round(rng.uniform(-10, 45), 1),
+        "max_wind_kmh": round(rng.uniform(0, 120), 1),
+        "air_quality_index": rng.randint(0, 300),
+        "alerts": [],
+        "views": rng.randint(0, 1000),
+        "created_at": now,
+        "last_updated_at": now + datetime.timedelta(minutes=i),
+        "recent_readings": [{"_id": ObjectId(), "ts": now, "temp_c": 1.5} for _ in range(3)],
+    } for i in range(count)]
+
+
+def _time(app, build, rounds):
+    with app.app_context():
+        started = time.perf_counter()
+        for _ in range(rounds):
+            size = len(build().get_data())
+        elapsed = (time.perf_counter() - started) / rounds
+    return {"ms_per_response": round(elapsed * 1000, 2), "bytes": size}
+
+
+def run(count=5000, rounds=10):
+    docs = _documents(count)
+    results = {"documents": count, "rounds": rounds}
+
+    app = Flask(__name__)
+    app.json = DefaultJSONProvider(app)
+
+    def legacy():
+        # The old routes converted ids by hand, nested ones included
+        page = []
+        for doc in docs:
+            doc = dict(doc, _id=str(doc["_id"]))
+            doc["recent_readings"] = [dict(r, _id=str(r["_id"])) for r in doc["recent_readings"]]
+            page.append(doc)
+        return jsonify({"count": len(page), "data": page})
+    results["jsonify"] = _time(app, legacy, rounds)
+
+    for encoder in ("json", "orjson"):
+        for datetime_format in serialization.DATETIME_FORMATS:
+            name = f"{encoder}_{datetime_format}"
+            try:
+                serialization.install(app, encoder, datetime_format)
+            except RuntimeError as e:
+                results[name] = str(e)
+                continue
+            results[name] = _time(app, lambda: jsonify({"count": len(docs), "data": docs}), rounds)
+    return results
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    for key, value in run(count, rounds).items():
+        print(f"{key}: {value}")
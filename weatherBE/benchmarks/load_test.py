@@ -0,0 +1,69 @@
+# BENCHMARK — HTTP load test for the sync (WSGI) and async (ASGI) modes
+#
+# Sends `requests` GET requests with `concurrency` parallel clients to each
+# URL and reports throughput and latency percentiles. Start both servers
+# against the same database, then compare them, e.g.:
+#
+#     gunicorn -c gunicorn.conf.py wsgi:app
+#     hypercorn asgi:application --bind :8000
+#     python -m benchmarks.load_test 2000 64 \
+#         http://127.0.0.1:5000/weather http://127.0.0.1:8000/weather
+#
+# Run from weatherBE/. Uses only the standard library.
+
+from concurrent.futures import ThreadPoolExecutor
+import urllib.request
+import urllib.error
+import time
+import sys
+
+
+def _fetch(url):
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=30) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except Exception:
+        status = None
+    return status, time.perf_counter() - started
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(int(len(sorted_values) * fraction), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def run(url, requests=1000, concurrency=32):
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        started = time.perf_counter()
+        results = list(pool.map(_fetch, [url] * requests))
+        elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for _, latency in results)
+    failed = sum(1 for status, _ in results if status is None or status >= 500)
+    return {
+        "url": url,
+        "requests": requests,
+        "concurrency": concurrency,
+        "failed": failed,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(requests / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4:
+        print("usage: python -m benchmarks.load_test <requests> <concurrency> <url> [<url> ...]")
+        sys.exit(1)
+    requests, concurrency = int(sys.argv[1]), int(sys.argv[2])
+    for url in sys.argv[3:]:
+        result = run(url, requests, concurrency)
+        print(" ".join(f"{key}={value}" for key, value in result.items()))
@@ -1,85 +1,29 @@
 #------ AUTH BLUEPRINT (for Weather API Users)-------#
 
 
-from flask import Blueprint, jsonify, request, make_response
-from globals import users, blacklist, SECRET_KEY
-from functools import wraps
+from flask import Blueprint, jsonify, request, make_response, g
+from pymongo.errors import DuplicateKeyError
+from globals import users, settings
+from decorators import jwt_required, revoke
+import schemas
 import jwt
 import datetime
 import bcrypt
+import uuid
 
 auth_bp = Blueprint("auth_bp", __name__)
 
 
-#---------- Helper Decorator - Token Validation (Login Req)-------------#
-
-def jwt_required(func):
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        # Accept multiple header names for flexibility
-        token = (
-            request.headers.get('x-access-token')
-            or request.headers.get('access-token')
-            or request.headers.get('Authorization')
-            or request.headers.get('authorization')
-        )
-
-        if not token:
-            return make_response(jsonify({"message": "Token is missing"}), 401)
-
-        try:
-            data = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-        except jwt.ExpiredSignatureError:
-            return make_response(jsonify({"message": "Token expired"}), 401)
-        except Exception:
-            return make_response(jsonify({"message": "Invalid token"}), 401)
-
-#--------------------- Check blacklist (if user logged out)-------------------#
-        if blacklist.find_one({'token': token}):
-            return make_response(jsonify({"message": "Token has been cancelled"}), 401)
-
-        # Attach decoded token data to request for later use
-        request.user_data = data
-        return func(*args, **kwargs)
-    return wrapper
-
-
-
-#-------------------Helper Decorator - Admin Only-------------------#
-
-def admin_required(func):
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        token = (
-            request.headers.get('x-access-token')
-            or request.headers.get('access-token')
-            or request.headers.get('Authorization')
-            or request.headers.get('authorization')
-        )
-
-        if not token:
-            return make_response(jsonify({"message": "Token missing"}), 401)
-        try:
-            data = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-            if not data.get('admin', False):
-                return make_response(jsonify({"message": "Admin access required"}), 403)
-        except jwt.ExpiredSignatureError:
-            return make_response(jsonify({"message": "Token expired"}), 401)
-        except Exception:
-            return make_response(jsonify({"message": "Invalid token"}), 401)
-
-        return func(*args, **kwargs)
-    return wrapper
-
-
-
 # POST /register
 # PUBLIC - Register a new weather user
 @auth_bp.route('/register', methods=['POST'])
 def register_user():
-    data = request.form
-    if not data or not data.get("username") or not data.get("password"):
-        return make_response(jsonify({"Error": "Missing username or password"}), 400)
+    try:
+        data = schemas.REGISTER.parse(schemas.request_data())
+    except schemas.SchemaError as e:
+        if set(e.errors) & {"username", "password"}:
+            return schemas.error_response(e, "Missing username or password")
+        return schemas.error_response(e)
 
     if users.find_one({"username": data["username"]}):
         return make_response(jsonify({"Error": "Username already exists"}), 400)
@@ -88,10 +32,14 @@ def register_user():
     new_user = {
         "username": data["username"],
         "password": hashed_pw,
-        "admin": bool(data.get("admin", False))
+        "admin": data["admin"]
     }
 
-    users.insert_one(new_user)
+    # The unique username index (see indexes.py) settles concurrent registrations
+    try:
+        users.insert_one(new_user)
+    except DuplicateKeyError:
+        return make_response(jsonify({"Error": "Username already exists"}), 400)
     return make_response(jsonify({
         "message": "User registered successfully",
         "username": data["username"]
@@ -118,8 +66,9 @@ def login_user():
     token = jwt.encode({
         'user': auth.username,
         'admin': user.get('admin', False),
+        'jti': uuid.uuid4().hex,
         'exp': datetime.datetime.utcnow() + datetime.timedelta(minutes=30)
-    }, SECRET_KEY, algorithm='HS256')
+    }, settings['SECRET_KEY'], algorithm='HS256')
 
     return make_response(jsonify({'token': token}), 200)
 
@@ -129,18 +78,9 @@ def login_user():
 @auth_bp.route('/logout', methods=['POST'])
 @jwt_required
 def logout_user():
-    token = (
-        request.headers.get('x-access-token')
-        or request.headers.get('access-token')
-        or request.headers.get('Authorization')
-        or request.headers.get('authorization')
-    )
-
-    if token:
-        blacklist.insert_one({'token': token})
-        return make_response(jsonify({"message": "Logout successful"}), 200)
-    else:
-        return make_response(jsonify({"message": "Token missing"}), 401)
+    # jwt_required has already validated the token and stored it on g
+    revoke(g.token, g.user_data)
+    return make_response(jsonify({"message": "Logout successful"}), 200)
 
 
 # POST /token/refresh
@@ -152,28 +92,16 @@ def refresh_token():
     Refresh the user's JWT token before it expires.
     Requires a valid, non-blacklisted token.
     """
-#-------------Extract the current token from headers------------#
-    token = (
-        request.headers.get('x-access-token')
-        or request.headers.get('access-token')
-        or request.headers.get('Authorization')
-        or request.headers.get('authorization')
-    )
-
-    try:
-        # Decode existing token
-        data = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-    except jwt.ExpiredSignatureError:
-        return make_response(jsonify({"message": "Token expired. Please log in again."}), 401)
-    except Exception:
-        return make_response(jsonify({"message": "Invalid token"}), 401)
+    # jwt_required has already decoded the token
+    data = g.user_data
 
 #------------Create a new token with extended expiry-------------#
     new_token = jwt.encode({
         'user': data['user'],
         'admin': data.get('admin', False),
+        'jti': uuid.uuid4().hex,
         'exp': datetime.datetime.utcnow() + datetime.timedelta(minutes=30)
-    }, SECRET_KEY, algorithm='HS256')
+    }, settings['SECRET_KEY'], algorithm='HS256')
 
     return make_response(jsonify({
         "message": "Token refreshed successfully",
@@ -4,11 +4,20 @@ from flask import Blueprint, jsonify, request, make_response
 from bson import ObjectId
 from globals import weather_collection
 from decorators import jwt_required
+from cache import response_cache
+from conditional import conditional
+import comments_store
+import pagination
+import schemas
 import uuid
 import datetime
 
 comments_bp = Blueprint("comments_bp", __name__)
 
+# GET /weather/<id>/comments page sizes
+COMMENTS_PAGE_SIZE = 50
+MAX_COMMENTS_PAGE_SIZE = 200
+
 
 # POST /weather/<id>/comments
 # USERS - Add a comment to a weather record
@@ -16,36 +25,30 @@ comments_bp = Blueprint("comments_bp", __name__)
 @comments_bp.route('/weather/<string:record_id>/comments', methods=['POST'])
 @jwt_required
 def addComment(record_id):
-    # Try to accept both form-data and JSON
-    data = request.form.to_dict() if request.form else request.get_json(silent=True) or {}
-
-    # Debug check 
-    print(" Received comment data:", data)
-
-    username = data.get("username")
-    comment = data.get("comment")
-    rating = data.get("rating", 0)
-
-    if not username or not comment:
-        return make_response(jsonify({
-            "Error": "Missing required field",
-            "Received": data  # <-- helpful to debug what Flask actually got
-        }), 400)
+    # Accepts both form-data and JSON
+    try:
+        data = schemas.COMMENT.parse(schemas.request_data())
+    except schemas.SchemaError as e:
+        return schemas.error_response(e, "Invalid comment data")
 
+    # MongoDB keeps milliseconds, so page cursors match the stored value
+    now = datetime.datetime.utcnow()
     new_comment = {
         "_id": str(uuid.uuid4()),
-        "username": username,
-        "comment": comment,
-        "rating": int(rating),
-        "created_at": datetime.datetime.utcnow()
+        "username": data["username"],
+        "comment": data["comment"],
+        "rating": data["rating"],
+        "created_at": now.replace(microsecond=now.microsecond // 1000 * 1000)
     }
 
-    result = weather_collection.update_one(
-        {"_id": ObjectId(record_id)},
-        {"$push": {"comments": new_comment}}
-    )
+    try:
+        station_oid = ObjectId(record_id)
+    except Exception:
+        return make_response(jsonify({"Error": "Weather record not found"}), 404)
 
-    if result.modified_count == 1:
+    if weather_collection.find_one({"_id": station_oid}, {"_id": 1}):
+        comments_store.add_comment(station_oid, new_comment)
+        response_cache.invalidate("stations", f"station:{record_id}")
         new_comment_link = f"http://127.0.0.1:5000/weather/{record_id}/comments/{new_comment['_id']}"
         return make_response(jsonify({
             "Message": "Comment added successfully",
@@ -57,19 +60,50 @@ def addComment(record_id):
 
 
 # GET /weather/<id>/comments
-# PUBLIC - Get all comments for a record
+# PUBLIC - Get the comments of a record, one page at a time
+# ?sort=newest|rating, ?limit= page size, ?cursor= next_cursor of the
+# previous page
 
 @comments_bp.route('/weather/<string:record_id>/comments', methods=['GET'])
+@conditional()
+@response_cache.cached(lambda record_id: [f"station:{record_id}"])
 def getComments(record_id):
+    sort = request.args.get("sort", "newest")
+    if sort not in comments_store.SORTS:
+        return make_response(jsonify({"Error": f"sort must be one of {', '.join(comments_store.SORTS)}"}), 400)
+
+    limit = request.args.get("limit", default=COMMENTS_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MAX_COMMENTS_PAGE_SIZE))
+
     try:
-        record = weather_collection.find_one({"_id": ObjectId(record_id)})
+        after = None
+        if request.args.get("cursor"):
+            after = pagination.decode_cursor(request.args["cursor"])
+
+        record = weather_collection.find_one(
+            {"_id": ObjectId(record_id)},
+            {"station_name": 1, "comment_count": 1, "rating_avg": 1}
+        )
         if record:
+            comments = comments_store.page(record["_id"], sort, after, limit)
+            next_cursor = None
+            if len(comments) > limit:
+                comments = comments[:limit]
+                next_cursor = pagination.encode_cursor(comments_store.cursor_key(comments[-1], sort))
             return make_response(jsonify({
                 "station": record.get("station_name"),
-                "comments": record.get("comments", [])
+                "comment_count": record.get("comment_count", 0),
+                "rating_avg": record.get("rating_avg"),
+                "count": len(comments),
+                "sort": sort,
+                "limit": limit,
+                "next_cursor": next_cursor,
+                "comments": comments
             }), 200)
         else:
             return make_response(jsonify({"Error": "Record not found"}), 404)
+    except ValueError:
+        return make_response(jsonify({"Error": "Invalid cursor"}), 400)
     except Exception as e:
         return make_response(jsonify({
             "Error": "Failed to load comments",
@@ -83,24 +117,17 @@ def getComments(record_id):
 @comments_bp.route('/weather/<string:record_id>/comments/<string:comment_id>', methods=['PUT'])
 @jwt_required
 def updateComment(record_id, comment_id):
-    data = request.form if request.form else request.get_json()
-    update_field = {}
-
-    if data.get("comment"):
-        update_field["comments.$.comment"] = data.get("comment")
-    if data.get("rating"):
-        update_field["comments.$.rating"] = int(data.get("rating"))
+    try:
+        update_field = schemas.COMMENT_UPDATE.parse(schemas.request_data())
+    except schemas.SchemaError as e:
+        return schemas.error_response(e, "Invalid comment data")
 
     if not update_field:
         return make_response(jsonify({"Error": "No valid data provided"}), 400)
 
     try:
-        result = weather_collection.update_one(
-            {"_id": ObjectId(record_id), "comments._id": comment_id},
-            {"$set": update_field}
-        )
-
-        if result.modified_count == 1:
+        if comments_store.update_comment(ObjectId(record_id), comment_id, update_field):
+            response_cache.invalidate("stations", f"station:{record_id}")
             return make_response(jsonify({
                 "Message": "Comment updated successfully"
             }), 200)
@@ -120,12 +147,8 @@ def updateComment(record_id, comment_id):
 @jwt_required
 def deleteComment(record_id, comment_id):
     try:
-        result = weather_collection.update_one(
-            {"_id": ObjectId(record_id)},
-            {"$pull": {"comments": {"_id": comment_id}}}
-        )
-
-        if result.modified_count == 1:
+        if comments_store.delete_comment(ObjectId(record_id), comment_id):
+            response_cache.invalidate("stations", f"station:{record_id}")
             return make_response(jsonify({
                 "Message": "Comment deleted successfully"
             }), 200)
@@ -2,10 +2,24 @@
 # READINGS BLUEPRINT — Handles Recording and Management of Historical Weather Data
 
 from flask import Blueprint, jsonify, request
+from werkzeug.exceptions import RequestEntityTooLarge
 from bson import ObjectId
-from globals import weather_collection
+from globals import weather_collection, settings
 from decorators import jwt_required
+from cache import response_cache
+from conditional import conditional, touch
+import readings_store
+import rollups
+import alert_rules
+import export
+import pagination
+import schemas
+import itertools
 import datetime
+import json
+import time
+import csv
+import io
 
 # Initialize the blueprint for all reading-related routes
 readings_bp = Blueprint("readings_bp", __name__)
@@ -21,6 +35,161 @@ def _to_objectid(id_str):
     except Exception:
         return None
 
+# Page sizes for GET /weather/<id>/readings
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+# HELPER FUNCTION: _readings_changed()
+# Bumps the station's readings version (used for ETags) and drops cached
+# responses built from its readings.
+
+def _readings_changed(oid, station_id):
+    weather_collection.update_one({"_id": oid}, touch("readings_version", "readings_updated_at"))
+    response_cache.invalidate("readings", f"readings:{station_id}")
+
+
+# Row errors listed in the POST /weather/readings/bulk response; the size
+# limits are the BULK_MAX_ROWS and BULK_MAX_BYTES settings
+BULK_MAX_ERRORS = 100
+
+
+def _too_many_rows(max_rows):
+    return RequestEntityTooLarge(f"At most {max_rows} readings per request")
+
+
+# HELPER FUNCTION: _parse_bulk_rows()
+# Reads the bulk request body as a JSON array (or {"readings": [...]}),
+# NDJSON (application/x-ndjson) or CSV (text/csv) with a header row.
+# Returns (rows, errors): rows that could not be parsed are None and get
+# an entry in errors. Raises RequestEntityTooLarge for a body over
+# max_bytes or with more than max_rows rows (NDJSON and CSV stop reading
+# at the first extra row), ValueError if the body itself is unreadable.
+
+def _parse_bulk_rows(max_rows, max_bytes):
+    too_large = RequestEntityTooLarge(f"Request body larger than {max_bytes} bytes")
+    if request.content_length is not None and request.content_length > max_bytes:
+        raise too_large
+    # Bodies without a Content-Length (chunked) are read up to the limit only
+    raw = request.stream.read(max_bytes + 1)
+    if len(raw) > max_bytes:
+        raise too_large
+    body = raw.decode("utf-8", "replace")
+    mimetype = request.mimetype
+    errors = []
+
+    if mimetype in ("application/x-ndjson", "application/ndjson"):
+        rows = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            if len(rows) == max_rows:
+                raise _too_many_rows(max_rows)
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            if not isinstance(row, dict):
+                errors.append({"row": len(rows), "error": "Malformed JSON line"})
+                row = None
+            rows.append(row)
+        return rows, errors
+
+    if mimetype in ("text/csv", "application/csv"):
+        rows = [dict(row) for row in itertools.islice(csv.DictReader(io.StringIO(body)), max_rows + 1)]
+        if len(rows) > max_rows:
+            raise _too_many_rows(max_rows)
+        return rows, errors
+
+    try:
+        data = json.loads(body)
+    except ValueError:
+        raise ValueError("Body must be a JSON array, NDJSON or CSV")
+    if isinstance(data, dict):
+        data = data.get("readings")
+    if not isinstance(data, list):
+        raise ValueError("Body must be a JSON array, NDJSON or CSV")
+    if len(data) > max_rows:
+        raise _too_many_rows(max_rows)
+
+    rows = []
+    for row in data:
+        if not isinstance(row, dict):
+            errors.append({"row": len(rows), "error": "Reading must be an object"})
+            row = None
+        rows.append(row)
+    return rows, errors
+
+
+# HELPER FUNCTION: _validate_bulk_rows()
+# Validates the rows column by column: station ids are converted and
+# looked up once per distinct id, timestamps and metrics are converted in
+# one pass per field. Returns {station ObjectId: [reading, ...]} with each
+# station's readings in time order, and appends row errors to `errors`.
+
+def _validate_bulk_rows(rows, errors):
+    failed = {error["row"] for error in errors}
+    now = datetime.datetime.utcnow()
+
+    def column(field):
+        return [row.get(field) if row is not None else None for row in rows]
+
+    def reject(index, message):
+        if index not in failed:
+            failed.add(index)
+            errors.append({"row": index, "error": message})
+
+    # station_id: one ObjectId conversion and one lookup per distinct id
+    station_column = [str(v) if v not in (None, "") else None for v in column("station_id")]
+    distinct = {value: _to_objectid(value) for value in set(station_column) if value}
+    known = {doc["_id"] for doc in weather_collection.find(
+        {"_id": {"$in": [oid for oid in distinct.values() if oid]}}, {"_id": 1}
+    )}
+    station_oids = []
+    for index, value in enumerate(station_column):
+        oid = distinct.get(value)
+        if value is None:
+            reject(index, "Missing station_id")
+        elif oid is None:
+            reject(index, "Invalid station id")
+        elif oid not in known:
+            reject(index, "Weather station not found")
+        station_oids.append(oid)
+
+    # ts and metrics use the converters of schemas.READING; ts defaults
+    # to the time of the request, metrics to 0
+    values = {}
+    for field in ["ts"] + readings_store.METRICS:
+        spec = schemas.READING.field(field)
+        default = readings_store.normalize_ts(now) if field == "ts" else spec.default
+        converted = []
+        for index, value in enumerate(column(field)):
+            if value is None or value == "":
+                converted.append(default)
+                continue
+            try:
+                converted.append(spec.convert(value))
+            except (TypeError, ValueError, ArithmeticError):
+                converted.append(None)
+                reject(index, spec.message)
+        values[field] = converted
+    timestamps = values.pop("ts")
+
+    batches = {}
+    for index in range(len(rows)):
+        if index in failed:
+            continue
+        reading = {"_id": str(ObjectId()), "ts": timestamps[index]}
+        for field in readings_store.METRICS:
+            reading[field] = values[field][index]
+        batches.setdefault(station_oids[index], []).append(reading)
+
+    for readings in batches.values():
+        readings.sort(key=lambda r: r["ts"])
+    errors.sort(key=lambda error: error["row"])
+    return batches
+
+
 # ROUTE: POST /weather/<id>/readings
 # Allows authenticated users to add a new weather reading to a specific station.
 # Each reading records temperature, humidity, wind speed, and pressure at a given time.
@@ -34,78 +203,187 @@ def add_reading(station_id):
         return jsonify({"error": "Invalid station id"}), 400
 
     # To accept form or JSON data
-    data = request.form or request.get_json(silent=True) or {}
+    data = schemas.request_data()
     if not data:
         return jsonify({"error": "Missing reading data"}), 400
 
+    # Timestamp defaults to now, metrics to 0
+    try:
+        values = schemas.READING.parse(data)
+    except schemas.SchemaError as e:
+        return schemas.error_response(e, "Invalid reading data")
+
+    # Make sure the station exists before storing anything for it
+    if not weather_collection.find_one({"_id": oid}, {"_id": 1}):
+        return jsonify({"error": "Weather station not found"}), 404
+
     try:
-        # Create a new reading object with automatic ID and timestamp
-        reading = {
-            "_id": str(ObjectId()),  # Unique identifier for the reading
-            "ts": data.get("ts") or datetime.datetime.utcnow().isoformat(),
-            "temp_c": float(data.get("temp_c", 0)),
-            "humidity": float(data.get("humidity", 0)),
-            "wind_kmh": float(data.get("wind_kmh", 0)),
-            "pressure_kpa": float(data.get("pressure_kpa", 0))
-        }
-
-        # Push the new reading into the target weather record
-        result = weather_collection.update_one(
-            {"_id": oid},
-            {"$push": {"readings": reading}}
-        )
-
-        # Confirm if insertion was successful
-        if result.modified_count == 1:
-            return jsonify({
-                "message": "Reading added successfully",
-                "reading": reading
-            }), 201
-        else:
-            return jsonify({"error": "Weather station not found"}), 404
+        # Create a new reading object with automatic ID
+        reading = dict({"_id": str(ObjectId())}, **values)
+
+        # Store the reading in the station's bucket for that hour
+        readings_store.insert_reading(oid, reading)
+        rollups.add_reading(oid, reading)
+        _readings_changed(oid, station_id)
+
+        # Raise/clear threshold alerts from the new reading
+        raised, cleared = alert_rules.apply_reading(oid, reading)
+        if raised or cleared:
+            response_cache.invalidate("stations", f"station:{station_id}")
+        return jsonify({
+            "message": "Reading added successfully",
+            "reading": reading
+        }), 201
 
     # Handle invalid data formats or conversion errors
     except ValueError as ve:
-        return jsonify({"error": f"Invalid numeric value: {str(ve)}"}), 400
+        return jsonify({"error": f"Invalid value: {str(ve)}"}), 400
+    except Exception as e:
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+
+# ROUTE: POST /weather/readings/bulk
+# Allows authenticated users to upload many readings, for any number of
+# stations, in one request. Each row carries a station_id plus the fields
+# of a single reading. Valid rows are written with unordered bulk writes;
+# invalid rows are reported by index and do not block the rest.
+
+@readings_bp.route("/weather/readings/bulk", methods=["POST"])
+@jwt_required
+def add_readings_bulk():
+    started = time.perf_counter()
+    max_rows, max_bytes = settings["BULK_MAX_ROWS"], settings["BULK_MAX_BYTES"]
+    try:
+        rows, errors = _parse_bulk_rows(max_rows, max_bytes)
+    except RequestEntityTooLarge as e:
+        return jsonify({"error": e.description}), 413
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+
+    if not rows:
+        return jsonify({"error": "Missing reading data"}), 400
+
+    try:
+        batches = _validate_bulk_rows(rows, errors)
+
+        tags = ["readings"]
+        if batches:
+            readings_store.append_readings(batches)
+            for oid, readings in batches.items():
+                rollups.add_readings(oid, readings)
+                raised, cleared = alert_rules.apply_readings(oid, readings)
+                tags.append(f"readings:{oid}")
+                if raised or cleared:
+                    tags += ["stations", f"station:{oid}"]
+            weather_collection.update_many(
+                {"_id": {"$in": list(batches)}},
+                touch("readings_version", "readings_updated_at")
+            )
+            response_cache.invalidate(*tags)
     except Exception as e:
         return jsonify({"error": f"Internal server error: {str(e)}"}), 500
 
+    inserted = sum(len(readings) for readings in batches.values())
+    elapsed = time.perf_counter() - started
+    return jsonify({
+        "message": "Readings added" if inserted else "No valid readings",
+        "received": len(rows),
+        "inserted": inserted,
+        "rejected": len(rows) - inserted,
+        "stations": len(batches),
+        "errors": errors[:BULK_MAX_ERRORS],
+        "errors_truncated": len(errors) > BULK_MAX_ERRORS,
+        "seconds": round(elapsed, 4),
+        "readings_per_second": round(inserted / elapsed) if elapsed > 0 else inserted
+    }), 201 if inserted else 400
+
 
 # ROUTE: GET /weather/<id>/readings
-# Public endpoint that retrieves all readings for a specific weather station.
+# Public endpoint that retrieves the readings of a specific weather station.
+# Supports ?from= and ?to= time filters and keyset pagination:
+# ?limit= sets the page size and ?cursor= takes the next_cursor of the
+# previous page.
 
 @readings_bp.route("/weather/<string:station_id>/readings", methods=["GET"])
+@conditional(("readings_version",), ("readings_updated_at",))
 def get_readings(station_id):
     oid = _to_objectid(station_id)
     if not oid:
         return jsonify({"error": "Invalid station id"}), 400
 
-    # Retrieve the document for the specified station
-    doc = weather_collection.find_one({"_id": oid}, {"readings": 1, "station_name": 1})
+    # Retrieve the station name only, readings come from the readings store
+    doc = weather_collection.find_one({"_id": oid}, {"station_name": 1})
     if not doc:
         return jsonify({"error": "Station not found"}), 404
 
-    readings = doc.get("readings", [])
-    if not readings:
-        return jsonify({"message": "No readings available for this station"}), 200
-
     # Apply optional date filters (if provided)
     from_date = request.args.get("from")
     to_date = request.args.get("to")
 
-    if from_date:
-        readings = [r for r in readings if r.get("ts") and r["ts"] >= from_date]
-    if to_date:
-        readings = [r for r in readings if r.get("ts") and r["ts"] <= to_date]
+    limit = request.args.get("limit", default=DEFAULT_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    after = None
+    if request.args.get("cursor"):
+        try:
+            after = pagination.decode_reading_cursor(request.args["cursor"])
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+
+    try:
+        # Fetch one extra reading to know whether another page exists
+        matches = readings_store.iter_readings(oid, from_date, to_date, after=after)
+        readings = list(itertools.islice(matches, limit + 1))
+    except ValueError:
+        return jsonify({"error": "Invalid 'from' or 'to' timestamp"}), 400
+
+    next_cursor = None
+    if len(readings) > limit:
+        readings = readings[:limit]
+        next_cursor = pagination.encode_reading_cursor(readings[-1])
+
+    if not readings and not (from_date or to_date or after):
+        return jsonify({"message": "No readings available for this station"}), 200
 
     # Return filtered readings with count
     return jsonify({
         "station": doc.get("station_name"),
         "count": len(readings),
+        "limit": limit,
+        "next_cursor": next_cursor,
         "readings": readings
     }), 200
 
 
+# ROUTE: GET /weather/<id>/readings/export
+# Streams all readings of a station (optionally ?from= / ?to=) as NDJSON
+# or CSV, see export.py for ?format=, ?fields= and ?gzip=.
+
+@readings_bp.route("/weather/<string:station_id>/readings/export", methods=["GET"])
+@jwt_required
+def export_readings(station_id):
+    oid = _to_objectid(station_id)
+    if not oid:
+        return jsonify({"error": "Invalid station id"}), 400
+
+    if not weather_collection.find_one({"_id": oid}, {"_id": 1}):
+        return jsonify({"error": "Station not found"}), 404
+
+    from_date = request.args.get("from")
+    to_date = request.args.get("to")
+    try:
+        for value in (from_date, to_date):
+            if value:
+                readings_store.parse_ts(value)
+        fields = export.requested_fields(["_id", "ts"] + readings_store.METRICS)
+        # Each bucket holds up to BUCKET_SIZE readings
+        batch_size = max(1, export.EXPORT_BATCH_SIZE // readings_store.BUCKET_SIZE)
+        readings = readings_store.iter_readings(oid, from_date, to_date, batch_size=batch_size)
+        return export.stream_response(readings, fields, f"readings-{station_id}")
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+
+
 # ROUTE: PUT /weather/<station_id>/readings/<reading_id>
 # Allows authenticated users to update a specific reading by its ID.
 # Users can modify temperature, humidity, wind speed, pressure, or timestamp.
@@ -118,36 +396,27 @@ def update_reading(station_id, reading_id):
         return jsonify({"error": "Invalid station id"}), 400
 
     # Retrieve updated data
-    data = request.form or request.get_json(silent=True) or {}
+    data = schemas.request_data()
     if not data:
         return jsonify({"error": "Missing update data"}), 400
 
-    update_fields = {}
-
-    # Process possible numeric updates
-    for field in ["temp_c", "humidity", "wind_kmh", "pressure_kpa"]:
-        if field in data:
-            try:
-                update_fields[f"readings.$.{field}"] = float(data[field])
-            except ValueError:
-                return jsonify({"error": f"Invalid numeric value for {field}"}), 400
-
-    # Allow updating timestamp if provided
-    if "ts" in data:
-        update_fields["readings.$.ts"] = data["ts"]
+    # Metrics and/or timestamp, only those that were sent
+    try:
+        update_fields = schemas.READING_UPDATE.parse(data)
+    except schemas.SchemaError as e:
+        return schemas.error_response(e, "Invalid reading data")
 
     # If no valid data was sent, return an error
     if not update_fields:
         return jsonify({"error": "No valid fields to update"}), 400
 
     # Perform the update on the matching reading record
-    result = weather_collection.update_one(
-        {"_id": oid, "readings._id": reading_id},
-        {"$set": update_fields}
-    )
+    updated = readings_store.update_reading(oid, reading_id, update_fields)
 
     # Confirm successful modification
-    if result.modified_count == 1:
+    if updated is not None:
+        rollups.replace_reading(oid, *updated)
+        _readings_changed(oid, station_id)
         return jsonify({"message": "Reading updated successfully"}), 200
     else:
         return jsonify({"error": "Reading not found"}), 404
@@ -164,13 +433,12 @@ def delete_reading(station_id, reading_id):
         return jsonify({"error": "Invalid station id"}), 400
 
     # Remove the reading with the specified ID
-    result = weather_collection.update_one(
-        {"_id": oid},
-        {"$pull": {"readings": {"_id": reading_id}}}
-    )
+    deleted = readings_store.delete_reading(oid, reading_id)
 
     # Confirm deletion success
-    if result.modified_count == 1:
+    if deleted is not None:
+        rollups.remove_reading(oid, deleted)
+        _readings_changed(oid, station_id)
         return jsonify({"message": "Reading deleted successfully"}), 200
     else:
         return jsonify({"error": "Reading not found"}), 404
@@ -2,31 +2,131 @@
 
 from flask import Blueprint, request, jsonify, make_response
 from bson import ObjectId
-from globals import weather_collection
+from globals import weather_collection, alerts_collection
 from decorators import jwt_required, admin_required
+from cache import response_cache
+from conditional import conditional, touch
+import readings_store
+import rollups
+import locations
+import alerts_index
+import alert_rules
+import export
+import pagination
+import comments_store
+import station_model
+import analytics
+import schemas
 import datetime
 
 weather_bp = Blueprint("weather_bp", __name__)
 
+# /weather/stats options
+STATS_GROUP_FIELDS = ["region", "state", "country"]
+STATIONS_PAGE_SIZE = 50
+MAX_STATIONS_PAGE_SIZE = 500
+
+# /weather/alerts page sizes
+ALERTS_PAGE_SIZE = 50
+MAX_ALERTS_PAGE_SIZE = 500
+
+# Station fields available to /weather/export
+EXPORT_FIELDS = ["_id", "station_name", "city", "state", "region", "place", "country",
+                 "avg_temp_c", "max_wind_kmh", "overall_condition", "air_quality_index",
+                 "alerts", "views", "comment_count", "rating_avg", "created_at", "last_updated_at"]
+
+# GET /weather page sizes
+LIST_PAGE_SIZE = 10
+MAX_LIST_PAGE_SIZE = 100
+
+# Heavy or internal fields left out of the list view unless asked for with ?fields=
+LIST_EXCLUDED = {"comments": 0, "readings": 0, **locations.HIDDEN_FIELDS, **alert_rules.HIDDEN_FIELDS}
+
+# Internal fields left out of a single station
+DETAIL_EXCLUDED = {**locations.HIDDEN_FIELDS, **alert_rules.HIDDEN_FIELDS}
+
+# /weather/<id>/trends analysis modes (see analytics.py)
+TREND_MODES = ["stats", "rolling", "resample", "compare"]
+ROLLING_WINDOW = 24
+MAX_COMPARE_STATIONS = 10
+
+
+# HELPER FUNCTION: list_options()
+# Reads the GET /weather arguments into (query, projection, page_size).
+# ?cursor= resumes after the last _id of the previous page; the older
+# ?page= is still honoured through skip (see getAllWeather).
+# Raises ValueError for a bad cursor or field.
+
+def list_options(args):
+    page_size = args.get('size', default=LIST_PAGE_SIZE, type=int)
+    page_size = max(1, min(page_size, MAX_LIST_PAGE_SIZE))
+
+    query = {}
+    if args.get('cursor'):
+        query["_id"] = {"$gt": pagination.decode_id_cursor(args['cursor'])}
+
+    projection = dict(LIST_EXCLUDED)
+    if args.get('fields', '').strip():
+        fields = [field.strip() for field in args['fields'].split(",") if field.strip()]
+        unknown = [field for field in fields if field not in EXPORT_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        projection = dict.fromkeys(fields, 1)
+    return query, projection, page_size
+
+
 # GET /weather
-# PUBLIC - Show all weather data
+# PUBLIC - Show all weather data, one page at a time
+# ?size= page size, ?cursor= next_cursor of the previous page,
+# ?fields=a,b projection, ?count=true adds an (estimated) total
 @weather_bp.route('/weather', methods=['GET'])
+@response_cache.cached(lambda: ["stations"])
 def getAllWeather():
     data_to_return = []
-    page_num = request.args.get('page', default=1, type=int)
-    page_size = request.args.get('size', default=10, type=int)
-    page_start = (page_num - 1) * page_size
 
     try:
-        weather_cursor = weather_collection.find().skip(page_start).limit(page_size)
-        for weather in weather_cursor:
-            weather['_id'] = str(weather['_id'])
-            data_to_return.append(weather)
-        return make_response(jsonify({
+        query, projection, page_size = list_options(request.args)
+    except ValueError as ve:
+        return make_response(jsonify({"error": str(ve)}), 400)
+
+    try:
+        page_num = request.args.get('page', type=int)
+        skip = 0
+        if page_num and not request.args.get('cursor'):
+            skip = (max(page_num, 1) - 1) * page_size
+
+        # Pages of station metadata fields come from the read model if it is up
+        fields = [field for field, include in projection.items() if include]
+        from_model = (fields and len(fields) == len(projection)
+                      and set(fields) <= set(station_model.FIELDS) | {"_id"}
+                      and station_model.model.ready())
+        if from_model:
+            after = query["_id"]["$gt"] if query else None
+            # One extra record tells whether there is a next page
+            for record in station_model.model.page(after, skip, page_size + 1):
+                data_to_return.append(dict(record.to_dict(fields), _id=record._id))
+        else:
+            weather_cursor = weather_collection.find(query, projection).sort("_id", 1).skip(skip)
+            # One extra document tells whether there is a next page
+            for weather in weather_cursor.limit(page_size + 1):
+                data_to_return.append(weather)
+
+        next_cursor = None
+        if len(data_to_return) > page_size:
+            data_to_return = data_to_return[:page_size]
+            next_cursor = pagination.encode_id_cursor(data_to_return[-1])
+
+        result = {
             "count": len(data_to_return),
-            "page": page_num,
+            "size": page_size,
+            "next_cursor": next_cursor,
             "data": data_to_return
-        }), 200)
+        }
+        if page_num:
+            result["page"] = page_num
+        if request.args.get('count', '').lower() in ("1", "true", "yes"):
+            result["total"] = len(station_model.model) if from_model else weather_collection.estimated_document_count()
+        return make_response(jsonify(result), 200)
     except Exception as e:
         return make_response(jsonify({
             "error": "Failed to load weather data",
@@ -35,15 +135,44 @@ def getAllWeather():
 
 
 
+# GET /weather/export
+# USER - Stream stations as NDJSON or CSV (see export.py). Filters:
+# location fields (as on /weather/stats) and ?from= / ?to= on created_at.
+@weather_bp.route('/weather/export', methods=['GET'])
+@jwt_required
+def exportWeather():
+    try:
+        query = locations.location_query(request.args, locations.LOCATION_FIELDS)
+        created = {}
+        if request.args.get("from"):
+            created["$gte"] = readings_store.parse_ts(request.args["from"])
+        if request.args.get("to"):
+            created["$lte"] = readings_store.parse_ts(request.args["to"])
+        if created:
+            query["created_at"] = created
+
+        fields = export.requested_fields(EXPORT_FIELDS)
+        cursor = (weather_collection.find(query, dict.fromkeys(fields, 1))
+                  .sort("_id", 1)
+                  .batch_size(export.EXPORT_BATCH_SIZE))
+        return export.stream_response(cursor, fields, "stations")
+    except ValueError as e:
+        return make_response(jsonify({
+            "Error": "Invalid export options",
+            "Details": str(e)
+        }), 400)
+
+
 # GET /weather/<id>
 # PUBLIC - Get single weather record
 
 @weather_bp.route('/weather/<string:record_id>', methods=['GET'])
+@conditional()
+@response_cache.cached(lambda record_id: [f"station:{record_id}"])
 def getOneWeather(record_id):
     try:
-        weather = weather_collection.find_one({"_id": ObjectId(record_id)})
+        weather = weather_collection.find_one({"_id": ObjectId(record_id)}, DETAIL_EXCLUDED)
         if weather is not None:
-            weather["_id"] = str(weather["_id"])
             return make_response(jsonify(weather), 200)
         else:
             return make_response(jsonify({"Error": "Weather record not found"}), 404)
@@ -61,45 +190,51 @@ def getOneWeather(record_id):
 @jwt_required
 @admin_required
 def addWeather():
-    data = request.form
-
-    if data and "station_name" in data and "city" in data and "country" in data:
-        avg_temp = float(data.get("avg_temp_c", 0))
-        wind_speed = float(data.get("max_wind_kmh", 0))
-
-        # --- -----Automatic Alerts ---  ------#
-        alerts = []
-        if avg_temp > 40:
-            alerts.append(" Heatwave Alert")
-        if avg_temp < 0:
-            alerts.append(" Frost Warning")
-        if wind_speed > 100:
-            alerts.append(" Storm Warning")
-
-        new_weather = {
-            "station_name": data.get("station_name"),
-            "city": data.get("city"),
-            "state": data.get("state", ""),          # Added
-            "region": data.get("region", ""),        # Added
-            "place": data.get("place", ""),          # Added
-            "country": data.get("country"),
-            "avg_temp_c": avg_temp,
-            "max_wind_kmh": wind_speed,
-            "overall_condition": data.get("overall_condition", "Unknown"),
-            "air_quality_index": int(data.get("air_quality_index", 0)),
-            "alerts": alerts,
-            "views": int(data.get("views", 0)),
-            "created_at": datetime.datetime.utcnow(),
-            "comments": []
-        }
-
-        result = weather_collection.insert_one(new_weather)
-        new_weather_id = str(result.inserted_id)
-        new_weather_link = f"http://127.0.0.1:5000/weather/{new_weather_id}"
-
-        return make_response(jsonify({"URL": new_weather_link}), 201)
-    else:
-        return make_response(jsonify({"Error": "Missing required data"}), 400)
+    try:
+        data = schemas.STATION.parse(schemas.request_data())
+    except schemas.SchemaError as e:
+        return schemas.error_response(e, None if e.missing else "Invalid weather data")
+
+    avg_temp = data["avg_temp_c"]
+    wind_speed = data["max_wind_kmh"]
+
+    # --- -----Automatic Alerts ---  ------#
+    # Thresholds are declared in alert_rules.DEFAULT_RULES
+    alerts = alert_rules.get_engine().evaluate_snapshot({"temp_c": avg_temp, "wind_kmh": wind_speed})
+    now = datetime.datetime.utcnow()
+
+    new_weather = {
+        "station_name": data["station_name"],
+        "city": data["city"],
+        "state": data["state"],
+        "region": data["region"],
+        "place": data["place"],
+        "country": data["country"],
+        "avg_temp_c": avg_temp,
+        "max_wind_kmh": wind_speed,
+        "overall_condition": data["overall_condition"],
+        "air_quality_index": data["air_quality_index"],
+        "alerts": alerts,
+        "views": data["views"],
+        "created_at": now,
+        "last_updated_at": now,
+        "version": 1,
+        # Totals of the comments collection (see comments_store.py)
+        "comment_count": 0,
+        "rating_sum": 0,
+        "rating_avg": None
+    }
+    # Normalized location keys used by the stats/alerts filters
+    new_weather.update(locations.location_keys(new_weather))
+
+    result = weather_collection.insert_one(new_weather)
+    alerts_index.sync_station(new_weather)
+    station_model.model.refresh(result.inserted_id)
+    response_cache.invalidate("stations")
+    new_weather_id = str(result.inserted_id)
+    new_weather_link = f"http://127.0.0.1:5000/weather/{new_weather_id}"
+
+    return make_response(jsonify({"URL": new_weather_link}), 201)
 
 
 # PUT /weather/<id>
@@ -108,34 +243,50 @@ def addWeather():
 @jwt_required
 @admin_required
 def updateWeather(record_id):
-    data = request.form
-    update_field = {}
-
-    # Update text fields
-    for key in ["station_name", "city", "state", "region", "place", "country", "overall_condition"]:
-        if data.get(key):
-            update_field[key] = data.get(key)
-
-    # Update numeric fields
-    for key, cast in [("avg_temp_c", float), ("max_wind_kmh", float),
-                      ("air_quality_index", int), ("views", int)]:
-        if data.get(key):
-            try:
-                update_field[key] = cast(data.get(key))
-            except:
-                return make_response(jsonify({"Error": f"Invalid value for {key}"}), 400)
+    try:
+        update_field = schemas.STATION_UPDATE.parse(schemas.request_data())
+    except schemas.SchemaError as e:
+        return schemas.error_response(e, "Invalid weather data")
 
     if not update_field:
         return make_response(jsonify({"Error": "No valid data passed"}), 400)
 
-    update_field["last_updated_at"] = datetime.datetime.utcnow()
-
     try:
+        # Location changes also refresh the normalized lookup keys
+        if any(key in update_field for key in locations.LOCATION_FIELDS):
+            current = weather_collection.find_one(
+                {"_id": ObjectId(record_id)},
+                {field: 1 for field in locations.LOCATION_FIELDS}
+            ) or {}
+            update_field.update(locations.location_keys(dict(current, **update_field)))
+
+        # New station-level values re-run the alert rules
+        if any(field in update_field for field in alert_rules.STATION_FIELDS.values()):
+            current = weather_collection.find_one(
+                {"_id": ObjectId(record_id)},
+                {"avg_temp_c": 1, "max_wind_kmh": 1, "alerts": 1, "alert": 1}
+            ) or {}
+            update_field["alerts"] = alert_rules.snapshot_alerts(
+                alerts_index.station_alerts(current),
+                alert_rules.station_values(dict(current, **update_field))
+            )
+
+        # Bumps the version and sets last_updated_at
+        update = touch()
+        update["$set"].update(update_field)
+        if "alerts" in update_field:
+            # Re-evaluated alerts restart the rule windows (see alert_rules.py)
+            update["$unset"] = {"rule_windows": ""}
+            update["$inc"]["rule_seq"] = 1
+
         results = weather_collection.update_one(
             {"_id": ObjectId(record_id)},
-            {"$set": update_field}
+            update
         )
         if results.modified_count == 1:
+            alerts_index.sync_station_by_id(ObjectId(record_id))
+            station_model.model.refresh(ObjectId(record_id))
+            response_cache.invalidate("stations", f"station:{record_id}")
             updated_weather_link = f"http://127.0.0.1:5000/weather/{record_id}"
             return make_response(jsonify({"URL": updated_weather_link}), 200)
         else:
@@ -154,8 +305,15 @@ def updateWeather(record_id):
 @admin_required
 def deleteWeather(record_id):
     try:
-        results = weather_collection.delete_one({"_id": ObjectId(record_id)})
+        oid = ObjectId(record_id)
+        results = weather_collection.delete_one({"_id": oid})
         if results.deleted_count == 1:
+            readings_store.delete_station_readings(oid)
+            rollups.delete_station(oid)
+            comments_store.delete_station_comments(oid)
+            alerts_index.remove_station(oid)
+            station_model.model.discard(oid)
+            response_cache.invalidate("stations", "readings", f"station:{record_id}")
             return make_response(jsonify({"message": "Weather record deleted"}), 200)
         else:
             return make_response(jsonify({"Error": "Record not found"}), 404)
@@ -169,66 +327,121 @@ def deleteWeather(record_id):
 # GET /weather/stats
 # PUBLIC - Analyze weather stats by region/state/place
 @weather_bp.route('/weather/stats', methods=['GET'])
+@response_cache.cached(lambda: ["stations"])
 def getWeatherStats():
     """
     Returns average temperature, air quality index, and wind speed
     for a specific region, state, or place.
+    Filters match case- and accent-insensitively by prefix; use
+    match=exact for whole values or match=contains for substrings.
+    Averages are computed by MongoDB ($group), reading only the fields used,
+    or from the in-process station model when it is enabled (station_model.py).
+
+    Optional arguments:
+        group_by=region|state|country  — one set of averages per group
+        include_stations=true          — add a page of matching station names
+                                         (stations_page / stations_size)
     Example:
         /weather/stats?region=England
         /weather/stats?state=California
         /weather/stats?place=Tokyo
+        /weather/stats?region=land&match=contains
+        /weather/stats?group_by=region
+        /weather/stats?region=England&include_stations=true&stations_page=2
     """
     try:
         region = request.args.get("region", "").strip()
         state = request.args.get("state", "").strip()
         place = request.args.get("place", "").strip()
+        group_by = request.args.get("group_by", "").strip()
 
-        if not (region or state or place):
+        if group_by and group_by not in STATS_GROUP_FIELDS:
+            return make_response(jsonify({
+                "error": f"group_by must be one of {', '.join(STATS_GROUP_FIELDS)}"
+            }), 400)
+
+        if not (region or state or place or group_by):
             return make_response(jsonify({
                 "error": "Missing filter parameter. Example: /weather/stats?region=England"
             }), 400)
 
-        query = {}
-        if region:
-            query["region"] = {"$regex": region, "$options": "i"}
-        if state:
-            query["state"] = {"$regex": state, "$options": "i"}
-        if place:
-            query["place"] = {"$regex": place, "$options": "i"}
-
-        cursor = weather_collection.find(query)
-
-        temps, winds, aqi = [], [], []
-        count = 0
-        stations = []
-
-        for doc in cursor:
-            count += 1
-            doc["_id"] = str(doc["_id"])
-            stations.append(doc.get("station_name", "Unknown Station"))
-            temps.append(float(doc.get("avg_temp_c", 0)))
-            winds.append(float(doc.get("max_wind_kmh", 0)))
-            aqi.append(int(doc.get("air_quality_index", 0)))
-
-        if count == 0:
+        try:
+            query = locations.location_query(request.args, ["region", "state", "place"])
+        except ValueError as ve:
+            return make_response(jsonify({"error": str(ve)}), 400)
+
+        # Groups on the normalized key, labelled with one of the raw values.
+        # Missing values count as 0, as they always have for this endpoint.
+        group = {
+            "_id": f"$loc.{group_by}" if group_by else None,
+            "total_stations": {"$sum": 1},
+            "avg_temp": {"$avg": {"$ifNull": ["$avg_temp_c", 0]}},
+            "avg_wind": {"$avg": {"$ifNull": ["$max_wind_kmh", 0]}},
+            "avg_aqi": {"$avg": {"$ifNull": ["$air_quality_index", 0]}}
+        }
+        projection = {"avg_temp_c": 1, "max_wind_kmh": 1, "air_quality_index": 1}
+        if group_by:
+            group["label"] = {"$first": f"${group_by}"}
+            projection[group_by] = 1
+            projection[f"loc.{group_by}"] = 1
+
+        # The in-process read model answers without a round-trip when it is up
+        records = None
+        if station_model.model.ready():
+            records = station_model.model.select(request.args, ["region", "state", "place"])
+            buckets = station_model.stats_buckets(records, group_by)
+        else:
+            pipeline = [{"$match": query}, {"$project": projection}, {"$group": group}]
+            if group_by:
+                pipeline.append({"$sort": {"total_stations": -1, "_id": 1}})
+            buckets = list(weather_collection.aggregate(pipeline))
+
+        if not buckets:
             return make_response(jsonify({
                 "message": "No weather data found for given filters"
             }), 404)
 
-        # Compute averages
-        avg_temp = sum(temps) / len(temps)
-        avg_wind = sum(winds) / len(winds)
-        avg_aqi = sum(aqi) / len(aqi)
+        filters = {"region": region, "state": state, "place": place}
 
+        if group_by:
+            return make_response(jsonify({
+                "filters": filters,
+                "group_by": group_by,
+                "total_stations": sum(b["total_stations"] for b in buckets),
+                "groups": [{
+                    group_by: b.get("label"),
+                    "total_stations": b["total_stations"],
+                    "avg_temperature_c": round(b["avg_temp"], 2),
+                    "avg_wind_speed_kmh": round(b["avg_wind"], 2),
+                    "avg_air_quality_index": round(b["avg_aqi"], 2)
+                } for b in buckets]
+            }), 200)
+
+        totals = buckets[0]
         stats = {
-            "filters": {"region": region, "state": state, "place": place},
-            "total_stations": count,
-            "avg_temperature_c": round(avg_temp, 2),
-            "avg_wind_speed_kmh": round(avg_wind, 2),
-            "avg_air_quality_index": round(avg_aqi, 2),
-            "stations_included": stations
+            "filters": filters,
+            "total_stations": totals["total_stations"],
+            "avg_temperature_c": round(totals["avg_temp"], 2),
+            "avg_wind_speed_kmh": round(totals["avg_wind"], 2),
+            "avg_air_quality_index": round(totals["avg_aqi"], 2)
         }
 
+        # Station names are optional and paginated
+        if request.args.get("include_stations", "").lower() in ("1", "true", "yes"):
+            stations_page = max(request.args.get("stations_page", default=1, type=int), 1)
+            stations_size = request.args.get("stations_size", default=STATIONS_PAGE_SIZE, type=int)
+            stations_size = max(1, min(stations_size, MAX_STATIONS_PAGE_SIZE))
+            start = (stations_page - 1) * stations_size
+            if records is not None:
+                cursor = [record.to_dict(["station_name"]) for record in records[start:start + stations_size]]
+            else:
+                cursor = (weather_collection.find(query, {"station_name": 1})
+                          .sort("_id", 1)
+                          .skip(start)
+                          .limit(stations_size))
+            stats["stations_page"] = stations_page
+            stats["stations_included"] = [doc.get("station_name", "Unknown Station") for doc in cursor]
+
         return make_response(jsonify(stats), 200)
 
     except Exception as e:
@@ -241,55 +454,55 @@ def getWeatherStats():
 # GET /weather/alerts
 # PUBLIC - Show weather alerts (with filters + summary)
 @weather_bp.route('/weather/alerts', methods=['GET'])
+@response_cache.cached(lambda: ["stations"])
 def getWeatherAlerts():
     """
-    Returns all weather records that have alerts ( Heatwave,  Storm, etc.)
-    Works with both 'alert' and 'alerts' fields.
-    Supports optional filtering by 'region', 'state', or 'city/place'.
+    Returns the weather records that have alerts ( Heatwave,  Storm, etc.)
+    from the materialized alerts index, one page at a time ('page', 'size').
+    Supports optional filtering by 'region', 'state', or 'city/place',
+    matched the same way as /weather/stats (see the 'match' argument).
+    The summary comes from precomputed counters when no filter other than
+    'region' is used.
 
     Example:
         /weather/alerts
         /weather/alerts?region=England
         /weather/alerts?state=California
-        /weather/alerts?city=Tokyo
+        /weather/alerts?city=Tokyo&page=2&size=20
     """
     try:
         region = request.args.get("region", "").strip()
         state = request.args.get("state", "").strip()
         city = request.args.get("city", "").strip()
         place = request.args.get("place", "").strip()
+        mode = request.args.get("match", "prefix")
 
-        query = {
-            "$or": [
-                {"alerts": {"$exists": True, "$ne": []}},
-                {"alert": {"$exists": True, "$ne": []}}
-            ]
-        }
+        page_num = max(request.args.get('page', default=1, type=int), 1)
+        page_size = request.args.get('size', default=ALERTS_PAGE_SIZE, type=int)
+        page_size = max(1, min(page_size, MAX_ALERTS_PAGE_SIZE))
 
-        if region:
-            query["region"] = {"$regex": region, "$options": "i"}
-        if state:
-            query["state"] = {"$regex": state, "$options": "i"}
-        if city:
-            query["city"] = {"$regex": city, "$options": "i"}
-        if place:
-            query["place"] = {"$regex": place, "$options": "i"}
-
-        alert_cursor = weather_collection.find(
-            query,
-            {"station_name": 1, "city": 1, "state": 1, "region": 1, "place": 1,
-             "country": 1, "alerts": 1, "alert": 1}
-        )
+        try:
+            query = locations.location_query(request.args, ["region", "state", "city", "place"])
+        except ValueError as ve:
+            return make_response(jsonify({"error": str(ve)}), 400)
 
-        alert_data = []
-        summary = {}
+        total = alerts_collection.count_documents(query)
+        if not total:
+            location_text = region or state or city or place or "all locations"
+            return make_response(jsonify({
+                "message": f"No weather alerts found for {location_text}."
+            }), 404)
 
-        for alert_doc in alert_cursor:
-            alert_doc["_id"] = str(alert_doc["_id"])
-            alerts_list = alert_doc.get("alerts") or alert_doc.get("alert") or []
-            if not alerts_list:
-                continue
+        if not query:
+            summary = alerts_index.summary_from_counters()
+        elif region and not (state or city or place) and mode != "contains":
+            region_clause = locations.match_filter("region", region, mode)["loc.region"]
+            summary = alerts_index.summary_from_counters(region_clause)
+        else:
+            summary = alerts_index.summary_for(query)
 
+        alert_data = []
+        for alert_doc in alerts_index.list_alerts(query, (page_num - 1) * page_size, page_size):
             alert_data.append({
                 "station_name": alert_doc.get("station_name"),
                 "city": alert_doc.get("city"),
@@ -297,20 +510,13 @@ def getWeatherAlerts():
                 "region": alert_doc.get("region"),
                 "place": alert_doc.get("place"),
                 "country": alert_doc.get("country"),
-                "alerts": alerts_list
+                "alerts": alert_doc.get("alerts", [])
             })
 
-            for alert_type in alerts_list:
-                summary[alert_type] = summary.get(alert_type, 0) + 1
-
-        if not alert_data:
-            location_text = region or state or city or place or "all locations"
-            return make_response(jsonify({
-                "message": f"No weather alerts found for {location_text}."
-            }), 404)
-
         return make_response(jsonify({
-            "count": len(alert_data),
+            "count": total,
+            "page": page_num,
+            "size": page_size,
             "filtered_by": region or state or city or place or "all",
             "summary_by_alert_type": summary,
             "alerts": alert_data
@@ -322,36 +528,189 @@ def getWeatherAlerts():
             "details": str(e)
         }), 500)
 
-# GET /weather/<id>/trends
-# PUBLIC - Analyze weather readings (avg/min/max)
+# HELPER FUNCTION: compare_station_ids()
+# The other stations of ?mode=compare (?stations=id,id,...) as ObjectIds.
+# Raises ValueError for an invalid id or too many stations.
+
+def compare_station_ids(args):
+    ids = [value.strip() for value in args.get("stations", "").split(",") if value.strip()]
+    if len(ids) > MAX_COMPARE_STATIONS:
+        raise ValueError(f"At most {MAX_COMPARE_STATIONS} stations can be compared")
+    try:
+        return [ObjectId(value) for value in ids]
+    except Exception:
+        raise ValueError("Invalid station id in 'stations'")
+
+
+def _trend_tags(record_id):
+    tags = [f"station:{record_id}", f"readings:{record_id}"]
+    if request.args.get("mode") == "compare":
+        try:
+            tags += [f"readings:{oid}" for oid in compare_station_ids(request.args)]
+        except ValueError:
+            pass
+    return tags
+
+
+# HELPER FUNCTION: trend_analysis()
+# Answers the ?mode= variants of /weather/<id>/trends from the station's
+# readings, loaded as NumPy arrays (see analytics.py).
+
+def trend_analysis(oid, record, mode):
+    if mode not in TREND_MODES:
+        return make_response(jsonify({"Error": f"mode must be one of {', '.join(TREND_MODES)}"}), 400)
+    if not analytics.available():
+        return make_response(jsonify({"Error": "Trend analysis modes require numpy on the server"}), 501)
+
+    from_ts, to_ts = request.args.get("from"), request.args.get("to")
+    metric = request.args.get("metric", "temp_c")
+    if metric not in readings_store.METRICS:
+        return make_response(jsonify({"Error": f"metric must be one of {', '.join(readings_store.METRICS)}"}), 400)
+
+    try:
+        for value in (from_ts, to_ts):
+            if value:
+                readings_store.parse_ts(value)
+    except ValueError:
+        return make_response(jsonify({"Error": "Invalid 'from' or 'to' timestamp"}), 400)
+
+    try:
+        percentiles = analytics.DEFAULT_PERCENTILES
+        if request.args.get("percentiles"):
+            percentiles = [float(p) for p in request.args["percentiles"].split(",") if p.strip()]
+            if not all(0 <= p <= 100 for p in percentiles):
+                raise ValueError
+    except ValueError:
+        return make_response(jsonify({"Error": "percentiles must be numbers between 0 and 100"}), 400)
+
+    result = {
+        "station_name": record.get("station_name"),
+        "city": record.get("city"),
+        "mode": mode,
+        "filters": {"from": from_ts, "to": to_ts}
+    }
+    try:
+        if mode == "compare":
+            others = compare_station_ids(request.args)
+            names = {doc["_id"]: doc.get("station_name")
+                     for doc in weather_collection.find({"_id": {"$in": others}}, {"station_name": 1})}
+            missing = [str(other) for other in others if other not in names]
+            if missing:
+                return make_response(jsonify({"Error": f"Station not found: {', '.join(missing)}"}), 404)
+            stations = [(oid, record.get("station_name"))] + [(other, names[other]) for other in others]
+            result["metric"] = metric
+            result["stations"] = analytics.compare(stations, metric, from_ts, to_ts, percentiles)
+            return make_response(jsonify(result), 200)
+
+        metrics = readings_store.METRICS if mode == "stats" else [metric]
+        ts, values = analytics.load(oid, from_ts, to_ts, metrics)
+        if mode == "stats":
+            result["total_readings"] = int(ts.size)
+            result["metrics"] = {name: analytics.describe(values[name], percentiles) for name in metrics}
+        elif mode == "rolling":
+            window = request.args.get("window", default=ROLLING_WINDOW, type=int)
+            result.update(metric=metric, window=window)
+            result["series"] = analytics.rolling_mean(ts, values[metric], window)
+            result["count"] = len(result["series"])
+        else:
+            granularity = request.args.get("granularity", "hour")
+            result.update(metric=metric, granularity=granularity)
+            result["series"] = analytics.resample(ts, values[metric], granularity)
+            result["count"] = len(result["series"])
+    except ValueError as ve:
+        return make_response(jsonify({"Error": str(ve)}), 400)
+    return make_response(jsonify(result), 200)
+
+
 # GET /weather/<id>/trends
 # PUBLIC - Analyze weather readings for one station
 @weather_bp.route('/weather/<string:record_id>/trends', methods=['GET'])
+@conditional(("version", "readings_version"), ("last_updated_at", "readings_updated_at"),
+             applies=lambda: request.args.get("mode") != "compare")
+@response_cache.cached(_trend_tags)
 def get_weather_trends(record_id):
+    """
+    Returns avg/min/max of a station's readings, read from its
+    incrementally maintained rollups.
+    With ?granularity=hour or ?granularity=day it returns one entry per
+    hour/day instead, optionally limited by 'from'/'to'.
+
+    With ?mode= the readings themselves are analyzed (needs numpy):
+        mode=stats     — count/mean/std/min/max and ?percentiles= (default
+                         5,25,50,75,95) of every metric
+        mode=rolling   — moving average of ?metric= (default temp_c) over
+                         ?window= readings (default 24)
+        mode=resample  — ?metric= per ?granularity=hour|day
+        mode=compare   — statistics of ?metric= for this station and the
+                         ?stations=id,id,... (at most 10)
+    All modes accept 'from'/'to'.
+
+    Example:
+        /weather/<id>/trends
+        /weather/<id>/trends?granularity=day&from=2025-01-01
+        /weather/<id>/trends?mode=stats&percentiles=50,90,99
+        /weather/<id>/trends?mode=rolling&metric=wind_kmh&window=12
+        /weather/<id>/trends?mode=compare&stations=<id2>,<id3>&metric=humidity
+    """
     try:
-        record = weather_collection.find_one({"_id": ObjectId(record_id)})
+        oid = ObjectId(record_id)
+        record = weather_collection.find_one({"_id": oid}, {"station_name": 1, "city": 1})
         if not record:
             return make_response(jsonify({"Error": "Station not found"}), 404)
 
-        readings = record.get("readings", [])
-        if not readings:
-            return make_response(jsonify({"message": "No readings available"}), 404)
+        mode = request.args.get("mode")
+        if mode:
+            return trend_analysis(oid, record, mode)
+
+        granularity = request.args.get("granularity")
+        if granularity:
+            if granularity not in ("hour", "day"):
+                return make_response(jsonify({"Error": "granularity must be 'hour' or 'day'"}), 400)
+            try:
+                docs = rollups.get_series(oid, granularity,
+                                          request.args.get("from"), request.args.get("to"))
+                series = []
+                for doc in docs:
+                    stats = rollups.describe(doc)
+                    series.append({
+                        "period_start": doc["period_start"].isoformat(),
+                        "total_readings": stats["count"],
+                        "avg_temp": round(stats["temp_c"]["avg"], 2),
+                        "min_temp": stats["temp_c"]["min"],
+                        "max_temp": stats["temp_c"]["max"],
+                        "avg_humidity": round(stats["humidity"]["avg"], 2),
+                        "avg_wind_kmh": round(stats["wind_kmh"]["avg"], 2)
+                    })
+            except ValueError:
+                return make_response(jsonify({"Error": "Invalid 'from' or 'to' timestamp"}), 400)
 
-        # Extract numeric data
-        temps = [r.get("temperature_c", 0) for r in readings]
-        humidity = [r.get("humidity_pct", 0) for r in readings]
-        wind = [r.get("wind_speed_kmh", 0) for r in readings]
+            return make_response(jsonify({
+                "station_name": record.get("station_name"),
+                "city": record.get("city"),
+                "granularity": granularity,
+                "count": len(series),
+                "series": series
+            }), 200)
+
+        # Stations with readings but no rollups yet (e.g. not backfilled)
+        # get them built once; stations without readings skip the rebuild
+        overall = rollups.get_overall(oid)
+        if overall is None and readings_store.has_readings(oid) and rollups.rebuild_station(oid):
+            overall = rollups.get_overall(oid)
+        if overall is None:
+            return make_response(jsonify({"message": "No readings available"}), 404)
 
-        # Compute trends
+        stats = rollups.describe(overall)
         trends = {
             "station_name": record.get("station_name"),
             "city": record.get("city"),
-            "total_readings": len(readings),
-            "avg_temp": round(sum(temps) / len(temps), 2),
-            "min_temp": min(temps),
-            "max_temp": max(temps),
-            "avg_humidity": round(sum(humidity) / len(humidity), 2),
-            "avg_wind_kmh": round(sum(wind) / len(wind), 2)
+            "total_readings": stats["count"],
+            "avg_temp": round(stats["temp_c"]["avg"], 2),
+            "min_temp": stats["temp_c"]["min"],
+            "max_temp": stats["temp_c"]["max"],
+            "std_temp": round(stats["temp_c"]["std"], 2),
+            "avg_humidity": round(stats["humidity"]["avg"], 2),
+            "avg_wind_kmh": round(stats["wind_kmh"]["avg"], 2)
         }
 
         return make_response(jsonify(trends), 200)
@@ -365,32 +724,54 @@ def get_weather_trends(record_id):
 # GET /weather/trends/all
 # PUBLIC - Analyze all weather stations (global trends)
 @weather_bp.route('/weather/trends/all', methods=['GET'])
+@response_cache.cached(lambda: ["stations", "readings"])
 def get_all_weather_trends():
-    try:
-        records = list(weather_collection.find())
-        if not records:
-            return make_response(jsonify({"message": "No weather data found"}), 404)
+    """
+    Returns global avg/min/max over every reading, computed by a MongoDB
+    aggregation so memory stays flat however many readings exist.
+    Supports optional 'from'/'to' timestamps and a 'region' filter.
 
-        temps, humidity, wind = [], [], []
+    Example:
+        /weather/trends/all
+        /weather/trends/all?region=England&from=2025-01-01&to=2025-01-31
+    """
+    try:
+        region = request.args.get("region", "").strip()
+        from_date = request.args.get("from")
+        to_date = request.args.get("to")
+
+        try:
+            station_query = locations.location_query(request.args, ["region"])
+        except ValueError as ve:
+            return make_response(jsonify({"Error": str(ve)}), 400)
+
+        station_ids = None
+        if station_query:
+            station_ids = [doc["_id"] for doc in weather_collection.find(station_query, {"_id": 1})]
+            total_stations = len(station_ids)
+        else:
+            total_stations = weather_collection.count_documents({})
 
-        for r in records:
-            if "readings" in r:
-                for item in r["readings"]:
-                    temps.append(item.get("temperature_c", 0))
-                    humidity.append(item.get("humidity_pct", 0))
-                    wind.append(item.get("wind_speed_kmh", 0))
+        if not total_stations:
+            return make_response(jsonify({"message": "No weather data found"}), 404)
 
-        if not temps:
+        try:
+            summary = readings_store.summarize(station_ids, from_date, to_date)
+        except ValueError:
+            return make_response(jsonify({"Error": "Invalid 'from' or 'to' timestamp"}), 400)
+        if not summary:
             return make_response(jsonify({"message": "No readings found"}), 404)
 
         global_trends = {
-            "total_stations": len(records),
-            "total_readings": len(temps),
-            "avg_temp": round(sum(temps) / len(temps), 2),
-            "avg_humidity": round(sum(humidity) / len(humidity), 2),
-            "avg_wind_kmh": round(sum(wind) / len(wind), 2),
-            "min_temp": min(temps),
-            "max_temp": max(temps)
+            "filters": {"region": region, "from": from_date, "to": to_date},
+            "total_stations": total_stations,
+            "stations_with_readings": summary["stations_with_readings"],
+            "total_readings": summary["count"],
+            "avg_temp": round(summary["avg_temp"] or 0, 2),
+            "avg_humidity": round(summary["avg_humidity"] or 0, 2),
+            "avg_wind_kmh": round(summary["avg_wind_kmh"] or 0, 2),
+            "min_temp": summary["min_temp"],
+            "max_temp": summary["max_temp"]
         }
 
         return make_response(jsonify(global_trends), 200)
@@ -398,4 +779,4 @@ def get_all_weather_trends():
         return make_response(jsonify({
             "Error": "Failed to calculate global trends",
             "Details": str(e)
-        }), 500)
\ No newline at end of file
+        }), 500)
@@ -0,0 +1,183 @@
+# RESPONSE CACHE — TTL + LRU cache for the public GET endpoints
+#
+# Cached responses are keyed by route and normalized query arguments.
+# Each cached route also declares the "tags" its data depends on
+# (e.g. "stations", "station:<id>", "readings:<id>"). Every tag has a
+# generation counter that is part of the cache key, so a write only has to
+# bump the counters of the tags it touches: entries built from the old
+# data are never looked up again and age out through TTL/LRU.
+#
+# Two backends are available:
+#   MemoryBackend — in-process OrderedDict with a size bound (default)
+#   RedisBackend  — any client with Redis-style get/set(ex=)/incr, which
+#                   lets several worker processes share one cache
+# A different backend (e.g. a fake Redis client in tests) can be plugged
+# in with response_cache.configure(backend=...).
+
+from flask import request, make_response, g
+from functools import wraps
+from collections import OrderedDict
+from globals import settings
+import threading
+import time
+import json
+
+
+class MemoryBackend:
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries if max_entries is not None else settings["CACHE_MAX_ENTRIES"]
+        self._entries = OrderedDict()   # key -> (expires_at, value)
+        self._counters = {}             # tag generations, never evicted
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_counter(self, key):
+        return self._counters.get(key, 0)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._counters.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    def __init__(self, client, prefix="weather:cache:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, json.dumps(value), ex=ttl)
+
+    def get_counter(self, key):
+        raw = self.client.get(self.prefix + "gen:" + key)
+        return int(raw) if raw is not None else 0
+
+    def incr(self, key):
+        return self.client.incr(self.prefix + "gen:" + key)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + "*"):
+            self.client.delete(key)
+
+    def __len__(self):
+        return sum(1 for _ in self.client.scan_iter(self.prefix + "*"))
+
+
+class ResponseCache:
+    def __init__(self, backend, ttl=None):
+        self.backend = backend
+        self.ttl = ttl if ttl is not None else settings["CACHE_TTL_SECONDS"]
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def configure(self, backend=None, ttl=None):
+        if backend is not None:
+            self.backend = backend
+        if ttl is not None:
+            self.ttl = ttl
+
+    # Cache key of a request to `path` with query `args`; routes behind
+    # conditional() also key on the document version (`etag`).
+    def key_for(self, path, args, tags, etag=""):
+        query = "&".join(f"{k}={v}" for k, v in sorted(args.items(multi=True)))
+        generations = ",".join(f"{tag}@{self.backend.get_counter(tag)}" for tag in tags)
+        return f"{path}?{query}|{generations}|{etag}"
+
+    def _key(self, tags):
+        return self.key_for(request.path, request.args, tags, g.get("etag", ""))
+
+    # The stored entry for `key` (counted as a hit) or None (a miss).
+    def lookup(self, key):
+        entry = self.backend.get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def store(self, key, body, status, content_type):
+        self.backend.set(key, {"body": body, "status": status, "content_type": content_type}, self.ttl)
+
+    # DECORATOR: cached(tags)
+    # `tags` receives the view's URL arguments and returns the tags the
+    # response depends on. Only 200 responses are stored.
+    def cached(self, tags):
+        def decorator(func):
+            @wraps(func)
+            def cached_wrapper(*args, **kwargs):
+                key = self._key(tags(**kwargs))
+                entry = self.lookup(key)
+                if entry is not None:
+                    response = make_response(entry["body"], entry["status"])
+                    response.content_type = entry["content_type"]
+                    response.headers["X-Cache"] = "HIT"
+                    return response
+
+                response = make_response(func(*args, **kwargs))
+                if response.status_code == 200:
+                    self.store(key, response.get_data(as_text=True), response.status_code,
+                               response.content_type)
+                response.headers["X-Cache"] = "MISS"
+                return response
+            return cached_wrapper
+        return decorator
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            self.backend.incr(tag)
+        self.invalidations += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0,
+            "invalidations": self.invalidations
+        }
+
+
+# Backend for the given (default: current) settings
+def backend_for(redis_url=None, max_entries=None):
+    if redis_url is None:
+        redis_url = settings["REDIS_URL"]
+    if redis_url:
+        import redis
+        return RedisBackend(redis.Redis.from_url(redis_url))
+    return MemoryBackend(max_entries)
+
+
+response_cache = ResponseCache(backend_for())
@@ -0,0 +1,127 @@
+# COMMENTS STORE — Station comments in their own collection
+#
+# Comments used to be $push-ed into an embedded `comments` array on the
+# station, so every comment read pulled the whole station document and the
+# array grew without bound. They now live in the comments collection:
+#
+#   {
+#       "_id": str,                # uuid, as before
+#       "station_id": ObjectId,
+#       "username": str,
+#       "comment": str,
+#       "rating": int,
+#       "created_at": datetime
+#   }
+#
+# and are read a page at a time, newest first or best rated first, with a
+# keyset cursor (indexes are declared in indexes.py). Each station keeps
+# running totals for list views, updated with every comment change:
+#   comment_count, rating_sum, rating_avg
+
+from pymongo import ReturnDocument, DESCENDING
+from globals import comments_collection, weather_collection
+from conditional import touch
+import datetime
+
+# Sort orders for page(): name -> key fields, all descending
+SORTS = {
+    "newest": ["created_at", "_id"],
+    "rating": ["rating", "created_at", "_id"],
+}
+
+# Fields returned to API clients
+PUBLIC_FIELDS = {"station_id": 0}
+
+
+# Adjusts the station's comment totals and bumps its version, in one
+# pipeline update so rating_avg is derived from the updated totals.
+def _update_station(station_oid, count_delta, rating_delta):
+    update = touch()
+    stage = dict(update["$set"], **{
+        "version": {"$add": [{"$ifNull": ["$version", 0]}, 1]},
+        "comment_count": {"$add": [{"$ifNull": ["$comment_count", 0]}, count_delta]},
+        "rating_sum": {"$add": [{"$ifNull": ["$rating_sum", 0]}, rating_delta]},
+    })
+    average = {"$set": {"rating_avg": {"$cond": [
+        {"$gt": ["$comment_count", 0]},
+        {"$round": [{"$divide": ["$rating_sum", "$comment_count"]}, 2]},
+        None
+    ]}}}
+    return weather_collection.update_one({"_id": station_oid}, [{"$set": stage}, average])
+
+
+def add_comment(station_oid, comment):
+    comments_collection.insert_one(dict(comment, station_id=station_oid))
+    _update_station(station_oid, 1, comment["rating"])
+
+
+# Applies `changes` to a comment; returns False if it does not exist.
+def update_comment(station_oid, comment_id, changes):
+    previous = comments_collection.find_one_and_update(
+        {"_id": comment_id, "station_id": station_oid},
+        {"$set": changes},
+        projection={"rating": 1},
+        return_document=ReturnDocument.BEFORE
+    )
+    if previous is None:
+        return False
+    rating_delta = changes.get("rating", previous.get("rating", 0)) - previous.get("rating", 0)
+    _update_station(station_oid, 0, rating_delta)
+    return True
+
+
+# Deletes a comment; returns False if it does not exist.
+def delete_comment(station_oid, comment_id):
+    deleted = comments_collection.find_one_and_delete(
+        {"_id": comment_id, "station_id": station_oid},
+        projection={"rating": 1}
+    )
+    if deleted is None:
+        return False
+    _update_station(station_oid, -1, -deleted.get("rating", 0))
+    return True
+
+
+def delete_station_comments(station_oid):
+    return comments_collection.delete_many({"station_id": station_oid}).deleted_count
+
+
+def cursor_key(comment, sort):
+    key = []
+    for field in SORTS[sort]:
+        value = comment[field]
+        key.append(value.isoformat() if isinstance(value, datetime.datetime) else value)
+    return key
+
+
+def _after_clause(sort, key):
+    fields = SORTS[sort]
+    if len(key) != len(fields):
+        raise ValueError("Invalid cursor")
+    values = []
+    for field, value in zip(fields, key):
+        if field == "created_at":
+            value = datetime.datetime.fromisoformat(value)
+        values.append(value)
+
+    # (a < x) or (a == x and b < y) or ... for a descending keyset
+    branches = []
+    for i, field in enumerate(fields):
+        branch = {fields[j]: values[j] for j in range(i)}
+        branch[field] = {"$lt": values[i]}
+        branches.append(branch)
+    return {"$or": branches}
+
+
+# Returns up to `limit` + 1 comments of a station in the given sort order,
+# after the cursor key `after` (from cursor_key() of the last comment of
+# the previous page). Raises ValueError for a malformed key.
+def page(station_oid, sort="newest", after=None, limit=50):
+    query = {"station_id": station_oid}
+    if after is not None:
+        try:
+            query.update(_after_clause(sort, after))
+        except (TypeError, ValueError):
+            raise ValueError("Invalid cursor")
+    order = [(field, DESCENDING) for field in SORTS[sort]]
+    return list(comments_collection.find(query, PUBLIC_FIELDS).sort(order).limit(limit + 1))
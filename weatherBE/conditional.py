@@ -0,0 +1,103 @@
+# CONDITIONAL GET — ETag / Last-Modified support for read endpoints
+#
+# Station documents carry version counters that every mutating route bumps:
+#   version             — station fields and comments
+#   readings_version    — readings of the station
+# together with the matching last-modified timestamps (last_updated_at,
+# readings_updated_at). A conditional GET only reads those few fields; if
+# the client's If-None-Match / If-Modified-Since still matches, a 304 is
+# returned without loading or serializing the document body.
+
+from flask import request, make_response, g
+from functools import wraps
+from bson import ObjectId
+from globals import weather_collection
+import hashlib
+import datetime
+
+
+# HELPER FUNCTION: touch()
+# Marks a station as changed: bumps the given version counter and sets its
+# last-modified timestamp. Returns the update document so callers can merge
+# it with their own $set/$push/... operators.
+
+def touch(version_field="version", modified_field="last_updated_at"):
+    return {
+        "$inc": {version_field: 1},
+        "$set": {modified_field: datetime.datetime.utcnow()}
+    }
+
+
+# The station fields conditional() reads.
+def meta_projection(version_fields, modified_fields):
+    return {field: 1 for field in (*version_fields, *modified_fields, "created_at")}
+
+
+# (etag, last_modified) of a station from its meta_projection() fields.
+# `args` are the request's query arguments.
+def validators(record_id, meta, version_fields, modified_fields, args):
+    versions = "-".join(str(meta.get(field, 0)) for field in version_fields)
+    etag = f"{record_id}-{versions}"
+    # Different query arguments give different representations
+    if args:
+        query = "&".join(f"{k}={v}" for k, v in sorted(args.items(multi=True)))
+        etag += "-" + hashlib.sha1(query.encode("utf-8")).hexdigest()[:12]
+
+    stamps = [meta[f] for f in modified_fields if meta.get(f)] or [meta.get("created_at")]
+    last_modified = max(stamps) if stamps[0] else None
+    return etag, last_modified
+
+
+# Whether the request (Flask or Quart) already holds this version.
+def not_modified(req, etag, last_modified):
+    if req.if_none_match:
+        return req.if_none_match.contains(etag)
+    if req.if_modified_since and last_modified:
+        since = req.if_modified_since.replace(tzinfo=None)
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def set_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified.replace(tzinfo=datetime.timezone.utc)
+    return response
+
+
+# DECORATOR: conditional(version_fields, modified_fields, applies)
+# Adds strong ETag and Last-Modified headers to a station-scoped GET route
+# and answers matching conditional requests with 304 Not Modified.
+# `applies` (optional) is called per request; when it returns False the
+# response depends on more than this station and is sent without them.
+
+def conditional(version_fields=("version",), modified_fields=("last_updated_at",), applies=None):
+    def decorator(func):
+        @wraps(func)
+        def conditional_wrapper(*args, **kwargs):
+            if applies is not None and not applies():
+                return func(*args, **kwargs)
+            record_id = next(iter(kwargs.values()))
+            try:
+                oid = ObjectId(record_id)
+            except Exception:
+                return func(*args, **kwargs)
+
+            meta = weather_collection.find_one({"_id": oid}, meta_projection(version_fields, modified_fields))
+            if meta is None:
+                return func(*args, **kwargs)
+
+            etag, last_modified = validators(record_id, meta, version_fields, modified_fields, request.args)
+
+            if not_modified(request, etag, last_modified):
+                response = make_response("", 304)
+            else:
+                # Lets the response cache key entries on the exact version
+                g.etag = etag
+                response = make_response(func(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            return set_validators(response, etag, last_modified)
+        return conditional_wrapper
+    return decorator
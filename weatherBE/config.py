@@ -0,0 +1,129 @@
+# CONFIG — Settings for the API and its MongoDB connection
+#
+# Defaults live on Config. Any of them can be overridden by an environment
+# variable of the same name prefixed with WEATHER_ (e.g. WEATHER_MONGO_URI,
+# WEATHER_MONGO_MAX_POOL_SIZE=50), and then by the mapping passed to
+# app.create_app(config).
+
+from pymongo import ReadPreference
+import os
+
+ENV_PREFIX = "WEATHER_"
+
+
+class Config:
+    # MongoDB connection
+    MONGO_URI = "mongodb://localhost:27017/"
+    DB_NAME = "weatherDB"
+    MONGO_MAX_POOL_SIZE = 100
+    MONGO_MIN_POOL_SIZE = 0
+    MONGO_MAX_IDLE_TIME_MS = None
+    MONGO_CONNECT_TIMEOUT_MS = 5000
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = 5000
+    MONGO_SOCKET_TIMEOUT_MS = None
+    MONGO_READ_PREFERENCE = "primary"     # primary, primaryPreferred, secondary, ...
+    MONGO_WRITE_CONCERN_W = 1             # number of nodes or "majority"
+    MONGO_WRITE_CONCERN_J = None
+    MONGO_WRITE_CONCERN_WTIMEOUT_MS = None
+
+    # jwt secret
+    SECRET_KEY = "super_secret_weather_key"
+
+    # response cache (see cache.py) — set REDIS_URL to share it between workers
+    CACHE_TTL_SECONDS = 30
+    CACHE_MAX_ENTRIES = 1024
+    REDIS_URL = None
+
+    # POST /weather/readings/bulk limits, larger requests get 413
+    BULK_MAX_ROWS = 10000
+    BULK_MAX_BYTES = 8 * 1024 * 1024
+
+    # alert rules (see alert_rules.py) — path to a JSON list of rule specs
+    ALERT_RULES_PATH = None
+
+    # create declared indexes when the app starts (see indexes.py)
+    ENSURE_INDEXES = True
+
+    # JSON responses (see serialization.py)
+    JSON_SERIALIZER = "auto"              # orjson, json or auto
+    JSON_DATETIME_FORMAT = "http"         # http (RFC 1123, as before) or iso
+
+    # request and MongoDB metrics on GET /metrics (see metrics.py)
+    METRICS_ENABLED = True
+    METRICS_MULTIPROC_DIR = None          # shared by worker processes (set by gunicorn.conf.py)
+    METRICS_FLUSH_SECONDS = 1
+
+    # slow-query log with explain plans (see slow_queries.py), off by default
+    SLOW_QUERY_ENABLED = False
+    SLOW_QUERY_THRESHOLD_MS = 100
+    SLOW_QUERY_EXPLAIN = True
+    SLOW_QUERY_LOG_SIZE_BYTES = 16 * 1024 * 1024
+
+    # in-process read model of station metadata (see station_model.py), off by default
+    STATION_MODEL_ENABLED = False
+    STATION_MODEL_SYNC = "auto"           # change_stream, poll or auto
+    STATION_MODEL_MAX_STATIONS = 50000
+    STATION_MODEL_POLL_SECONDS = 5
+    STATION_MODEL_RECONCILE_SECONDS = 300
+
+
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+
+# Settings without a typed default that are read as integers from the environment
+_INT_SETTINGS = {"MONGO_MAX_IDLE_TIME_MS", "MONGO_SOCKET_TIMEOUT_MS",
+                 "MONGO_WRITE_CONCERN_WTIMEOUT_MS"}
+
+
+def _from_env(name, default):
+    raw = os.environ.get(ENV_PREFIX + name)
+    if raw is None:
+        return default
+    if name == "MONGO_WRITE_CONCERN_W":
+        return int(raw) if raw.isdigit() else raw
+    if isinstance(default, bool) or name == "MONGO_WRITE_CONCERN_J":
+        return raw.lower() in ("1", "true", "yes")
+    if isinstance(default, int) or name in _INT_SETTINGS:
+        return int(raw)
+    return raw
+
+
+# Returns the settings as a dict: Config defaults, then WEATHER_* environment
+# variables, then `overrides` (a dict or an object with upper-case attributes).
+def load_config(overrides=None):
+    settings = {name: _from_env(name, value)
+                for name, value in vars(Config).items() if name.isupper()}
+    if overrides is not None:
+        if not isinstance(overrides, dict):
+            overrides = {name: getattr(overrides, name) for name in dir(overrides) if name.isupper()}
+        settings.update(overrides)
+    return settings
+
+
+# Keyword arguments for MongoClient built from the settings.
+# Raises ValueError for an unknown read preference.
+def mongo_client_options(settings):
+    read_preference = settings["MONGO_READ_PREFERENCE"]
+    if read_preference not in READ_PREFERENCES:
+        raise ValueError(f"MONGO_READ_PREFERENCE must be one of {', '.join(READ_PREFERENCES)}")
+
+    options = {
+        "maxPoolSize": settings["MONGO_MAX_POOL_SIZE"],
+        "minPoolSize": settings["MONGO_MIN_POOL_SIZE"],
+        "connectTimeoutMS": settings["MONGO_CONNECT_TIMEOUT_MS"],
+        "serverSelectionTimeoutMS": settings["MONGO_SERVER_SELECTION_TIMEOUT_MS"],
+        "read_preference": READ_PREFERENCES[read_preference],
+        "w": settings["MONGO_WRITE_CONCERN_W"],
+    }
+    for option, name in (("journal", "MONGO_WRITE_CONCERN_J"),
+                         ("wTimeoutMS", "MONGO_WRITE_CONCERN_WTIMEOUT_MS"),
+                         ("maxIdleTimeMS", "MONGO_MAX_IDLE_TIME_MS"),
+                         ("socketTimeoutMS", "MONGO_SOCKET_TIMEOUT_MS")):
+        if settings[name] is not None:
+            options[option] = settings[name]
+    return options
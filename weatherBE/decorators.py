@@ -1,36 +1,114 @@
 # DECORATORS MODULE — Authentication and Authorization for Weather API
+#
+# Every protected request is authenticated once: the token is decoded,
+# checked against the blacklist and its claims are stored on flask.g
+# (g.token / g.user_data), so stacked decorators such as
+# @jwt_required + @admin_required reuse the same result.
+# Decoded tokens are kept in a bounded in-memory cache until their own
+# `exp`, which skips the signature check on repeat requests. Revocation is
+# still checked on every request, against the indexed `jti` of the token
+# (blacklist indexes are declared in indexes.py).
 
-from flask import request, jsonify, make_response
+from flask import request, jsonify, make_response, g
 from functools import wraps
+from collections import OrderedDict
+from globals import settings, blacklist
+import threading
+import datetime
+import time
 import jwt
-from globals import SECRET_KEY, blacklist
 
-# JWT REQUIRED - For any logged-in user
-# This is used for all routes that require user authentication (both user and admin).
-def jwt_required(func):
-    @wraps(func)
-    def jwt_required_wrapper(*args, **kwargs):
-        token = None
+# Maximum number of decoded tokens kept in memory
+TOKEN_CACHE_SIZE = 4096
+
+_verified = OrderedDict()   # token -> decoded claims
+_verified_lock = threading.Lock()
+
+
+# HELPER FUNCTION: get_token()
+# Reads the token from any of the headers the frontend may send.
+
+def get_token():
+    return (
+        request.headers.get('x-access-token')
+        or request.headers.get('access-token')
+        or request.headers.get('Authorization')
+    )
+
+
+def _decode(token):
+    with _verified_lock:
+        claims = _verified.get(token)
+        if claims is not None:
+            if claims.get('exp', 0) > time.time():
+                _verified.move_to_end(token)
+                return claims
+            del _verified[token]
+
+    # Raises jwt.ExpiredSignatureError / jwt.InvalidTokenError
+    claims = jwt.decode(token, settings['SECRET_KEY'], algorithms=['HS256'])
+
+    with _verified_lock:
+        _verified[token] = claims
+        while len(_verified) > TOKEN_CACHE_SIZE:
+            _verified.popitem(last=False)
+    return claims
+
+
+def is_revoked(token, claims):
+    if claims.get('jti'):
+        query = {'jti': claims['jti']}
+    else:
+        query = {'token': token}
+    return blacklist.find_one(query, {'_id': 1}) is not None
 
-        # Token from request header
-        if 'x-access-token' in request.headers:
-            token = request.headers['x-access-token']
 
-        if not token:
-            return make_response(jsonify({"message": "Token is missing"}), 401)
+# Blacklists a token until it expires (the TTL index then removes it).
+def revoke(token, claims):
+    entry = {'expires_at': datetime.datetime.utcfromtimestamp(claims['exp'])}
+    if claims.get('jti'):
+        entry['jti'] = claims['jti']
+    else:
+        entry['token'] = token
+    blacklist.insert_one(entry)
 
-        try:
-            data = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-        except jwt.ExpiredSignatureError:
-            return make_response(jsonify({"message": "Token expired"}), 401)
-        except Exception:
-            return make_response(jsonify({"message": "Invalid token"}), 401)
+    with _verified_lock:
+        _verified.pop(token, None)
 
-        # Check if token was blacklisted (user logged out)
-        bl_token = blacklist.find_one({'token': token})
-        if bl_token is not None:
-            return make_response(jsonify({"message": "Token has been cancelled"}), 401)
 
+# Authenticates the current request once and returns (claims, error_response).
+def _authenticate():
+    if 'user_data' in g:
+        return g.user_data, None
+
+    token = get_token()
+    if not token:
+        return None, make_response(jsonify({"message": "Token is missing"}), 401)
+
+    try:
+        claims = _decode(token)
+    except jwt.ExpiredSignatureError:
+        return None, make_response(jsonify({"message": "Token expired"}), 401)
+    except Exception:
+        return None, make_response(jsonify({"message": "Invalid token"}), 401)
+
+    # Check if token was blacklisted (user logged out)
+    if is_revoked(token, claims):
+        return None, make_response(jsonify({"message": "Token has been cancelled"}), 401)
+
+    g.token = token
+    g.user_data = claims
+    return claims, None
+
+
+# JWT REQUIRED - For any logged-in user
+# This is used for all routes that require user authentication (both user and admin).
+def jwt_required(func):
+    @wraps(func)
+    def jwt_required_wrapper(*args, **kwargs):
+        claims, error = _authenticate()
+        if error is not None:
+            return error
         return func(*args, **kwargs)
     return jwt_required_wrapper
 
@@ -39,20 +117,10 @@ def jwt_required(func):
 def admin_required(func):
     @wraps(func)
     def admin_required_wrapper(*args, **kwargs):
-        token = None
-        if 'x-access-token' in request.headers:
-            token = request.headers['x-access-token']
-        if not token:
-            return make_response(jsonify({"message": "Token missing"}), 401)
-
-        try:
-            data = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-            if not data.get('admin', False):
-                return make_response(jsonify({"message": "Admin access required"}), 403)
-        except Exception:
-            return make_response(jsonify({"message": "Invalid token"}), 401)
-
+        claims, error = _authenticate()
+        if error is not None:
+            return error
+        if not claims.get('admin', False):
+            return make_response(jsonify({"message": "Admin access required"}), 403)
         return func(*args, **kwargs)
     return admin_required_wrapper
-
-
@@ -0,0 +1,121 @@
+# EXPORT — Streaming NDJSON / CSV responses
+#
+# Export routes hand a document iterator (a Mongo cursor with a bounded
+# batch size, or readings_store.iter_readings) to stream_response(), which
+# serializes rows as they arrive and yields them in chunks of EXPORT_BATCH_SIZE
+# rows. Nothing is collected into a list, so memory use stays flat however
+# many rows are exported.
+#
+#   ?format=ndjson|csv     (default ndjson)
+#   ?fields=a,b,c          columns to include (default: all exportable fields)
+#   ?gzip=1                gzip the stream (also used when the client sends
+#                          Accept-Encoding: gzip)
+
+from flask import Response, request, stream_with_context
+import datetime
+import json
+import zlib
+import csv
+import io
+
+# Rows fetched from MongoDB / written to the client per batch
+EXPORT_BATCH_SIZE = 500
+
+FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+}
+
+
+def _default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, default=_default)
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return value
+
+
+# HELPER FUNCTION: requested_fields()
+# Parses ?fields= against the exportable fields.
+# Raises ValueError for a field that cannot be exported.
+
+def requested_fields(allowed, default=None):
+    raw = request.args.get("fields", "").strip()
+    if not raw:
+        return list(default or allowed)
+    fields = [field.strip() for field in raw.split(",") if field.strip()]
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def ndjson_chunks(docs, fields, batch_size=EXPORT_BATCH_SIZE):
+    lines = []
+    for doc in docs:
+        lines.append(json.dumps({field: doc.get(field) for field in fields}, default=_default))
+        if len(lines) >= batch_size:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def csv_chunks(docs, fields, batch_size=EXPORT_BATCH_SIZE):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    rows = 0
+    for doc in docs:
+        writer.writerow([_cell(doc.get(field)) for field in fields])
+        rows += 1
+        if rows >= batch_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            rows = 0
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)   # wbits 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def wants_gzip():
+    flag = request.args.get("gzip")
+    if flag is not None:
+        return flag.lower() in ("1", "true", "yes")
+    # Quality-aware, so "gzip;q=0" turns compression off
+    return request.accept_encodings["gzip"] > 0
+
+
+# Builds the streaming response for ?format= / ?gzip=.
+# Raises ValueError for an unknown format.
+def stream_response(docs, fields, filename):
+    fmt = request.args.get("format", "ndjson").lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    mimetype, extension = FORMATS[fmt]
+
+    chunks = ndjson_chunks(docs, fields) if fmt == "ndjson" else csv_chunks(docs, fields)
+    headers = {"Content-Disposition": f'attachment; filename="{filename}.{extension}"'}
+    if wants_gzip():
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
@@ -1,14 +1,96 @@
 # globals.py
+#
+# Shared settings and MongoDB collections. The collections below are lazy
+# proxies: the MongoClient is created on first use, once per process, so a
+# pre-forking server (see gunicorn.conf.py) never shares a client or its
+# sockets between workers. configure() swaps the settings, see
+# app.create_app().
+
 from pymongo import MongoClient
+from config import load_config, mongo_client_options
+import threading
+import os
 
-client = MongoClient("mongodb://localhost:27017/")
-db = client["weatherDB"]
+settings = load_config()
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+_command_listeners = []   # PyMongo command listeners, e.g. metrics.py
+
+
+def configure(new_settings):
+    settings.clear()
+    settings.update(new_settings)
+    reset_client()
+
+
+# Registers a PyMongo command listener on every client created from now
+# on; the current client is replaced so the listener applies immediately.
+def add_command_listener(listener):
+    if listener not in _command_listeners:
+        _command_listeners.append(listener)
+        reset_client()
+
+
+# Drops this process's client; the next database access creates a new one.
+def reset_client():
+    global _client, _client_pid
+    with _client_lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client, _client_pid = None, None
+
+
+def get_client():
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client_pid != pid:
+        with _client_lock:
+            if _client_pid != pid:
+                # A client inherited through fork is abandoned, not closed:
+                # its sockets belong to the parent process.
+                _client = MongoClient(settings["MONGO_URI"],
+                                      event_listeners=list(_command_listeners),
+                                      **mongo_client_options(settings))
+                _client_pid = pid
+    return _client
 
-# collections
-users = db["users"]
-weather_collection = db["weather"]
-blacklist = db["blacklist"]   # used for logout / revoked tokens
 
-# jwt secret
-SECRET_KEY = "super_secret_weather_key"
+def get_db():
+    return get_client()[settings["DB_NAME"]]
 
+
+class LazyDatabase:
+    def __getitem__(self, name):
+        return get_db()[name]
+
+    def __getattr__(self, name):
+        return getattr(get_db(), name)
+
+
+class LazyCollection:
+    __slots__ = ("_name",)
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, name):
+        return getattr(get_db()[self._name], name)
+
+    def __repr__(self):
+        return f"LazyCollection({self._name!r})"
+
+
+db = LazyDatabase()
+
+# collections
+users = LazyCollection("users")
+weather_collection = LazyCollection("weather")
+readings_collection = LazyCollection("readings")   # hourly buckets of station readings
+rollups_collection = LazyCollection("rollups")     # running reading aggregates per station
+alerts_collection = LazyCollection("alerts")       # stations with active alerts
+alert_counters = LazyCollection("alert_counters")  # alert counts per type / region
+blacklist = LazyCollection("blacklist")   # used for logout / revoked tokens
+comments_collection = LazyCollection("comments")   # station comments, see comments_store.py
+slow_queries_collection = LazyCollection("slow_queries")   # capped, see slow_queries.py
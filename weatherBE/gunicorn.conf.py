@@ -0,0 +1,36 @@
+# GUNICORN CONFIG — gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Every worker process opens its own MongoClient on first use (see
+# globals.py); post_fork also drops any client inherited from the master
+# when the app is preloaded. Tune with WEATHER_GUNICORN_* variables and the
+# WEATHER_MONGO_* settings of config.py (keep MONGO_MAX_POOL_SIZE at or
+# above the thread count of a worker).
+#
+# Workers share their /metrics through snapshot files in
+# WEATHER_METRICS_MULTIPROC_DIR (a fresh temporary directory by default).
+
+import multiprocessing
+import tempfile
+import os
+
+bind = os.environ.get("WEATHER_GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WEATHER_GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "gthread"
+threads = int(os.environ.get("WEATHER_GUNICORN_THREADS", 8))
+timeout = int(os.environ.get("WEATHER_GUNICORN_TIMEOUT", 30))
+keepalive = 5
+preload_app = os.environ.get("WEATHER_GUNICORN_PRELOAD", "true").lower() in ("1", "true", "yes")
+accesslog = "-"
+
+# Set before the app is loaded, so the preloaded and forked workers see it
+os.environ.setdefault("WEATHER_METRICS_MULTIPROC_DIR", tempfile.mkdtemp(prefix="weather-metrics-"))
+
+
+def on_starting(server):
+    import metrics
+    metrics.clear_process_files(os.environ["WEATHER_METRICS_MULTIPROC_DIR"])
+
+
+def post_fork(server, worker):
+    import globals
+    globals.reset_client()
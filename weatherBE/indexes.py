@@ -0,0 +1,233 @@
+# INDEX REGISTRY — Declared MongoDB indexes for every collection
+#
+# All indexes the API relies on are declared here, per collection, and are
+# created at app startup (see app.py) or from the command line:
+#
+#     python indexes.py apply     # create any missing index
+#     python indexes.py report    # diff declared vs live indexes and
+#                                 # explain the known query shapes
+#
+# Index names are left to MongoDB's default (field_direction_...) so
+# indexes created before the registry existed are recognised.
+
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from pymongo.errors import ConnectionFailure, PyMongoError
+from globals import db
+import datetime
+import sys
+
+INDEXES = {
+    "users": [
+        IndexModel([("username", ASCENDING)], unique=True),
+    ],
+    "blacklist": [
+        # Revoked tokens are looked up by jti and expire at the token's exp
+        IndexModel([("jti", ASCENDING)], unique=True, sparse=True),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+        IndexModel([("token", ASCENDING)], sparse=True),
+    ],
+    "weather": [
+        # Normalized location keys used by /weather/stats, /weather/alerts
+        # and the trends region filter (see locations.py)
+        IndexModel([("loc.region", ASCENDING), ("loc.state", ASCENDING), ("loc.city", ASCENDING)]),
+        IndexModel([("loc.state", ASCENDING), ("loc.city", ASCENDING)]),
+        IndexModel([("loc.city", ASCENDING)]),
+        IndexModel([("loc.country", ASCENDING), ("loc.region", ASCENDING)]),
+        IndexModel([("loc.place", ASCENDING)]),
+        IndexModel([("loc_ngrams", ASCENDING)]),
+        # Multikey index on the embedded alerts array
+        IndexModel([("alerts", ASCENDING)]),
+        # Changed stations, polled by the station read model (see station_model.py)
+        IndexModel([("last_updated_at", ASCENDING)]),
+    ],
+    "comments": [
+        # Newest-first and best-rated-first pages of a station's comments
+        IndexModel([("station_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("station_id", ASCENDING), ("rating", DESCENDING), ("created_at", DESCENDING),
+                    ("_id", DESCENDING)]),
+    ],
+    "alerts": [
+        IndexModel([("loc.region", ASCENDING), ("loc.state", ASCENDING), ("loc.city", ASCENDING)]),
+        IndexModel([("loc.state", ASCENDING)]),
+        IndexModel([("loc.city", ASCENDING)]),
+        IndexModel([("loc.place", ASCENDING)]),
+        IndexModel([("loc_ngrams", ASCENDING)]),
+    ],
+    "alert_counters": [
+        IndexModel([("scope", ASCENDING), ("region", ASCENDING), ("alert_type", ASCENDING)],
+                   unique=True),
+    ],
+    "readings": [
+        IndexModel([("station_id", ASCENDING), ("bucket_start", ASCENDING)]),
+        IndexModel([("readings._id", ASCENDING)]),
+        # Readings stored since the last Parquet export (see parquet_export.py)
+        IndexModel([("station_id", ASCENDING), ("readings._id", ASCENDING)]),
+    ],
+    "rollups": [
+        IndexModel([("station_id", ASCENDING), ("granularity", ASCENDING),
+                    ("period_start", ASCENDING)], unique=True),
+    ],
+}
+
+# Representative queries issued by the blueprints: (collection, filter, sort)
+QUERY_SHAPES = [
+    ("users", {"username": "example"}, None),
+    ("blacklist", {"jti": "example"}, None),
+    ("weather", {"loc.region": {"$regex": "^example"}}, None),
+    ("weather", {"loc.state": {"$regex": "^example"}}, None),
+    ("weather", {"loc.city": "example"}, None),
+    ("weather", {"loc.place": {"$regex": "^example"}}, None),
+    ("weather", {"loc_ngrams": {"$all": ["region:exa", "region:xam"]}}, None),
+    ("weather", {"last_updated_at": {"$gte": datetime.datetime(2000, 1, 1)}}, [("last_updated_at", ASCENDING)]),
+    ("comments", {"station_id": None}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("comments", {"station_id": None}, [("rating", DESCENDING), ("created_at", DESCENDING),
+                                        ("_id", DESCENDING)]),
+    ("alerts", {"loc.region": {"$regex": "^example"}}, [("_id", ASCENDING)]),
+    ("alerts", {"loc_ngrams": {"$all": ["region:exa", "region:xam"]}}, [("_id", ASCENDING)]),
+    ("alert_counters", {"scope": "region", "region": {"$regex": "^example"}}, None),
+    ("readings", {"station_id": None, "bucket_start": {"$gte": datetime.datetime(2000, 1, 1)}},
+     [("bucket_start", ASCENDING)]),
+    ("readings", {"readings._id": "example"}, None),
+    ("readings", {"station_id": None, "readings._id": {"$gte": "0", "$lt": "f"}}, None),
+    ("rollups", {"station_id": None, "granularity": "all", "period_start": None}, None),
+]
+
+# Options that matter when comparing a declared index with a live one
+_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+
+# Creates the declared indexes one by one, so an index that cannot be built
+# (e.g. a unique index over existing duplicates) does not stop the others or
+# the app startup. Failures are returned instead of raised; if the server
+# cannot be reached at all the remaining indexes are not attempted.
+def ensure_indexes(database=db):
+    created = {}
+    failed = {}
+    for name, models in INDEXES.items():
+        created[name] = []
+        for model in models:
+            try:
+                created[name] += database[name].create_indexes([model])
+            except ConnectionFailure as e:
+                failed.setdefault(name, []).append(f"{model.document['name']}: {e}")
+                return {"created": created, "failed": failed}
+            except PyMongoError as e:
+                failed.setdefault(name, []).append(f"{model.document['name']}: {e}")
+    return {"created": created, "failed": failed}
+
+
+def _declared(model):
+    doc = model.document
+    return doc["name"], list(doc["key"].items()), {k: doc[k] for k in _OPTIONS if k in doc}
+
+
+def _live(info):
+    return list(info["key"]), {k: info[k] for k in _OPTIONS if k in info}
+
+
+# Compares declared and live indexes per collection.
+def diff_indexes(database=db):
+    report = {}
+    for name, models in INDEXES.items():
+        live = database[name].index_information()
+        live.pop("_id_", None)
+        declared = {}
+        for model in models:
+            index_name, key, options = _declared(model)
+            declared[index_name] = (key, options)
+
+        report[name] = {
+            "missing": sorted(n for n in declared if n not in live),
+            "undeclared": sorted(n for n in live if n not in declared),
+            "mismatched": sorted(n for n in declared if n in live
+                                 and _live(live[n]) != (declared[n][0], declared[n][1]))
+        }
+    return report
+
+
+def plan_stages(plan):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from plan_stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from plan_stages(value)
+
+
+# Explains every known query shape and flags the ones that scan a collection.
+def explain_query_shapes(database=db):
+    results = []
+    for collection, query, sort in QUERY_SHAPES:
+        cursor = database[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+        stages = set(plan_stages(plan))
+        results.append({
+            "collection": collection,
+            "query": repr(query),
+            "stages": sorted(stages),
+            "collection_scan": "COLLSCAN" in stages
+        })
+    return results
+
+
+# Lists key values that occur more than once for each declared unique index;
+# these make the index build fail until they are cleaned up
+# (see migrations/dedupe_usernames.py for users).
+def duplicate_keys(database=db, limit=20):
+    results = []
+    for name, models in INDEXES.items():
+        for model in models:
+            doc = model.document
+            if not doc.get("unique"):
+                continue
+            fields = list(doc["key"])
+            pipeline = []
+            if doc.get("sparse"):
+                pipeline.append({"$match": {field: {"$exists": True} for field in fields}})
+            pipeline += [
+                {"$group": {"_id": {field.replace(".", "_"): f"${field}" for field in fields},
+                            "count": {"$sum": 1}}},
+                {"$match": {"count": {"$gt": 1}}},
+                {"$limit": limit}
+            ]
+            for group in database[name].aggregate(pipeline):
+                results.append({"collection": name, "index": doc["name"],
+                                "key": group["_id"], "count": group["count"]})
+    return results
+
+
+def report(database=db):
+    return {"indexes": diff_indexes(database), "query_shapes": explain_query_shapes(database),
+            "duplicates": duplicate_keys(database)}
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "apply"
+
+    if command == "apply":
+        result = ensure_indexes()
+        for collection, names in result["created"].items():
+            print(f"{collection}: {', '.join(names)}")
+        for collection, errors in result["failed"].items():
+            for error in errors:
+                print(f"[FAILED] {collection} {error}")
+        if result["failed"]:
+            sys.exit(1)
+    elif command == "report":
+        result = report()
+        for collection, diff in result["indexes"].items():
+            print(f"{collection}: missing={diff['missing']} "
+                  f"undeclared={diff['undeclared']} mismatched={diff['mismatched']}")
+        for shape in result["query_shapes"]:
+            flag = "COLLSCAN" if shape["collection_scan"] else "ok"
+            print(f"[{flag}] {shape['collection']} {shape['query']} -> {shape['stages']}")
+        for duplicate in result["duplicates"]:
+            print(f"[DUPLICATE] {duplicate['collection']} {duplicate['index']} "
+                  f"{duplicate['key']} x{duplicate['count']}")
+    else:
+        print("usage: python indexes.py [apply|report]")
+        sys.exit(1)
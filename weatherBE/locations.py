@@ -0,0 +1,84 @@
+# LOCATIONS — Normalized, index-friendly location lookups
+#
+# Station documents store a normalized copy of their location fields,
+# written by addWeather/updateWeather:
+#
+#   "loc":        {"region": "ile-de-france", "city": "sao paulo", ...}
+#   "loc_ngrams": ["city:sao", "city:ao ", ...]   # trigrams per field
+#
+# Normalization lowercases, folds diacritics and collapses whitespace, so
+# "São Paulo", "sao  paulo" and "SAO PAULO" all become "sao paulo".
+# Filters then match these keys instead of running a case-insensitive
+# $regex over raw user input:
+#   exact    — equality on loc.<field>
+#   prefix   — anchored, case-sensitive prefix regex, which MongoDB turns
+#              into an index range scan (the default)
+#   contains — substring search, opt-in: narrowed with the multikey
+#              trigram index, then confirmed on loc.<field>
+# User input is always regex-escaped.
+
+import unicodedata
+import re
+
+LOCATION_FIELDS = ["region", "state", "city", "place", "country"]
+MATCH_MODES = ["exact", "prefix", "contains"]
+
+# Projection that hides the lookup keys from API responses
+HIDDEN_FIELDS = {"loc": 0, "loc_ngrams": 0}
+
+
+def normalize(value):
+    folded = unicodedata.normalize("NFKD", str(value or ""))
+    folded = "".join(ch for ch in folded if not unicodedata.combining(ch))
+    return " ".join(folded.casefold().split())
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+# Builds the "loc" and "loc_ngrams" fields for a station's location values.
+def location_keys(doc):
+    loc = {field: normalize(doc.get(field)) for field in LOCATION_FIELDS}
+    ngrams = sorted(f"{field}:{gram}" for field, key in loc.items() for gram in _trigrams(key))
+    return {"loc": loc, "loc_ngrams": ngrams}
+
+
+# Returns the query clause matching `value` against a location field.
+# Raises ValueError for an unknown match mode.
+def match_filter(field, value, mode="prefix"):
+    key = normalize(value)
+    path = f"loc.{field}"
+
+    if mode == "exact":
+        return {path: key}
+    if mode == "prefix":
+        return {path: {"$regex": "^" + re.escape(key)}}
+    if mode == "contains":
+        clause = {path: {"$regex": re.escape(key)}}
+        grams = _trigrams(key)
+        if grams:
+            clause["loc_ngrams"] = {"$all": sorted(f"{field}:{gram}" for gram in grams)}
+        return clause
+    raise ValueError(f"match must be one of {', '.join(MATCH_MODES)}")
+
+
+# Whether a normalized key matches the normalized filter value `key`, as
+# match_filter() does in MongoDB (see station_model.py).
+def key_matches(value, key, mode="prefix"):
+    if mode == "exact":
+        return value == key
+    if mode == "prefix":
+        return value.startswith(key)
+    return key in value
+
+
+# Builds a query from request args for the given location fields.
+def location_query(args, fields):
+    mode = args.get("match", "prefix")
+    query = {}
+    for field in fields:
+        value = args.get(field, "").strip()
+        if value:
+            query.update(match_filter(field, value, mode))
+    return query
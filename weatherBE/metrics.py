@@ -0,0 +1,354 @@
+# METRICS — Request and MongoDB instrumentation in Prometheus text format
+#
+# install(app) adds request hooks that record, per route rule and method:
+#   weather_http_requests_total{method,endpoint,status}        counter
+#   weather_http_request_duration_seconds{method,endpoint}     histogram
+#   weather_http_requests_in_flight                            gauge
+#   weather_mongo_commands_per_request{method,endpoint}        histogram
+#   weather_mongo_seconds_per_request{method,endpoint}         histogram
+# and a PyMongo command listener (registered on every client, see
+# globals.add_command_listener) that records:
+#   weather_mongo_commands_total{command,outcome}              counter
+#   weather_mongo_command_seconds_total{command}               counter
+#
+# PyMongo calls the listener on the thread that issued the command, so the
+# per-request Mongo totals are kept in a thread-local. A route that issues
+# one query per item (N+1) or a slow collection scan stands out in the
+# per-request histograms. Everything is served on GET /metrics.
+#
+# Metrics are kept per process. With several worker processes (gunicorn,
+# see gunicorn.conf.py) set METRICS_MULTIPROC_DIR: every worker then writes
+# a snapshot of its metrics to <dir>/metrics-<pid>.json (at most every
+# METRICS_FLUSH_SECONDS), and /metrics adds up the snapshots of all workers,
+# whichever worker serves the scrape. Snapshots of workers that exited are
+# kept, so counters do not go backwards; their gauges are dropped.
+#
+# Streamed responses (exports) are timed when the response is closed, after
+# the body has been sent.
+
+from flask import request, g, Response
+from pymongo import monitoring
+import threading
+import json
+import glob
+import time
+import os
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+# Label values read back from a snapshot may mix types (e.g. status codes)
+def _sort_key(item):
+    return tuple(str(value) for value in item[0])
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name, self.help, self.labels = name, help_text, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def values(self):
+        with self._lock:
+            return dict(self._values)
+
+    # JSON form of values(), for process snapshots
+    def dump(self, values):
+        return [[list(label_values), value] for label_values, value in values.items()]
+
+    # Adds a dumped snapshot into `values`
+    def combine(self, values, dumped):
+        for label_values, value in dumped:
+            key = tuple(label_values)
+            values[key] = values.get(key, 0) + value
+
+    def samples(self, values=None):
+        values = self.values() if values is None else values
+        for label_values, value in sorted(values.items(), key=_sort_key):
+            yield f"{self.name}{_labels(self.labels, label_values)} {_number(value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help_text, tuple(labels)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._values = {}   # label values -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                entry = self._values[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def values(self):
+        with self._lock:
+            return {key: (list(entry[0]), entry[1], entry[2]) for key, entry in self._values.items()}
+
+    def dump(self, values):
+        return [[list(label_values), counts, total, count]
+                for label_values, (counts, total, count) in values.items()]
+
+    def combine(self, values, dumped):
+        for label_values, counts, total, count in dumped:
+            key = tuple(label_values)
+            if len(counts) != len(self.buckets):
+                continue   # written with other buckets
+            if key in values:
+                own_counts, own_total, own_count = values[key]
+                counts = [a + b for a, b in zip(own_counts, counts)]
+                total, count = own_total + total, own_count + count
+            values[key] = (list(counts), total, count)
+
+    def samples(self, values=None):
+        values = self.values() if values is None else values
+        for label_values, (counts, total, count) in sorted(values.items(), key=_sort_key):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _labels(self.labels + ("le",), label_values + (_number(bound),))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _labels(self.labels, label_values)
+            yield f"{self.name}_sum{labels} {_number(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def snapshot(self):
+        return {metric.name: metric.dump(metric.values()) for metric in self.metrics}
+
+    # Text format of this process's metrics plus the given snapshots of
+    # other processes ({"alive": bool, "metrics": {...}}).
+    def render(self, others=()):
+        lines = []
+        for metric in self.metrics:
+            values = metric.values()
+            for other in others:
+                if metric.name in other["metrics"] and (other["alive"] or metric.kind != "gauge"):
+                    metric.combine(values, other["metrics"][metric.name])
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples(values))
+        return "\n".join(lines) + "\n"
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class ProcessFiles:
+    # Per-process metric snapshots in a directory shared by the workers.
+
+    def __init__(self, registry, directory, flush_seconds=1):
+        self.registry = registry
+        self.directory = directory
+        self.flush_seconds = flush_seconds
+        self._flushed = 0.0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, pid):
+        return os.path.join(self.directory, f"metrics-{pid}.json")
+
+    # Writes this process's snapshot, at most every flush_seconds unless forced.
+    def flush(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._flushed < self.flush_seconds:
+            return
+        with self._lock:
+            self._flushed = now
+            path = self._path(os.getpid())
+            with open(path + ".tmp", "w") as f:
+                json.dump(self.registry.snapshot(), f)
+            os.replace(path + ".tmp", path)
+
+    # Snapshots of every other process.
+    def others(self):
+        own = self._path(os.getpid())
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, "metrics-*.json")):
+            if path == own:
+                continue
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+                pid = int(os.path.basename(path)[len("metrics-"):-len(".json")])
+            except (OSError, ValueError):
+                continue
+            snapshots.append({"alive": _alive(pid), "metrics": data})
+        return snapshots
+
+
+# Removes the snapshots of a previous run (see gunicorn.conf.py on_starting)
+def clear_process_files(directory):
+    for path in glob.glob(os.path.join(directory, "metrics-*.json")):
+        os.remove(path)
+
+
+registry = Registry()
+
+requests_total = registry.register(Counter(
+    "weather_http_requests_total", "HTTP requests by route and status.",
+    ("method", "endpoint", "status")))
+request_duration = registry.register(Histogram(
+    "weather_http_request_duration_seconds", "HTTP request latency.",
+    ("method", "endpoint")))
+requests_in_flight = registry.register(Gauge(
+    "weather_http_requests_in_flight", "HTTP requests being served."))
+mongo_commands_per_request = registry.register(Histogram(
+    "weather_mongo_commands_per_request", "MongoDB commands issued per HTTP request.",
+    ("method", "endpoint"), COUNT_BUCKETS))
+mongo_seconds_per_request = registry.register(Histogram(
+    "weather_mongo_seconds_per_request", "Time spent in MongoDB commands per HTTP request.",
+    ("method", "endpoint")))
+mongo_commands_total = registry.register(Counter(
+    "weather_mongo_commands_total", "MongoDB commands by name and outcome.",
+    ("command", "outcome")))
+mongo_command_seconds = registry.register(Counter(
+    "weather_mongo_command_seconds_total", "Time spent in MongoDB commands by name.",
+    ("command",)))
+
+_current = threading.local()   # per-request [commands, seconds] of this thread
+
+process_files = None   # ProcessFiles when METRICS_MULTIPROC_DIR is set
+
+
+class CommandMetrics(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def _record(self, event, outcome):
+        seconds = event.duration_micros / 1e6
+        mongo_commands_total.inc(event.command_name, outcome)
+        mongo_command_seconds.inc(event.command_name, amount=seconds)
+        totals = getattr(_current, "totals", None)
+        if totals is not None:
+            totals[0] += 1
+            totals[1] += seconds
+
+    def succeeded(self, event):
+        self._record(event, "success")
+
+    def failed(self, event):
+        self._record(event, "failure")
+
+
+command_listener = CommandMetrics()
+
+
+def _endpoint():
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+
+def _before_request():
+    g.metrics_started = time.perf_counter()
+    _current.totals = [0, 0.0]
+    requests_in_flight.inc()
+
+
+def _record(method, endpoint, status, started, totals):
+    request_duration.observe(time.perf_counter() - started, method, endpoint)
+    requests_total.inc(method, endpoint, status)
+    mongo_commands_per_request.observe(totals[0], method, endpoint)
+    mongo_seconds_per_request.observe(totals[1], method, endpoint)
+    if process_files is not None:
+        process_files.flush()
+
+
+def _after_request(response):
+    if "metrics_started" in g:
+        method, endpoint = request.method, _endpoint()
+        totals = getattr(_current, "totals", None) or [0, 0.0]
+        args = (method, endpoint, response.status_code, g.metrics_started, totals)
+        if response.is_streamed:
+            # The body is produced after this hook: record once it is sent
+            g.metrics_streamed = True
+
+            def on_close():
+                _record(*args)
+                requests_in_flight.dec()
+                _current.totals = None
+            response.call_on_close(on_close)
+        else:
+            _record(*args)
+    return response
+
+
+def _teardown_request(error):
+    if g.get("metrics_streamed"):
+        return
+    if "metrics_started" in g:
+        requests_in_flight.dec()
+    _current.totals = None
+
+
+def metrics_view():
+    others = ()
+    if process_files is not None:
+        process_files.flush(force=True)
+        others = process_files.others()
+    return Response(registry.render(others), content_type=CONTENT_TYPE)
+
+
+# Adds the request hooks and GET /metrics to the app. With multiproc_dir,
+# /metrics serves the sum over all worker processes.
+def install(app, multiproc_dir=None, flush_seconds=1):
+    global process_files
+    process_files = ProcessFiles(registry, multiproc_dir, flush_seconds) if multiproc_dir else None
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.add_url_rule("/metrics", "metrics", metrics_view, methods=["GET"])
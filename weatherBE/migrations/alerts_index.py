@@ -0,0 +1,20 @@
+# MIGRATION — Build the materialized alerts index
+#
+# Rebuilds the alerts and alert_counters collections (see alerts_index.py)
+# from the alerts stored on station documents. Safe to re-run.
+#
+# Run from the weatherBE directory:
+#     python -m migrations.alerts_index
+
+import indexes
+import alerts_index
+
+
+def migrate():
+    return {"stations": alerts_index.rebuild()}
+
+
+if __name__ == "__main__":
+    indexes.ensure_indexes()
+    result = migrate()
+    print(f"Indexed alerts of {result['stations']} stations")
@@ -0,0 +1,25 @@
+# MIGRATION — Build reading rollups for every station
+#
+# Rebuilds the hour/day/all rollups (see rollups.py) of each station from
+# the readings store. Safe to re-run: a station's rollups are replaced.
+#
+# Run from the weatherBE directory:
+#     python -m migrations.build_rollups
+
+from globals import weather_collection
+import indexes
+import rollups
+
+
+def migrate():
+    stations = periods = 0
+    for station in weather_collection.find({}, {"_id": 1}):
+        periods += rollups.rebuild_station(station["_id"])
+        stations += 1
+    return {"stations": stations, "rollups": periods}
+
+
+if __name__ == "__main__":
+    indexes.ensure_indexes()
+    result = migrate()
+    print(f"Built {result['rollups']} rollups for {result['stations']} stations")
@@ -0,0 +1,62 @@
+# MIGRATION — Move embedded station comments to the comments collection
+#
+# Copies every comment of a station's `comments` array into the comments
+# collection (see comments_store.py), sets the station's comment_count /
+# rating_sum / rating_avg totals and removes the array. Safe to re-run:
+# comments are upserted by _id, and totals are recomputed from the
+# collection for every station that still has an array.
+#
+# Run from the weatherBE directory:
+#     python -m migrations.comments_collection
+
+from pymongo import UpdateOne
+from globals import weather_collection, comments_collection
+import indexes
+import uuid
+
+BATCH_SIZE = 500
+
+
+def _flush(batch):
+    if not batch:
+        return 0
+    result = comments_collection.bulk_write(batch, ordered=False)
+    return result.upserted_count + result.modified_count
+
+
+def migrate():
+    stations = copied = 0
+    batch = []
+    for station in weather_collection.find({"comments": {"$exists": True}}, {"comments": 1}):
+        for comment in station.get("comments") or []:
+            comment = dict(comment, station_id=station["_id"])
+            comment["_id"] = comment.get("_id") or str(uuid.uuid4())
+            comment["rating"] = int(comment.get("rating") or 0)
+            batch.append(UpdateOne({"_id": comment["_id"]}, {"$set": comment}, upsert=True))
+            if len(batch) >= BATCH_SIZE:
+                copied += _flush(batch)
+                batch = []
+        # The station's comments must be written before its totals
+        copied += _flush(batch)
+        batch = []
+
+        count, rating_sum = 0, 0
+        for comment in comments_collection.find({"station_id": station["_id"]}, {"rating": 1}):
+            count += 1
+            rating_sum += comment.get("rating", 0)
+        weather_collection.update_one({"_id": station["_id"]}, {
+            "$set": {
+                "comment_count": count,
+                "rating_sum": rating_sum,
+                "rating_avg": round(rating_sum / count, 2) if count else None
+            },
+            "$unset": {"comments": ""}
+        })
+        stations += 1
+    return {"stations": stations, "comments": copied}
+
+
+if __name__ == "__main__":
+    indexes.ensure_indexes()
+    result = migrate()
+    print(f"Moved {result['comments']} comments from {result['stations']} stations")
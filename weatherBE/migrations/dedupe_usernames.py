@@ -0,0 +1,36 @@
+# MIGRATION — Resolve duplicate usernames before the unique index is built
+#
+# The unique username index (see indexes.py) cannot be created while two
+# users share a username. For every duplicated username the oldest account
+# keeps it (the one login already resolves to); the newer accounts are not
+# deleted but renamed to "<username>~<_id>" so they can be reviewed by hand.
+# Safe to re-run.
+#
+# Run from the weatherBE directory:
+#     python -m migrations.dedupe_usernames
+
+from pymongo import UpdateOne
+from globals import users
+import indexes
+
+
+def migrate():
+    renamed = 0
+    pipeline = [
+        {"$sort": {"_id": 1}},
+        {"$group": {"_id": "$username", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ]
+    for group in users.aggregate(pipeline, allowDiskUse=True):
+        batch = [
+            UpdateOne({"_id": user_id}, {"$set": {"username": f"{group['_id']}~{user_id}"}})
+            for user_id in group["ids"][1:]
+        ]
+        renamed += users.bulk_write(batch, ordered=False).modified_count
+    return {"renamed": renamed}
+
+
+if __name__ == "__main__":
+    result = migrate()
+    print(f"Renamed {result['renamed']} duplicate users")
+    indexes.ensure_indexes()
@@ -0,0 +1,37 @@
+# MIGRATION — Backfill normalized location keys on station documents
+#
+# Writes the "loc" / "loc_ngrams" lookup fields (see locations.py) for every
+# station. Safe to re-run: the keys are recomputed from the raw fields.
+#
+# Run from the weatherBE directory:
+#     python -m migrations.location_keys
+
+from pymongo import UpdateOne
+from globals import weather_collection
+import indexes
+import locations
+
+BATCH_SIZE = 500
+
+
+def migrate():
+    updated = 0
+    batch = []
+    projection = {field: 1 for field in locations.LOCATION_FIELDS}
+    for station in weather_collection.find({}, projection):
+        batch.append(UpdateOne(
+            {"_id": station["_id"]},
+            {"$set": locations.location_keys(station)}
+        ))
+        if len(batch) >= BATCH_SIZE:
+            updated += weather_collection.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        updated += weather_collection.bulk_write(batch, ordered=False).modified_count
+    return {"updated": updated}
+
+
+if __name__ == "__main__":
+    indexes.ensure_indexes()
+    result = migrate()
+    print(f"Updated location keys on {result['updated']} stations")
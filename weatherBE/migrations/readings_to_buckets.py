@@ -0,0 +1,113 @@
+# MIGRATION — Move embedded station readings into the bucketed readings store
+#
+# One-shot job: every station document that still has an embedded `readings`
+# array gets its readings written into hourly buckets (see readings_store.py),
+# after which the array is removed from the station document.
+# Stations are processed one at a time, so re-running after an interruption
+# only picks up stations that were not migrated yet. Readings that cannot be
+# converted are left in the station's `readings` array for manual review.
+#
+# A station is marked with `readings_migrated_at` before its buckets are
+# written, and readings without an _id get one derived from that mark and
+# their position in the array. If the job dies between writing the buckets
+# and removing the array, the re-run recomputes the same ids and only
+# inserts the readings that are not in a bucket yet.
+#
+# Run from the weatherBE directory:
+#     python -m migrations.readings_to_buckets
+
+from bson import ObjectId
+from globals import weather_collection, readings_collection
+import readings_store
+import indexes
+import rollups
+import datetime
+import hashlib
+
+# Older readings were written with these names (the trends routes used to
+# read them), so they are mapped onto the current field names.
+LEGACY_FIELDS = {
+    "temperature_c": "temp_c",
+    "humidity_pct": "humidity",
+    "wind_speed_kmh": "wind_kmh",
+}
+
+
+# Same id on every run: the time part is the station's migration mark (so
+# parquet_export sees the readings as ingested then), the rest a hash of
+# the station and the reading's position in the embedded array.
+def _reading_id(station_oid, migrated_at, position):
+    digest = hashlib.md5(f"{station_oid}:{position}".encode()).digest()
+    return str(ObjectId(ObjectId.from_datetime(migrated_at).binary[:4] + digest[:8]))
+
+
+def _convert(reading, fallback_ts, reading_id):
+    converted = {
+        "_id": str(reading.get("_id") or reading_id),
+        "ts": readings_store.normalize_ts(reading.get("ts") or fallback_ts),
+    }
+    for field in readings_store.METRICS:
+        converted[field] = float(reading.get(field, 0))
+    for legacy, field in LEGACY_FIELDS.items():
+        if legacy in reading and field not in reading:
+            converted[field] = float(reading[legacy])
+    return converted
+
+
+def migrate():
+    stations = readings = skipped = 0
+
+    cursor = weather_collection.find(
+        {"readings": {"$exists": True}},
+        {"readings": 1, "created_at": 1, "readings_migrated_at": 1}
+    )
+    for station in cursor:
+        station_oid = station["_id"]
+        migrated_at = station.get("readings_migrated_at")
+        if migrated_at is None:
+            # Whole seconds, the precision of an ObjectId timestamp
+            migrated_at = datetime.datetime.utcnow().replace(microsecond=0)
+            weather_collection.update_one({"_id": station_oid},
+                                          {"$set": {"readings_migrated_at": migrated_at}})
+
+        fallback_ts = station.get("created_at") or datetime.datetime.utcnow()
+        converted, unreadable = [], []
+        for position, reading in enumerate(station.get("readings") or []):
+            try:
+                converted.append(_convert(reading, fallback_ts,
+                                          _reading_id(station_oid, migrated_at, position)))
+            except (TypeError, ValueError, AttributeError):
+                unreadable.append(reading)
+
+        # Readings a previous, interrupted run already wrote are skipped
+        if "readings_migrated_at" in station and converted:
+            ids = [reading["_id"] for reading in converted]
+            stored = set()
+            for bucket in readings_collection.find(
+                {"station_id": station_oid, "readings._id": {"$in": ids}},
+                {"readings._id": 1}
+            ):
+                stored.update(reading["_id"] for reading in bucket["readings"])
+            pending = [reading for reading in converted if reading["_id"] not in stored]
+        else:
+            pending = converted
+
+        readings_store.insert_bucketed(station_oid, pending)
+        rollups.rebuild_station(station_oid)
+        if unreadable:
+            update = {"$set": {"readings": unreadable}, "$unset": {"readings_migrated_at": ""}}
+        else:
+            update = {"$unset": {"readings": "", "readings_migrated_at": ""}}
+        weather_collection.update_one({"_id": station_oid}, update)
+        stations += 1
+        readings += len(converted)
+        skipped += len(unreadable)
+
+    return {"stations": stations, "readings": readings, "skipped": skipped}
+
+
+if __name__ == "__main__":
+    indexes.ensure_indexes()
+    result = migrate()
+    print(f"Migrated {result['readings']} readings from {result['stations']} stations "
+          f"({result['skipped']} unreadable readings skipped)")
@@ -0,0 +1,52 @@
+# PAGINATION — Opaque keyset cursors
+#
+# Paginated routes return the sort key of the last item of a page as
+# `next_cursor`, wrapped in URL-safe base64 JSON so clients treat it as an
+# opaque token, and resume after that key when it is sent back.
+
+from bson import ObjectId
+import readings_store
+import base64
+import json
+
+
+def encode_cursor(key):
+    raw = json.dumps(list(key)).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+# Returns the key as a list. Raises ValueError for malformed tokens.
+def decode_cursor(token):
+    try:
+        key = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(key, list):
+        raise ValueError("Invalid cursor")
+    return key
+
+
+# Station pages are keyed on _id
+def encode_id_cursor(doc):
+    return encode_cursor([str(doc["_id"])])
+
+
+def decode_id_cursor(token):
+    try:
+        (doc_id,) = decode_cursor(token)
+        return ObjectId(doc_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+# Reading pages are keyed on (ts, _id)
+def encode_reading_cursor(reading):
+    return encode_cursor([reading["ts"], reading["_id"]])
+
+
+def decode_reading_cursor(token):
+    try:
+        ts, reading_id = decode_cursor(token)
+        return readings_store.normalize_ts(ts), str(reading_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
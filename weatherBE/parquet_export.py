@@ -0,0 +1,231 @@
+# PARQUET EXPORT — Columnar snapshots of stations and readings
+#
+# Writes the stations and their flattened readings as Parquet files for
+# offline analysis, partitioned Hive-style by station and day:
+#
+#   <out>/stations/stations.parquet                        (full snapshot)
+#   <out>/readings/station_id=<id>/date=<YYYY-MM-DD>/part-<run>.parquet
+#   <out>/_watermark.json                        {"ingested_before": "..."}
+#
+# Readings are streamed from MongoDB in (ts, _id) order per station and
+# converted to Arrow record batches of EXPORT_BATCH_SIZE rows, so memory
+# stays bounded.
+#
+# The watermark is an ingest time, not a reading timestamp: a reading's _id
+# is an ObjectId generated when it is stored, so each run exports the
+# readings whose _id falls between the previous run's watermark and now
+# (less INGEST_LAG_SECONDS, for requests still in flight). Readings that
+# arrive late, with an older `ts`, are exported by the next run like any
+# other. Edits to readings already exported are not; export into a fresh
+# directory to get a full copy. An explicit `since` exports every reading
+# with a later `ts` instead of using the watermark.
+#
+# pyarrow is optional and only needed here:
+#     pip install pyarrow
+#     python parquet_export.py <out_dir> [since_ts]     (from weatherBE/)
+
+from globals import weather_collection, readings_collection
+from bson import ObjectId
+import readings_store
+import datetime
+import json
+import os
+import sys
+
+EXPORT_BATCH_SIZE = 10000
+
+STATION_FIELDS = ["station_name", "city", "state", "region", "place", "country",
+                  "avg_temp_c", "max_wind_kmh", "overall_condition", "air_quality_index",
+                  "alerts", "views", "created_at", "last_updated_at"]
+
+WATERMARK_FILE = "_watermark.json"
+
+# Readings stored less than this long ago wait for the next run
+INGEST_LAG_SECONDS = 60
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)")
+    return pyarrow, pyarrow.parquet
+
+
+def _schemas(pa):
+    stations = pa.schema([
+        ("station_id", pa.string()),
+        ("station_name", pa.string()),
+        ("city", pa.string()),
+        ("state", pa.string()),
+        ("region", pa.string()),
+        ("place", pa.string()),
+        ("country", pa.string()),
+        ("avg_temp_c", pa.float64()),
+        ("max_wind_kmh", pa.float64()),
+        ("overall_condition", pa.string()),
+        ("air_quality_index", pa.int64()),
+        ("alerts", pa.list_(pa.string())),
+        ("views", pa.int64()),
+        ("created_at", pa.timestamp("us")),
+        ("last_updated_at", pa.timestamp("us")),
+    ])
+    readings = pa.schema(
+        [("reading_id", pa.string()), ("station_id", pa.string()), ("ts", pa.timestamp("us"))]
+        + [(metric, pa.float64()) for metric in readings_store.METRICS]
+    )
+    return stations, readings
+
+
+def read_watermark(out_dir):
+    path = os.path.join(out_dir, WATERMARK_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        data = json.load(f)
+    # Watermarks written before ingest times were used hold the last reading ts
+    return data.get("ingested_before") or data.get("ts")
+
+
+def _write_watermark(out_dir, ingested_before):
+    path = os.path.join(out_dir, WATERMARK_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump({"ingested_before": ingested_before}, f)
+    os.replace(path + ".tmp", path)
+
+
+# Lowest reading _id generated at `moment` (ObjectId hex strings sort by time)
+def _id_bound(moment):
+    return str(ObjectId.from_datetime(readings_store.parse_ts(moment).replace(tzinfo=datetime.timezone.utc)))
+
+
+# A station's readings with low <= _id < high (and ts > since), in (ts, _id) order.
+def ingested_pipeline(station_oid, low, high, since=None):
+    reading_match = {"readings._id": {"$lt": high}}
+    if low:
+        reading_match["readings._id"]["$gte"] = low
+    if since:
+        reading_match["readings.ts"] = {"$gt": since}
+    return [
+        {"$match": dict({"station_id": station_oid}, **reading_match)},
+        {"$unwind": "$readings"},
+        {"$match": reading_match},
+        {"$replaceRoot": {"newRoot": "$readings"}},
+        {"$sort": {"ts": 1, "_id": 1}},
+    ]
+
+
+def _export_stations(pa, pq, schema, out_dir):
+    directory = os.path.join(out_dir, "stations")
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, "stations.parquet")
+
+    rows = 0
+    columns = {name: [] for name in schema.names}
+    with pq.ParquetWriter(path + ".tmp", schema) as writer:
+        cursor = weather_collection.find({}, dict.fromkeys(STATION_FIELDS, 1)).batch_size(EXPORT_BATCH_SIZE)
+        for doc in cursor:
+            columns["station_id"].append(str(doc["_id"]))
+            for field in STATION_FIELDS:
+                columns[field].append(doc.get(field))
+            rows += 1
+            if len(columns["station_id"]) >= EXPORT_BATCH_SIZE:
+                writer.write_batch(pa.RecordBatch.from_pydict(columns, schema=schema))
+                columns = {name: [] for name in schema.names}
+        if columns["station_id"]:
+            writer.write_batch(pa.RecordBatch.from_pydict(columns, schema=schema))
+    os.replace(path + ".tmp", path)
+    return rows
+
+
+class _PartitionWriter:
+    # Writes one station's readings, opening a new file whenever the day
+    # changes (readings arrive in time order).
+
+    def __init__(self, pa, pq, schema, out_dir, station_id, run_id):
+        self.pa, self.pq, self.schema = pa, pq, schema
+        self.base = os.path.join(out_dir, "readings", f"station_id={station_id}")
+        self.run_id = run_id
+        self.day = None
+        self.writer = None
+        self.columns = None
+        self.files = 0
+
+    def _flush(self):
+        if self.columns and self.columns["ts"]:
+            self.writer.write_batch(self.pa.RecordBatch.from_pydict(self.columns, schema=self.schema))
+        self.columns = {name: [] for name in self.schema.names}
+
+    def _open(self, day):
+        self.close()
+        directory = os.path.join(self.base, f"date={day.isoformat()}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"part-{self.run_id}.parquet")
+        self.writer = self.pq.ParquetWriter(path, self.schema)
+        self.columns = {name: [] for name in self.schema.names}
+        self.day = day
+        self.files += 1
+
+    def add(self, station_id, reading, ts):
+        if ts.date() != self.day:
+            self._open(ts.date())
+        self.columns["reading_id"].append(reading["_id"])
+        self.columns["station_id"].append(station_id)
+        self.columns["ts"].append(ts)
+        for metric in readings_store.METRICS:
+            self.columns[metric].append(reading.get(metric))
+        if len(self.columns["ts"]) >= EXPORT_BATCH_SIZE:
+            self._flush()
+
+    def close(self):
+        if self.writer is not None:
+            self._flush()
+            self.writer.close()
+            self.writer = None
+
+
+# Exports stations and every reading stored since the watermark in out_dir
+# (or, with `since`, every reading with a later ts). Returns counts and the
+# new watermark.
+def export(out_dir, since=None, lag_seconds=INGEST_LAG_SECONDS):
+    pa, pq = _pyarrow()
+    station_schema, reading_schema = _schemas(pa)
+    os.makedirs(out_dir, exist_ok=True)
+
+    started = datetime.datetime.utcnow()
+    watermark = readings_store.normalize_ts(started - datetime.timedelta(seconds=lag_seconds))
+    if since:
+        since, low = readings_store.normalize_ts(since), None
+    else:
+        previous = read_watermark(out_dir)
+        low = _id_bound(previous) if previous else None
+    high = _id_bound(watermark)
+    run_id = started.strftime("%Y%m%dT%H%M%S%f")
+
+    stations = _export_stations(pa, pq, station_schema, out_dir)
+    readings = files = 0
+    for station in weather_collection.find({}, {"_id": 1}).batch_size(EXPORT_BATCH_SIZE):
+        station_id = str(station["_id"])
+        partitions = _PartitionWriter(pa, pq, reading_schema, out_dir, station_id, run_id)
+        pipeline = ingested_pipeline(station["_id"], low, high, since)
+        try:
+            for reading in readings_collection.aggregate(pipeline, allowDiskUse=True,
+                                                         batchSize=EXPORT_BATCH_SIZE):
+                partitions.add(station_id, reading, readings_store.parse_ts(reading["ts"]))
+                readings += 1
+        finally:
+            partitions.close()
+        files += partitions.files
+
+    _write_watermark(out_dir, watermark)
+    return {"stations": stations, "readings": readings, "files": files, "watermark": watermark}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python parquet_export.py <out_dir> [since_ts]")
+        sys.exit(1)
+    result = export(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
+    print(f"Exported {result['stations']} stations and {result['readings']} readings "
+          f"into {result['files']} files (watermark {result['watermark']})")
@@ -0,0 +1,271 @@
+# READINGS STORE — Bucketed time-series storage for station readings
+#
+# Readings used to be $push-ed into an embedded `readings` array on each
+# station document, so busy stations kept growing towards the 16 MB BSON
+# limit. They now live in their own collection, one bucket document per
+# station per hour:
+#
+#   {
+#       "_id": ObjectId,
+#       "station_id": ObjectId,     # station the readings belong to
+#       "bucket_start": datetime,   # start of the hour (naive UTC)
+#       "count": int,               # number of readings in the bucket
+#       "readings": [{"_id", "ts", "temp_c", "humidity", "wind_kmh", "pressure_kpa"}]
+#   }
+#
+# A bucket holds at most BUCKET_SIZE readings; a very busy hour simply
+# spills over into another bucket with the same bucket_start.
+# Reading timestamps are kept as normalized ISO-8601 strings so the API
+# keeps returning them exactly as before, and so string comparison matches
+# time order.
+
+from pymongo import UpdateOne
+from globals import readings_collection
+import datetime
+
+BUCKET_SIZE = 200
+
+# Numeric fields recorded on every reading
+METRICS = ["temp_c", "humidity", "wind_kmh", "pressure_kpa"]
+
+
+# HELPER FUNCTION: parse_ts()
+# Parses an ISO-8601 string (or datetime) into a naive UTC datetime.
+# Raises ValueError if the value is not a valid timestamp.
+
+def parse_ts(value):
+    if isinstance(value, datetime.datetime):
+        dt = value
+    else:
+        dt = datetime.datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+# HELPER FUNCTION: normalize_ts()
+# Returns the canonical string form of a timestamp as stored on readings.
+
+def normalize_ts(value):
+    return parse_ts(value).isoformat()
+
+
+def bucket_start_for(ts):
+    return parse_ts(ts).replace(minute=0, second=0, microsecond=0)
+
+
+# Adds a single reading to the station's bucket for that hour,
+# opening a new bucket when the current one is full.
+def insert_reading(station_oid, reading):
+    readings_collection.update_one(
+        {
+            "station_id": station_oid,
+            "bucket_start": bucket_start_for(reading["ts"]),
+            "count": {"$lt": BUCKET_SIZE}
+        },
+        {"$push": {"readings": reading}, "$inc": {"count": 1}},
+        upsert=True
+    )
+
+
+# Writes a batch of readings for one station as full bucket documents.
+# Used by the migration, where the station has no buckets yet.
+def insert_bucketed(station_oid, readings):
+    by_hour = {}
+    for reading in readings:
+        by_hour.setdefault(bucket_start_for(reading["ts"]), []).append(reading)
+
+    buckets = []
+    for start, hour_readings in sorted(by_hour.items()):
+        hour_readings.sort(key=lambda r: (r["ts"], r["_id"]))
+        for i in range(0, len(hour_readings), BUCKET_SIZE):
+            chunk = hour_readings[i:i + BUCKET_SIZE]
+            buckets.append({
+                "station_id": station_oid,
+                "bucket_start": start,
+                "count": len(chunk),
+                "readings": chunk
+            })
+
+    if buckets:
+        readings_collection.insert_many(buckets, ordered=False)
+    return len(buckets)
+
+
+# Appends readings of many stations in one unordered bulk write.
+# `batches` maps station ObjectId -> list of readings. Readings of the same
+# station and hour are pushed together, into a bucket that still has room
+# for the whole chunk, or a new one.
+def append_readings(batches):
+    ops = []
+    for station_oid, readings in batches.items():
+        by_hour = {}
+        for reading in readings:
+            by_hour.setdefault(bucket_start_for(reading["ts"]), []).append(reading)
+
+        for start, hour_readings in by_hour.items():
+            for i in range(0, len(hour_readings), BUCKET_SIZE):
+                chunk = hour_readings[i:i + BUCKET_SIZE]
+                ops.append(UpdateOne(
+                    {
+                        "station_id": station_oid,
+                        "bucket_start": start,
+                        "count": {"$lte": BUCKET_SIZE - len(chunk)}
+                    },
+                    {"$push": {"readings": {"$each": chunk}}, "$inc": {"count": len(chunk)}},
+                    upsert=True
+                ))
+
+    if ops:
+        readings_collection.bulk_write(ops, ordered=False)
+    return len(ops)
+
+
+def find_reading(station_oid, reading_id):
+    bucket = readings_collection.find_one(
+        {"station_id": station_oid, "readings._id": reading_id},
+        {"readings": {"$elemMatch": {"_id": reading_id}}}
+    )
+    if not bucket or not bucket.get("readings"):
+        return None
+    return bucket["readings"][0]
+
+
+# Applies `changes` to a reading and returns the (previous, updated) pair,
+# or None if the reading does not exist. A changed timestamp that falls
+# into another hour moves the reading to the matching bucket.
+def update_reading(station_oid, reading_id, changes):
+    current = find_reading(station_oid, reading_id)
+    if current is None:
+        return None
+
+    updated = dict(current, **changes)
+    if bucket_start_for(updated["ts"]) == bucket_start_for(current["ts"]):
+        readings_collection.update_one(
+            {"station_id": station_oid, "readings._id": reading_id},
+            {"$set": {f"readings.$.{field}": value for field, value in changes.items()}}
+        )
+    else:
+        delete_reading(station_oid, reading_id)
+        insert_reading(station_oid, updated)
+    return current, updated
+
+
+# Removes a reading and returns it, or None if it does not exist.
+def delete_reading(station_oid, reading_id):
+    current = find_reading(station_oid, reading_id)
+    if current is None:
+        return None
+
+    readings_collection.update_one(
+        {"station_id": station_oid, "readings._id": reading_id},
+        {"$pull": {"readings": {"_id": reading_id}}, "$inc": {"count": -1}}
+    )
+    readings_collection.delete_many({"station_id": station_oid, "count": {"$lte": 0}})
+    return current
+
+
+def has_readings(station_oid):
+    return readings_collection.find_one({"station_id": station_oid}, {"_id": 1}) is not None
+
+
+def delete_station_readings(station_oid):
+    return readings_collection.delete_many({"station_id": station_oid}).deleted_count
+
+
+# Builds the aggregation pipeline behind iter_readings(): only buckets
+# overlapping the range are read, and readings outside it (or before the
+# `after` (ts, _id) key) are trimmed inside MongoDB before they are sent back.
+def readings_pipeline(station_oid, from_ts=None, to_ts=None, after=None):
+    bucket_range = {}
+    reading_conds = []
+    if from_ts:
+        bucket_range["$gte"] = bucket_start_for(from_ts)
+        reading_conds.append({"$gte": ["$$r.ts", normalize_ts(from_ts)]})
+    if to_ts:
+        bucket_range["$lte"] = parse_ts(to_ts)
+        reading_conds.append({"$lte": ["$$r.ts", normalize_ts(to_ts)]})
+    if after:
+        after_ts, after_id = normalize_ts(after[0]), after[1]
+        after_start = bucket_start_for(after_ts)
+        bucket_range["$gte"] = max(bucket_range.get("$gte", after_start), after_start)
+        reading_conds.append({"$or": [
+            {"$gt": ["$$r.ts", after_ts]},
+            {"$and": [{"$eq": ["$$r.ts", after_ts]}, {"$gt": ["$$r._id", after_id]}]}
+        ]})
+
+    match = {"station_id": station_oid}
+    if bucket_range:
+        match["bucket_start"] = bucket_range
+
+    pipeline = [{"$match": match}, {"$sort": {"bucket_start": 1}}]
+    if reading_conds:
+        pipeline.append({"$project": {
+            "bucket_start": 1,
+            "readings": {"$filter": {
+                "input": "$readings", "as": "r", "cond": {"$and": reading_conds}
+            }}
+        }})
+    return pipeline
+
+
+def in_order(readings):
+    return sorted(readings, key=lambda r: (r["ts"], r["_id"]))
+
+
+# Yields a station's readings in (ts, _id) order, optionally limited to
+# from_ts <= ts <= to_ts and to readings after the `after` (ts, _id) key.
+# The generator is lazy, so a caller that stops after one page only pulls
+# that page's buckets; batch_size bounds how many buckets each cursor
+# batch carries.
+def iter_readings(station_oid, from_ts=None, to_ts=None, after=None, batch_size=None):
+    pipeline = readings_pipeline(station_oid, from_ts, to_ts, after)
+
+    # Buckets sharing an hour are merged before sorting so overflow
+    # buckets still come out in timestamp order.
+    pending, pending_start = [], None
+    options = {"batchSize": batch_size} if batch_size else {}
+    for bucket in readings_collection.aggregate(pipeline, **options):
+        if bucket["bucket_start"] != pending_start:
+            yield from in_order(pending)
+            pending, pending_start = [], bucket["bucket_start"]
+        pending.extend(bucket.get("readings", []))
+    yield from in_order(pending)
+
+
+# Computes count/avg/min/max over readings inside MongoDB, so memory use does
+# not grow with the number of readings. station_ids limits it to a list of
+# stations (None means every station) and from_ts/to_ts to a time range.
+def summarize(station_ids=None, from_ts=None, to_ts=None):
+    match = {}
+    if station_ids is not None:
+        match["station_id"] = {"$in": list(station_ids)}
+
+    reading_range = {}
+    if from_ts:
+        match.setdefault("bucket_start", {})["$gte"] = bucket_start_for(from_ts)
+        reading_range["$gte"] = normalize_ts(from_ts)
+    if to_ts:
+        match.setdefault("bucket_start", {})["$lte"] = parse_ts(to_ts)
+        reading_range["$lte"] = normalize_ts(to_ts)
+
+    pipeline = [{"$match": match}, {"$unwind": "$readings"}]
+    if reading_range:
+        pipeline.append({"$match": {"readings.ts": reading_range}})
+    pipeline.append({"$group": {
+        "_id": None,
+        "count": {"$sum": 1},
+        "stations": {"$addToSet": "$station_id"},
+        "avg_temp": {"$avg": "$readings.temp_c"},
+        "min_temp": {"$min": "$readings.temp_c"},
+        "max_temp": {"$max": "$readings.temp_c"},
+        "avg_humidity": {"$avg": "$readings.humidity"},
+        "avg_wind_kmh": {"$avg": "$readings.wind_kmh"}
+    }})
+    pipeline.append({"$project": {
+        "count": 1, "avg_temp": 1, "min_temp": 1, "max_temp": 1,
+        "avg_humidity": 1, "avg_wind_kmh": 1,
+        "stations_with_readings": {"$size": "$stations"}
+    }})
+    result = list(readings_collection.aggregate(pipeline, allowDiskUse=True))
+    return result[0] if result else None
@@ -0,0 +1,228 @@
+# ROLLUPS — Incrementally maintained reading aggregates per station
+#
+# Every station keeps running aggregates of its readings at three
+# granularities in the rollups collection:
+#
+#   {
+#       "station_id": ObjectId,
+#       "granularity": "hour" | "day" | "all",
+#       "period_start": datetime | None,   # None for "all"
+#       "count": int,
+#       "sum":   {metric: float},
+#       "sumsq": {metric: float},
+#       "min":   {metric: float},
+#       "max":   {metric: float}
+#   }
+#
+# New readings are folded in atomically with $inc/$min/$max, so reading
+# trends is a single document lookup. Removing a reading decrements
+# count/sum/sumsq, but min and max cannot be "un-applied": a rollup whose
+# min or max came from the removed reading is recomputed from the next
+# finer level (raw readings -> hour -> day -> all).
+
+from pymongo import UpdateOne, ReturnDocument
+from globals import rollups_collection, readings_collection
+import readings_store
+import datetime
+import math
+
+GRANULARITIES = ["hour", "day", "all"]
+METRICS = readings_store.METRICS
+
+
+# HELPER FUNCTION: period_start()
+# Returns the start of the hour/day containing ts, or None for "all".
+
+def period_start(granularity, ts):
+    start = readings_store.bucket_start_for(ts)
+    if granularity == "day":
+        return start.replace(hour=0)
+    if granularity == "all":
+        return None
+    return start
+
+
+def _period_end(granularity, start):
+    if granularity == "hour":
+        return start + datetime.timedelta(hours=1)
+    return start + datetime.timedelta(days=1)
+
+
+def _key(station_oid, granularity, start):
+    return {"station_id": station_oid, "granularity": granularity, "period_start": start}
+
+
+def _values(reading):
+    return {m: float(reading.get(m) or 0) for m in METRICS}
+
+
+# Folds one reading (or another aggregate) into an aggregate dict
+def _fold(agg, count, sums, sumsqs, mins, maxs):
+    agg["count"] += count
+    for m in METRICS:
+        agg["sum"][m] = agg["sum"].get(m, 0) + sums[m]
+        agg["sumsq"][m] = agg["sumsq"].get(m, 0) + sumsqs[m]
+        agg["min"][m] = mins[m] if m not in agg["min"] else min(agg["min"][m], mins[m])
+        agg["max"][m] = maxs[m] if m not in agg["max"] else max(agg["max"][m], maxs[m])
+
+
+def _empty():
+    return {"count": 0, "sum": {}, "sumsq": {}, "min": {}, "max": {}}
+
+
+def add_reading(station_oid, reading):
+    add_readings(station_oid, [reading])
+
+
+# Adds a batch of readings. Readings falling into the same period are
+# combined first, so a batch costs one upsert per touched period.
+def add_readings(station_oid, readings):
+    periods = {}
+    for reading in readings:
+        values = _values(reading)
+        squares = {m: v * v for m, v in values.items()}
+        for granularity in GRANULARITIES:
+            key = (granularity, period_start(granularity, reading["ts"]))
+            _fold(periods.setdefault(key, _empty()), 1, values, squares, values, values)
+
+    ops = []
+    for (granularity, start), agg in periods.items():
+        update = {"$inc": {"count": agg["count"]}, "$min": {}, "$max": {}}
+        for m in METRICS:
+            update["$inc"][f"sum.{m}"] = agg["sum"][m]
+            update["$inc"][f"sumsq.{m}"] = agg["sumsq"][m]
+            update["$min"][f"min.{m}"] = agg["min"][m]
+            update["$max"][f"max.{m}"] = agg["max"][m]
+        ops.append(UpdateOne(_key(station_oid, granularity, start), update, upsert=True))
+
+    if ops:
+        rollups_collection.bulk_write(ops, ordered=False)
+
+
+# Takes a removed reading back out of its hour, day and overall rollups.
+def remove_reading(station_oid, reading):
+    values = _values(reading)
+    inc = {"count": -1}
+    for m, v in values.items():
+        inc[f"sum.{m}"] = -v
+        inc[f"sumsq.{m}"] = -v * v
+
+    # Finest level first, so recomputing a day can rely on its hours
+    for granularity in GRANULARITIES:
+        start = period_start(granularity, reading["ts"])
+        doc = rollups_collection.find_one_and_update(
+            _key(station_oid, granularity, start),
+            {"$inc": inc},
+            return_document=ReturnDocument.AFTER
+        )
+        if doc is None:
+            continue
+        if doc["count"] <= 0:
+            rollups_collection.delete_one({"_id": doc["_id"]})
+        elif any(values[m] in (doc["min"].get(m), doc["max"].get(m)) for m in METRICS):
+            _recompute_extremes(station_oid, granularity, start)
+
+
+def replace_reading(station_oid, old_reading, new_reading):
+    remove_reading(station_oid, old_reading)
+    add_reading(station_oid, new_reading)
+
+
+# Recompute fallback: rebuilds min/max of one rollup from the level below it.
+def _recompute_extremes(station_oid, granularity, start):
+    mins, maxs = {}, {}
+
+    if granularity == "hour":
+        end = _period_end("hour", start) - datetime.timedelta(microseconds=1)
+        for reading in readings_store.iter_readings(station_oid, start, end):
+            for m, v in _values(reading).items():
+                mins[m] = min(mins.get(m, v), v)
+                maxs[m] = max(maxs.get(m, v), v)
+    else:
+        query = {"station_id": station_oid}
+        if granularity == "day":
+            query["granularity"] = "hour"
+            query["period_start"] = {"$gte": start, "$lt": _period_end("day", start)}
+        else:
+            query["granularity"] = "day"
+        for child in rollups_collection.find(query, {"min": 1, "max": 1}):
+            for m in METRICS:
+                mins[m] = min(mins.get(m, child["min"][m]), child["min"][m])
+                maxs[m] = max(maxs.get(m, child["max"][m]), child["max"][m])
+
+    if mins:
+        rollups_collection.update_one(
+            _key(station_oid, granularity, start),
+            {"$set": {"min": mins, "max": maxs}}
+        )
+
+
+# Rebuilds every rollup of a station from its stored readings.
+# Used by the backfill migration and when a station has no rollups yet.
+def rebuild_station(station_oid):
+    group = {"_id": "$bucket_start", "count": {"$sum": 1}}
+    for m in METRICS:
+        field = f"$readings.{m}"
+        group[f"sum_{m}"] = {"$sum": field}
+        group[f"sumsq_{m}"] = {"$sum": {"$multiply": [field, field]}}
+        group[f"min_{m}"] = {"$min": field}
+        group[f"max_{m}"] = {"$max": field}
+
+    periods = {}
+    hours = readings_collection.aggregate([
+        {"$match": {"station_id": station_oid}},
+        {"$unwind": "$readings"},
+        {"$group": group}
+    ])
+    for hour in hours:
+        parts = [{m: float(hour[f"{part}_{m}"] or 0) for m in METRICS}
+                 for part in ("sum", "sumsq", "min", "max")]
+        for granularity in GRANULARITIES:
+            key = (granularity, period_start(granularity, hour["_id"]))
+            _fold(periods.setdefault(key, _empty()), hour["count"], *parts)
+
+    rollups_collection.delete_many({"station_id": station_oid})
+    docs = [dict(_key(station_oid, granularity, start), **agg)
+            for (granularity, start), agg in periods.items()]
+    if docs:
+        rollups_collection.insert_many(docs, ordered=False)
+    return len(docs)
+
+
+def delete_station(station_oid):
+    rollups_collection.delete_many({"station_id": station_oid})
+
+
+# Turns a rollup document into count/avg/min/max/std per metric.
+def describe(doc):
+    count = doc["count"]
+    stats = {"count": count}
+    for m in METRICS:
+        mean = doc["sum"][m] / count
+        variance = max(doc["sumsq"][m] / count - mean * mean, 0)
+        stats[m] = {
+            "avg": mean,
+            "min": doc["min"][m],
+            "max": doc["max"][m],
+            "std": math.sqrt(variance)
+        }
+    return stats
+
+
+def get_overall(station_oid):
+    doc = rollups_collection.find_one(_key(station_oid, "all", None))
+    if doc is None or doc["count"] <= 0:
+        return None
+    return doc
+
+
+# Returns the hour or day rollups of a station in time order.
+def get_series(station_oid, granularity, from_ts=None, to_ts=None):
+    query = {"station_id": station_oid, "granularity": granularity}
+    if from_ts or to_ts:
+        query["period_start"] = {}
+        if from_ts:
+            query["period_start"]["$gte"] = period_start(granularity, from_ts)
+        if to_ts:
+            query["period_start"]["$lte"] = readings_store.parse_ts(to_ts)
+    return rollups_collection.find(query).sort("period_start", 1)
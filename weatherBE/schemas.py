@@ -0,0 +1,249 @@
+# SCHEMAS — Declared request payloads, parsed and coerced in one pass
+#
+# Every request body the blueprints accept is declared once below as a
+# Schema of Fields. A schema is compiled when it is declared: each field
+# becomes a (name, converter, required, default) entry, so parsing a
+# payload is a single loop over the fields with no per-request lookups.
+#
+#   values = schemas.READING.parse(schemas.request_data())
+#
+# parse() returns a plain dict of converted values and raises SchemaError
+# (a ValueError) listing every invalid field, before any database work.
+# Routes answer it with error_response(), so every invalid body gets the
+# same 400 shape: {"Error": summary, "Details": {field: message}}.
+# A partial schema (updates) only returns the fields that were sent;
+# empty values count as not sent.
+
+from flask import request, make_response, jsonify
+from bson import ObjectId
+import readings_store
+import datetime
+import math
+
+_REQUIRED = object()   # marks a field without a default
+
+_TRUE = {"1", "true", "yes", "on"}
+_FALSE = {"0", "false", "no", "off", ""}
+
+
+class SchemaError(ValueError):
+    def __init__(self, errors, missing=()):
+        self.errors = errors   # field -> message
+        self.missing = list(missing)   # required fields that were not sent
+        super().__init__("; ".join(errors.values()))
+
+
+# ----- converters: value -> converted value, ValueError/TypeError if invalid -----
+
+def _to_str(value):
+    if type(value) is str:
+        return value.strip()
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        raise TypeError
+    return str(value).strip()
+
+
+def _to_raw_str(value):
+    if not isinstance(value, str):
+        raise TypeError
+    return value
+
+
+def _to_float(value):
+    if type(value) is bool:
+        raise TypeError
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError
+    return number
+
+
+def _to_int(value):
+    if isinstance(value, bool):
+        raise TypeError
+    if isinstance(value, float):
+        if not value.is_integer():
+            raise ValueError
+        return int(value)
+    return int(str(value).strip())
+
+
+def _to_bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise ValueError
+
+
+def _to_timestamp(value):
+    return readings_store.normalize_ts(value)
+
+
+def _to_objectid(value):
+    return ObjectId(str(value))
+
+
+CONVERTERS = {
+    "str": (_to_str, "text"),
+    "raw": (_to_raw_str, "text"),      # kept as sent, e.g. passwords
+    "float": (_to_float, "numeric"),
+    "int": (_to_int, "integer"),
+    "bool": (_to_bool, "boolean"),
+    "timestamp": (_to_timestamp, "timestamp"),
+    "objectid": (_to_objectid, "id"),
+}
+
+
+class Field:
+    __slots__ = ("name", "kind", "default", "minimum", "maximum", "convert", "message")
+
+    # `default` may be a callable, called for every payload that lacks the field.
+    def __init__(self, name, kind="str", default=_REQUIRED, minimum=None, maximum=None):
+        if kind not in CONVERTERS:
+            raise ValueError(f"Unknown field type: {kind}")
+        self.name, self.kind, self.default = name, kind, default
+        self.minimum, self.maximum = minimum, maximum
+        base, label = CONVERTERS[kind]
+        self.message = f"Invalid {label} value for {name}"
+        if minimum is None and maximum is None:
+            self.convert = base
+        else:
+            def bounded(value):
+                value = base(value)
+                if (minimum is not None and value < minimum) or (maximum is not None and value > maximum):
+                    raise ValueError
+                return value
+            self.convert = bounded
+            self.message += _range_text(minimum, maximum)
+
+    @property
+    def required(self):
+        return self.default is _REQUIRED
+
+
+def _range_text(minimum, maximum):
+    if minimum is not None and maximum is not None:
+        return f" (between {minimum} and {maximum})"
+    if minimum is not None:
+        return f" (at least {minimum})"
+    return f" (at most {maximum})"
+
+
+class Schema:
+    def __init__(self, name, fields, partial=False):
+        self.name = name
+        self.partial = partial
+        self.fields = {field.name: field for field in fields}
+        # The compiled form used by parse()
+        self._plan = tuple((field.name, field.convert, field.required, field.default,
+                            callable(field.default), field.message)
+                           for field in fields)
+
+    def field(self, name):
+        return self.fields[name]
+
+    # Converts `data` (a dict) field by field. Unknown keys are ignored.
+    # Raises SchemaError listing every missing or invalid field.
+    def parse(self, data):
+        values = {}
+        errors = {}
+        missing = []
+        partial = self.partial
+        for name, convert, required, default, factory, message in self._plan:
+            value = data.get(name)
+            if value is None or value == "":
+                if partial:
+                    continue
+                if required:
+                    errors[name] = f"Missing required field: {name}"
+                    missing.append(name)
+                    continue
+                values[name] = default() if factory else default
+                continue
+            try:
+                value = convert(value)
+            except (TypeError, ValueError, ArithmeticError):
+                errors[name] = message
+                continue
+            if required and value == "":
+                errors[name] = f"Missing required field: {name}"
+                missing.append(name)
+                continue
+            values[name] = value
+        if errors:
+            raise SchemaError(errors, missing)
+        return values
+
+    # The partial variant of this schema, for updates.
+    def updates(self, name=None):
+        return Schema(name or f"{self.name}_update", self.fields.values(), partial=True)
+
+
+# HELPER FUNCTION: request_data()
+# The request body as a dict: form fields, or a JSON object.
+
+def request_data():
+    if request.form:
+        return request.form.to_dict()
+    data = request.get_json(silent=True)
+    return data if isinstance(data, dict) else {}
+
+
+# HELPER FUNCTION: error_response()
+# The 400 response for a SchemaError; `message` replaces the summary.
+
+def error_response(error, message=None):
+    if message is None:
+        message = "Missing required data" if error.missing else "Invalid request data"
+    return make_response(jsonify({"Error": message, "Details": error.errors}), 400)
+
+
+def _now_ts():
+    return readings_store.normalize_ts(datetime.datetime.utcnow())
+
+
+# ----- payloads -----
+
+REGISTER = Schema("register", [
+    Field("username"),
+    Field("password", "raw"),
+    Field("admin", "bool", default=False),
+])
+
+STATION = Schema("station", [
+    Field("station_name"),
+    Field("city"),
+    Field("state", default=""),
+    Field("region", default=""),
+    Field("place", default=""),
+    Field("country"),
+    Field("avg_temp_c", "float", default=0.0),
+    Field("max_wind_kmh", "float", default=0.0),
+    Field("overall_condition", default="Unknown"),
+    Field("air_quality_index", "int", default=0),
+    Field("views", "int", default=0),
+])
+STATION_UPDATE = STATION.updates()
+
+COMMENT = Schema("comment", [
+    Field("username"),
+    Field("comment"),
+    Field("rating", "int", default=0),
+])
+COMMENT_UPDATE = Schema("comment_update", [
+    Field("comment"),
+    Field("rating", "int"),
+], partial=True)
+
+READING = Schema("reading", [
+    Field("ts", "timestamp", default=_now_ts),
+    Field("temp_c", "float", default=0.0),
+    Field("humidity", "float", default=0.0),
+    Field("wind_kmh", "float", default=0.0),
+    Field("pressure_kpa", "float", default=0.0),
+])
+READING_UPDATE = READING.updates()
@@ -0,0 +1,155 @@
+# SERIALIZATION — JSON responses that understand BSON types
+#
+# app.create_app() installs JSONProvider as the app's JSON provider, so
+# every jsonify() response goes through it. Documents can be returned as
+# they come from the cursor: ObjectId values (including nested ones, e.g.
+# comment or reading ids) become strings, Decimal128 / Decimal become
+# decimal strings and datetimes are written in one of two formats:
+#
+#   JSON_DATETIME_FORMAT = "http"   — "Sun, 06 Nov 1994 08:49:37 GMT", as
+#                                     Flask has always written them (default)
+#   JSON_DATETIME_FORMAT = "iso"    — "1994-11-06T08:49:37+00:00"
+#
+# The encoder is pluggable (JSON_SERIALIZER):
+#   orjson — C encoder; dicts, lists, strings and numbers never reach
+#            Python code, only the BSON types above do (pip install orjson)
+#   json   — the standard library encoder
+#   auto   — orjson when it is installed, json otherwise (default)
+#
+# With the http format, the json encoder writes exactly what jsonify() used
+# to. orjson writes the same values, but not always the same bytes:
+#   - non-ASCII text is sent as UTF-8 instead of \uXXXX escapes
+#   - NaN and infinities become null (json writes NaN / Infinity, which
+#     JSON parsers reject; readings never store them, see schemas.py)
+#   - large and small floats have no "+" in the exponent (1e20, not 1e+20)
+#
+# Keys are sorted, as jsonify() has always done, unless the app turns
+# JSON sort_keys off.
+
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+from bson import ObjectId, Decimal128
+import dataclasses
+import datetime
+import decimal
+import json
+import uuid
+
+SERIALIZERS = ("auto", "orjson", "json")
+DATETIME_FORMATS = ("http", "iso")
+
+
+_DAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+_MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+
+# werkzeug.http.http_date() output, without its per-call overhead
+def _http_date(value):
+    if not isinstance(value, datetime.datetime):
+        return http_date(value)
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc)
+    return (f"{_DAYS[value.weekday()]}, {value.day:02d} {_MONTHS[value.month - 1]} {value.year:04d} "
+            f"{value.hour:02d}:{value.minute:02d}:{value.second:02d} GMT")
+
+
+def _iso(value):
+    if isinstance(value, datetime.datetime) and value.tzinfo is None:
+        # Stored datetimes are naive UTC
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.isoformat()
+
+
+# Returns the `default` hook for values the encoders do not know.
+def make_default(datetime_format="http"):
+    if datetime_format not in DATETIME_FORMATS:
+        raise ValueError(f"JSON_DATETIME_FORMAT must be one of {', '.join(DATETIME_FORMATS)}")
+    format_date = _http_date if datetime_format == "http" else _iso
+
+    def default(value):
+        if isinstance(value, ObjectId):
+            return str(value)
+        if isinstance(value, datetime.date):
+            return format_date(value)
+        if isinstance(value, Decimal128):
+            return str(value.to_decimal())
+        if isinstance(value, (decimal.Decimal, uuid.UUID)):
+            return str(value)
+        if dataclasses.is_dataclass(value) and not isinstance(value, type):
+            return dataclasses.asdict(value)
+        if hasattr(value, "__html__"):
+            return str(value.__html__())
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+    return default
+
+
+def _orjson():
+    try:
+        import orjson
+    except ImportError:
+        return None
+    return orjson
+
+
+# Returns dumps(obj, sort_keys, indent) -> bytes for the chosen encoder.
+# Raises ValueError for an unknown name, RuntimeError if orjson is asked
+# for and not installed.
+def make_dumps(serializer="auto", datetime_format="http"):
+    if serializer not in SERIALIZERS:
+        raise ValueError(f"JSON_SERIALIZER must be one of {', '.join(SERIALIZERS)}")
+    default = make_default(datetime_format)
+    orjson = _orjson() if serializer != "json" else None
+    if serializer == "orjson" and orjson is None:
+        raise RuntimeError("JSON_SERIALIZER=orjson requires orjson (pip install orjson)")
+
+    if orjson is not None:
+        base = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATACLASS
+        if datetime_format == "http":
+            base |= orjson.OPT_PASSTHROUGH_DATETIME
+        else:
+            base |= orjson.OPT_NAIVE_UTC
+
+        def dumps(obj, sort_keys=True, indent=False):
+            option = base
+            if sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            if indent:
+                option |= orjson.OPT_INDENT_2
+            return orjson.dumps(obj, default=default, option=option)
+        dumps.encoder = "orjson"
+        return dumps
+
+    def dumps(obj, sort_keys=True, indent=False):
+        text = json.dumps(obj, default=default, sort_keys=sort_keys,
+                          indent=2 if indent else None,
+                          separators=None if indent else (",", ":"))
+        return text.encode("utf-8")
+    dumps.encoder = "json"
+    return dumps
+
+
+class JSONProvider(DefaultJSONProvider):
+    def __init__(self, app, serializer="auto", datetime_format="http"):
+        super().__init__(app)
+        self._dumps = make_dumps(serializer, datetime_format)
+
+    @property
+    def encoder(self):
+        return self._dumps.encoder
+
+    def dumps(self, obj, **kwargs):
+        return self._dumps(obj, kwargs.get("sort_keys", self.sort_keys)).decode("utf-8")
+
+    # jsonify(): the encoded bytes go into the response as they are
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        body = self._dumps(obj, self.sort_keys, indent)
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
+
+
+# Installs the provider on a Flask (or Quart) app.
+def install(app, serializer="auto", datetime_format="http"):
+    app.json = JSONProvider(app, serializer, datetime_format)
+    return app.json
@@ -0,0 +1,229 @@
+# SLOW QUERIES — Diagnostic log of slow MongoDB commands
+#
+# When SLOW_QUERY_ENABLED is set, a PyMongo command listener watches every
+# command. Reads and writes that take at least SLOW_QUERY_THRESHOLD_MS are
+# logged with the route that issued them and their normalized shape
+# (literal values replaced by "?", e.g. {"loc.region": {"$regex": "?"}}),
+# then re-run as explain("executionStats") on a background thread to record
+# keys/documents examined against documents returned. A shape is explained
+# at most once per EXPLAIN_INTERVAL_SECONDS.
+#
+# Entries go to the capped `slow_queries` collection:
+#   {"at", "route", "method", "database", "collection", "command",
+#    "duration_ms", "shape", "explain": {"docs_examined", "keys_examined",
+#    "returned", "execution_ms", "stages", "collection_scan"} | {"error"}}
+# and are listed on GET /slow-queries (admin). Raw query values are never
+# stored.
+
+from flask import has_request_context, request
+from pymongo import monitoring
+from collections import OrderedDict
+from globals import settings, get_client, slow_queries_collection
+import indexes
+import threading
+import datetime
+import queue
+import json
+import time
+
+COLLECTION = "slow_queries"
+
+# Commands that can be explained, and the field holding their query
+EXPLAINABLE = {
+    "find": "filter",
+    "aggregate": "pipeline",
+    "count": "query",
+    "distinct": "query",
+    "delete": "deletes",
+    "update": "updates",
+    "findAndModify": "query",
+}
+
+# Session and transport fields that are not part of the command itself
+_TRANSPORT_FIELDS = {"lsid", "txnNumber", "autocommit", "startTransaction",
+                     "$clusterTime", "$db", "$readPreference", "cursor"}
+
+EXPLAIN_INTERVAL_SECONDS = 60
+MAX_EXPLAINED_SHAPES = 10000   # shapes remembered for the interval above
+MAX_QUEUE = 1000
+
+
+# HELPER FUNCTION: query_shape()
+# Replaces every literal value of a query or pipeline with "?", keeping
+# field names and operators, so equal shapes can be grouped.
+
+def query_shape(value):
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = [query_shape(item) for item in value]
+        # $in lists and the like collapse to a single placeholder
+        if all(shape == "?" for shape in shapes):
+            return ["?"] if shapes else []
+        return shapes
+    return "?"
+
+
+def _command_shape(command_name, command):
+    field = EXPLAINABLE[command_name]
+    shape = {field: query_shape(command.get(field))}
+    for extra in ("sort", "projection", "fields", "key"):
+        if extra in command:
+            shape[extra] = command[extra] if extra != "key" else query_shape(command[extra])
+    return shape
+
+
+def _find_stats(explain):
+    if isinstance(explain, dict):
+        if "executionStats" in explain:
+            return explain["executionStats"]
+        for value in explain.values():
+            stats = _find_stats(value)
+            if stats is not None:
+                return stats
+    elif isinstance(explain, list):
+        for value in explain:
+            stats = _find_stats(value)
+            if stats is not None:
+                return stats
+    return None
+
+
+def summarize_explain(explain):
+    stats = _find_stats(explain) or {}
+    stages = sorted(set(indexes.plan_stages(explain.get("queryPlanner", explain))))
+    return {
+        "docs_examined": stats.get("totalDocsExamined"),
+        "keys_examined": stats.get("totalKeysExamined"),
+        "returned": stats.get("nReturned"),
+        "execution_ms": stats.get("executionTimeMillis"),
+        "stages": stages,
+        "collection_scan": "COLLSCAN" in stages
+    }
+
+
+class SlowQueryListener(monitoring.CommandListener):
+    def __init__(self):
+        self._pending = {}   # (connection, request id) -> entry
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(MAX_QUEUE)
+        self._worker = None
+        self._explained = OrderedDict()   # shape key -> time of last explain, oldest first
+
+    def started(self, event):
+        if event.command_name not in EXPLAINABLE:
+            return
+        command = event.command
+        collection = command.get(event.command_name)
+        if collection == COLLECTION:
+            return
+        if event.command_name == "aggregate" and any(
+                "$out" in stage or "$merge" in stage for stage in command.get("pipeline", [])):
+            return
+
+        entry = {
+            "database": event.database_name,
+            "collection": collection,
+            "command": event.command_name,
+            "shape": _command_shape(event.command_name, command),
+            "explain_command": {k: v for k, v in command.items() if k not in _TRANSPORT_FIELDS},
+        }
+        if has_request_context():
+            entry["route"] = request.url_rule.rule if request.url_rule is not None else request.path
+            entry["method"] = request.method
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = entry
+
+    def _finish(self, event):
+        with self._lock:
+            entry = self._pending.pop((event.connection_id, event.request_id), None)
+        if entry is None:
+            return
+        duration_ms = event.duration_micros / 1000
+        if duration_ms < settings["SLOW_QUERY_THRESHOLD_MS"]:
+            return
+        entry["duration_ms"] = round(duration_ms, 3)
+        entry["at"] = datetime.datetime.utcnow()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            return
+        self._ensure_worker()
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event)
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            with self._lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._run, name="slow-query-log", daemon=True)
+                    self._worker.start()
+
+    def _explain(self, entry, command):
+        key = json.dumps([entry["collection"], entry["command"], entry["shape"]], sort_keys=True, default=str)
+        now = time.monotonic()
+        # Shapes explained longer than an interval ago are forgotten
+        while self._explained and now - next(iter(self._explained.values())) >= EXPLAIN_INTERVAL_SECONDS:
+            self._explained.popitem(last=False)
+        if key in self._explained:
+            return None
+        self._explained[key] = now
+        if len(self._explained) > MAX_EXPLAINED_SHAPES:
+            self._explained.popitem(last=False)
+        try:
+            explain = get_client()[entry["database"]].command(
+                {"explain": command, "verbosity": "executionStats"}
+            )
+            return summarize_explain(explain)
+        except Exception as e:
+            return {"error": str(e)}
+
+    def process(self, entry):
+        command = entry.pop("explain_command")
+        if settings["SLOW_QUERY_EXPLAIN"]:
+            entry["explain"] = self._explain(entry, command)
+        # Shapes keep operator names, which MongoDB rejects as stored keys
+        entry["shape"] = json.dumps(entry["shape"], sort_keys=True, default=str)
+        slow_queries_collection.insert_one(entry)
+
+    def _run(self):
+        while True:
+            entry = self._queue.get()
+            try:
+                self.process(entry)
+            except Exception:
+                pass
+            finally:
+                self._queue.task_done()
+
+    # Blocks until every queued entry has been written (used by tests/scripts).
+    def flush(self):
+        self._queue.join()
+
+
+listener = SlowQueryListener()
+
+
+# Creates the capped collection if it does not exist yet.
+def ensure_collection(database=None):
+    database = database if database is not None else get_client()[settings["DB_NAME"]]
+    if COLLECTION not in database.list_collection_names():
+        database.create_collection(COLLECTION, capped=True, size=settings["SLOW_QUERY_LOG_SIZE_BYTES"])
+
+
+# Most recent entries first, optionally for one route or collection.
+def recent(limit=100, route=None, collection=None):
+    query = {}
+    if route:
+        query["route"] = route
+    if collection:
+        query["collection"] = collection
+    entries = []
+    for entry in slow_queries_collection.find(query).sort("$natural", -1).limit(limit):
+        entry["shape"] = json.loads(entry["shape"])
+        entries.append(entry)
+    return entries
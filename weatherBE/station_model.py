@@ -0,0 +1,407 @@
+# STATION MODEL — In-process read model of station metadata
+#
+# The station fields read by the list and stats endpoints (name, location,
+# condition, AQI, temperature, wind) are small and change rarely. When
+# STATION_MODEL_ENABLED is set, each worker process keeps a copy of them:
+#
+#   StationRecord        — one __slots__ record per station, replaced (never
+#                          mutated) on change, with its normalized location
+#                          keys (see locations.py)
+#   _order               — station ids in _id order, for keyset pages
+#   _by[field][key]      — secondary indexes: region / state / country ->
+#                          normalized value -> station ids
+#
+# A background thread keeps it fresh, started on first use in every process
+# (so a pre-forked worker never inherits a dead thread):
+#   change_stream — a change stream on the weather collection (replica sets)
+#   poll          — stations whose last_updated_at or _id moved past the
+#                   last one seen, every STATION_MODEL_POLL_SECONDS
+#   auto          — change_stream, falling back to poll when the server has
+#                   no change streams (standalone mongod)
+# Writes made by this process are applied at once (refresh() / discard()).
+# Every STATION_MODEL_RECONCILE_SECONDS the model is reloaded from MongoDB
+# and the difference counted as drift; this also picks up deletes made by
+# other processes when polling.
+#
+# The model is bounded: above STATION_MODEL_MAX_STATIONS stations it drops
+# its data and stops. Readers check ready() and fall back to MongoDB.
+
+from bisect import bisect_right, insort
+from pymongo.errors import PyMongoError, OperationFailure
+from globals import settings, weather_collection
+from cache import response_cache
+import locations
+import threading
+import datetime
+import os
+
+# Station fields held by the model, besides _id
+FIELDS = ("station_name", "city", "state", "region", "place", "country",
+          "overall_condition", "air_quality_index", "avg_temp_c", "max_wind_kmh")
+
+# Location fields with a secondary index
+INDEXED_FIELDS = ("region", "state", "country")
+
+SYNC_MODES = ("change_stream", "poll", "auto")
+
+# Server error for a change stream on a standalone mongod
+CHANGE_STREAM_UNSUPPORTED = 40573
+
+PROJECTION = dict.fromkeys(FIELDS + ("last_updated_at",), 1)
+
+# Change stream events that change the model
+_CHANGE_PIPELINE = [{"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}}]
+
+_MISSING = object()   # field absent from the document
+
+
+class StationRecord:
+    __slots__ = ("_id", "last_updated_at", "loc") + FIELDS
+
+    def __init__(self, doc):
+        self._id = doc["_id"]
+        self.last_updated_at = doc.get("last_updated_at")
+        for field in FIELDS:
+            setattr(self, field, doc.get(field, _MISSING))
+        self.loc = {field: locations.normalize(doc.get(field)) for field in locations.LOCATION_FIELDS}
+
+    def get(self, field, default=None):
+        value = getattr(self, field)
+        return default if value is _MISSING else value
+
+    def number(self, field):
+        # Missing or null values count as 0, as in the stats pipeline
+        value = self.get(field)
+        return value if isinstance(value, (int, float)) else 0
+
+    def same_as(self, other):
+        return all(getattr(self, field) == getattr(other, field) for field in FIELDS)
+
+    # The record as a response document with the given fields
+    def to_dict(self, fields=FIELDS):
+        doc = {}
+        for field in fields:
+            value = str(self._id) if field == "_id" else getattr(self, field)
+            if value is not _MISSING:
+                doc[field] = value
+        return doc
+
+
+def _empty_indexes():
+    return {field: {} for field in INDEXED_FIELDS}
+
+
+class StationModel:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._records = {}               # _id -> StationRecord
+        self._order = []                 # sorted _ids
+        self._by = _empty_indexes()
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._state = "stopped"          # stopped, loading, ready, overflow
+        self._mode = None                # sync actually in use
+        self._watermark = None           # newest last_updated_at seen (poll)
+        self._last_id = None             # newest _id seen (poll)
+        self._stats = {"changes_applied": 0, "reconciles": 0, "last_drift": None,
+                       "loaded_at": None, "synced_at": None, "reconciled_at": None, "error": None}
+
+    # ----- indexes -----
+
+    def _index(self, record):
+        for field in INDEXED_FIELDS:
+            self._by[field].setdefault(record.loc[field], set()).add(record._id)
+
+    def _unindex(self, record):
+        for field in INDEXED_FIELDS:
+            ids = self._by[field].get(record.loc[field])
+            if ids is not None:
+                ids.discard(record._id)
+                if not ids:
+                    del self._by[field][record.loc[field]]
+
+    def _put(self, doc):
+        record = StationRecord(doc)
+        previous = self._records.get(record._id)
+        if previous is not None:
+            self._unindex(previous)
+        elif len(self._records) >= settings["STATION_MODEL_MAX_STATIONS"]:
+            self._overflow()
+            return None
+        else:
+            insort(self._order, record._id)
+        self._records[record._id] = record
+        self._index(record)
+        if record.last_updated_at and (self._watermark is None or record.last_updated_at > self._watermark):
+            self._watermark = record.last_updated_at
+        if self._last_id is None or record._id > self._last_id:
+            self._last_id = record._id
+        return record
+
+    def _remove(self, oid):
+        record = self._records.pop(oid, None)
+        if record is not None:
+            self._unindex(record)
+            del self._order[bisect_right(self._order, oid) - 1]
+        return record
+
+    def _overflow(self):
+        self._records, self._order, self._by = {}, [], _empty_indexes()
+        self._state = "overflow"
+        self._stats["error"] = f"more than {settings['STATION_MODEL_MAX_STATIONS']} stations"
+        self._stop.set()
+
+    # ----- loading and sync -----
+
+    # Reads every station and swaps the new data in; returns the drift
+    # (stations added, removed and changed) against the previous data.
+    def _load(self):
+        fresh = StationModel()
+        for doc in weather_collection.find({}, PROJECTION).sort("_id", 1):
+            if len(fresh._records) >= settings["STATION_MODEL_MAX_STATIONS"]:
+                with self._lock:
+                    self._overflow()
+                return None
+            record = StationRecord(doc)
+            fresh._records[record._id] = record
+            fresh._order.append(record._id)
+            fresh._index(record)
+            if record.last_updated_at and (fresh._watermark is None or record.last_updated_at > fresh._watermark):
+                fresh._watermark = record.last_updated_at
+        with self._lock:
+            old = self._records
+            drift = {
+                "added": sum(1 for oid in fresh._records if oid not in old),
+                "removed": sum(1 for oid in old if oid not in fresh._records),
+                "changed": sum(1 for oid, record in fresh._records.items()
+                               if oid in old and not record.same_as(old[oid]))
+            }
+            self._records, self._order, self._by = fresh._records, fresh._order, fresh._by
+            self._watermark = fresh._watermark
+            self._last_id = fresh._order[-1] if fresh._order else None
+            self._state = "ready"
+        return drift
+
+    def _reconcile(self):
+        drift = self._load()
+        if drift is None:
+            return
+        now = datetime.datetime.utcnow()
+        self._stats["reconciles"] += 1
+        self._stats["reconciled_at"] = now
+        self._stats["last_drift"] = drift
+        if any(drift.values()):
+            response_cache.invalidate("stations")
+
+    def _reconcile_due(self):
+        reconciled = self._stats["reconciled_at"] or self._stats["loaded_at"]
+        return (datetime.datetime.utcnow() - reconciled).total_seconds() >= settings["STATION_MODEL_RECONCILE_SECONDS"]
+
+    def _initial_load(self):
+        self._state = "loading"
+        self._load()
+        self._stats["loaded_at"] = self._stats["synced_at"] = datetime.datetime.utcnow()
+
+    def _changed(self, oid):
+        self._stats["changes_applied"] += 1
+        self._stats["synced_at"] = datetime.datetime.utcnow()
+        response_cache.invalidate("stations", f"station:{oid}")
+
+    def _apply_change(self, change):
+        oid = change["documentKey"]["_id"]
+        with self._lock:
+            if change["operationType"] == "delete" or change.get("fullDocument") is None:
+                self._remove(oid)
+            else:
+                self._put(change["fullDocument"])
+        self._changed(oid)
+
+    def _follow_change_stream(self):
+        stream = weather_collection.watch(_CHANGE_PIPELINE, full_document="updateLookup",
+                                          max_await_time_ms=1000)
+        with stream:
+            self._mode = "change_stream"
+            # Opened before loading, so no change between the two is lost
+            self._initial_load()
+            while not self._stop.is_set():
+                change = stream.try_next()
+                if change is not None:
+                    self._apply_change(change)
+                elif self._reconcile_due():
+                    self._reconcile()
+
+    def _poll_once(self):
+        changed = []
+        if self._watermark is not None or self._last_id is not None:
+            clauses = []
+            if self._watermark is not None:
+                clauses.append({"last_updated_at": {"$gte": self._watermark}})
+            if self._last_id is not None:
+                clauses.append({"_id": {"$gt": self._last_id}})
+            query = {"$or": clauses}
+        else:
+            query = {}
+        for doc in weather_collection.find(query, PROJECTION):
+            with self._lock:
+                previous = self._records.get(doc["_id"])
+                record = self._put(doc)
+            if record is None:
+                return
+            if previous is None or not record.same_as(previous):
+                changed.append(record._id)
+        for oid in changed:
+            self._changed(oid)
+        self._stats["synced_at"] = datetime.datetime.utcnow()
+
+    def _poll(self):
+        self._mode = "poll"
+        self._initial_load()
+        while not self._stop.wait(settings["STATION_MODEL_POLL_SECONDS"]):
+            self._poll_once()
+            if self._reconcile_due():
+                self._reconcile()
+
+    def _run(self):
+        mode = settings["STATION_MODEL_SYNC"]
+        while not self._stop.is_set():
+            try:
+                if mode == "poll":
+                    self._poll()
+                else:
+                    try:
+                        self._follow_change_stream()
+                    except OperationFailure as e:
+                        # Change streams need a replica set or sharded cluster
+                        if mode == "change_stream" or e.code != CHANGE_STREAM_UNSUPPORTED:
+                            raise
+                        self._stats["error"] = f"change stream unavailable: {e}"
+                        mode = "poll"
+            except PyMongoError as e:
+                self._stats["error"] = str(e)
+                self._stop.wait(settings["STATION_MODEL_POLL_SECONDS"])
+
+    # Starts the sync thread of this process if it is not running.
+    def ensure_started(self):
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None:
+                return
+            if settings["STATION_MODEL_SYNC"] not in SYNC_MODES:
+                raise ValueError(f"STATION_MODEL_SYNC must be one of {', '.join(SYNC_MODES)}")
+            # Data inherited through fork has no thread keeping it fresh
+            self._records, self._order, self._by = {}, [], _empty_indexes()
+            self._state = "stopped"
+            self._stop = threading.Event()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="station-model", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread, self._pid = None, None
+
+    # ----- reads -----
+
+    # Whether reads can be served from the model; starts it if enabled.
+    def ready(self):
+        if not settings["STATION_MODEL_ENABLED"]:
+            return False
+        self.ensure_started()
+        return self._state == "ready"
+
+    def active(self):
+        return settings["STATION_MODEL_ENABLED"] and self._pid == os.getpid() and self._state == "ready"
+
+    def __len__(self):
+        return len(self._records)
+
+    # Stations in _id order after `after` (an ObjectId), skipping `skip`.
+    def page(self, after=None, skip=0, limit=10):
+        with self._lock:
+            start = bisect_right(self._order, after) if after is not None else 0
+            start += skip
+            return [self._records[oid] for oid in self._order[start:start + limit]]
+
+    # Stations matching the location filters of `args` on `fields`, as
+    # locations.location_query() would, in _id order. Equality and prefix
+    # filters on region / state / country use the secondary indexes.
+    # Raises ValueError for an unknown match mode.
+    def select(self, args, fields):
+        mode = args.get("match", "prefix")
+        if mode not in locations.MATCH_MODES:
+            raise ValueError(f"match must be one of {', '.join(locations.MATCH_MODES)}")
+        filters = {field: locations.normalize(args.get(field, "").strip())
+                   for field in fields if args.get(field, "").strip()}
+
+        with self._lock:
+            candidates = None
+            for field, key in filters.items():
+                if field not in INDEXED_FIELDS or mode == "contains":
+                    continue
+                ids = set()
+                for value, value_ids in self._by[field].items():
+                    if locations.key_matches(value, key, mode):
+                        ids |= value_ids
+                candidates = ids if candidates is None else candidates & ids
+            oids = self._order if candidates is None else sorted(candidates)
+            records = [self._records[oid] for oid in oids]
+
+        return [record for record in records
+                if all(locations.key_matches(record.loc[field], key, mode) for field, key in filters.items())]
+
+    # Applies a write made by this process: reloads one station.
+    def refresh(self, oid):
+        if not self.active():
+            return
+        doc = weather_collection.find_one({"_id": oid}, PROJECTION)
+        with self._lock:
+            if doc is None:
+                self._remove(oid)
+            else:
+                self._put(doc)
+
+    def discard(self, oid):
+        if not self.active():
+            return
+        with self._lock:
+            self._remove(oid)
+
+    def stats(self):
+        return dict(self._stats,
+                    enabled=settings["STATION_MODEL_ENABLED"],
+                    state=self._state,
+                    sync=self._mode,
+                    stations=len(self._records),
+                    max_stations=settings["STATION_MODEL_MAX_STATIONS"])
+
+
+model = StationModel()
+
+
+# HELPER FUNCTION: stats_buckets()
+# The $group stage of GET /weather/stats over model records: one bucket
+# per normalized group key (or a single bucket), with the same fields and
+# order as the aggregation result.
+
+def stats_buckets(records, group_by=None):
+    buckets = {}
+    for record in records:
+        key = record.loc[group_by] if group_by else None
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = {"_id": key, "total_stations": 0, "avg_temp": 0, "avg_wind": 0, "avg_aqi": 0}
+            if group_by:
+                bucket["label"] = record.get(group_by)
+        bucket["total_stations"] += 1
+        bucket["avg_temp"] += record.number("avg_temp_c")
+        bucket["avg_wind"] += record.number("max_wind_kmh")
+        bucket["avg_aqi"] += record.number("air_quality_index")
+    for bucket in buckets.values():
+        for field in ("avg_temp", "avg_wind", "avg_aqi"):
+            bucket[field] /= bucket["total_stations"]
+    result = list(buckets.values())
+    if group_by:
+        result.sort(key=lambda b: (-b["total_stations"], b["_id"]))
+    return result
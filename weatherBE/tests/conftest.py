@@ -0,0 +1,87 @@
+# TEST FIXTURES — Flask app on an in-memory MongoDB
+#
+# Every test gets a fresh app (see app.create_app) whose MongoClient is a
+# mongomock client, so the suite runs without a MongoDB server:
+#
+#     pip install pytest mongomock
+#     python -m pytest tests        # from the weatherBE directory
+
+import datetime
+import os
+import sys
+
+import jwt
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import globals
+from app import create_app
+
+
+# PyMongo 4.9+ passes `sort` to bulk update/replace operations, which
+# mongomock's BulkOperationBuilder does not accept yet
+def _drop_sort(method):
+    def wrapper(self, *args, **kwargs):
+        kwargs.pop("sort", None)
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+for _name in ("add_update", "add_replace"):
+    _builder = mongomock.collection.BulkOperationBuilder
+    setattr(_builder, _name, _drop_sort(getattr(_builder, _name)))
+
+
+TEST_SETTINGS = {
+    "SECRET_KEY": "test-secret-key-of-at-least-32-bytes",
+    "METRICS_ENABLED": False,
+    "SLOW_QUERY_ENABLED": False,
+}
+
+
+@pytest.fixture
+def make_app(monkeypatch):
+    # A new mongomock client (and so an empty database) per app
+    monkeypatch.setattr(globals, "MongoClient", mongomock.MongoClient)
+
+    def make(**overrides):
+        app = create_app(dict(TEST_SETTINGS, **overrides))
+        app.config["TESTING"] = True
+        return app
+
+    yield make
+    globals.reset_client()
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers():
+    token = jwt.encode({
+        "user": "tester",
+        "admin": True,
+        "exp": datetime.datetime.utcnow() + datetime.timedelta(minutes=5)
+    }, TEST_SETTINGS["SECRET_KEY"], algorithm="HS256")
+    return {"x-access-token": token}
+
+
+@pytest.fixture
+def create_station(client, auth_headers):
+    def create(name="Station", **fields):
+        data = dict({"station_name": name, "city": "Belfast", "country": "UK",
+                     "avg_temp_c": 10}, **fields)
+        response = client.post("/weather", data=data, headers=auth_headers)
+        assert response.status_code == 201, response.json
+        return response.json["URL"].rsplit("/", 1)[1]
+    return create
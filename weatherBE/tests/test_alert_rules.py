@@ -0,0 +1,57 @@
+import datetime
+
+from bson import ObjectId
+
+from globals import weather_collection
+import alert_rules
+
+HEATWAVE = " Heatwave Alert"
+STORM = " Storm Warning"
+
+
+def _reading(**values):
+    return dict({"_id": str(ObjectId()), "ts": datetime.datetime(2024, 1, 1)}, **values)
+
+
+def test_reading_raises_and_clears_alerts(create_station):
+    oid = ObjectId(create_station())
+
+    assert alert_rules.apply_reading(oid, _reading(temp_c=45)) == ([HEATWAVE], [])
+    assert weather_collection.find_one({"_id": oid})["alerts"] == [HEATWAVE]
+
+    assert alert_rules.apply_reading(oid, _reading(temp_c=20)) == ([], [HEATWAVE])
+    assert weather_collection.find_one({"_id": oid})["alerts"] == []
+
+
+class RacingCollection:
+    """Stores another worker's alert between the first read and its write."""
+
+    def __init__(self, oid):
+        self.oid = oid
+        self.reads = 0
+
+    def find_one(self, *args, **kwargs):
+        doc = weather_collection.find_one(*args, **kwargs)
+        self.reads += 1
+        if self.reads == 1:
+            weather_collection.update_one(
+                {"_id": self.oid}, {"$push": {"alerts": STORM}, "$inc": {"rule_seq": 1}}
+            )
+        return doc
+
+    def __getattr__(self, name):
+        return getattr(weather_collection, name)
+
+
+def test_concurrent_write_is_retried_not_overwritten(create_station, monkeypatch):
+    oid = ObjectId(create_station())
+    racing = RacingCollection(oid)
+    monkeypatch.setattr(alert_rules, "weather_collection", racing)
+
+    assert alert_rules.apply_reading(oid, _reading(temp_c=45)) == ([HEATWAVE], [])
+    # The guarded write missed, so the state was read again
+    assert racing.reads == 2
+
+    stored = weather_collection.find_one({"_id": oid})
+    assert sorted(stored["alerts"]) == sorted([HEATWAVE, STORM])
+    assert stored["rule_seq"] == 2
@@ -0,0 +1,75 @@
+import json
+
+from bson import ObjectId
+
+from globals import readings_collection
+
+
+def _post(client, auth_headers, body, content_type="application/json"):
+    return client.post("/weather/readings/bulk", data=body, content_type=content_type,
+                       headers=auth_headers)
+
+
+def _stored(station):
+    return sum(bucket["count"] for bucket in
+               readings_collection.find({"station_id": ObjectId(station)}))
+
+
+def test_invalid_rows_are_reported_by_index(client, auth_headers, create_station):
+    station = create_station()
+    rows = [
+        {"station_id": station, "ts": "2024-01-01T00:00:00", "temp_c": 5},
+        {"station_id": "not-an-id"},
+        {"station_id": str(ObjectId())},
+        {"station_id": station, "temp_c": "warm"},
+        {"temp_c": 1},
+        {"station_id": station, "ts": "2024-01-01T00:05:00", "temp_c": 6},
+    ]
+    response = _post(client, auth_headers, json.dumps(rows))
+
+    assert response.status_code == 201
+    body = response.json
+    assert (body["received"], body["inserted"], body["rejected"]) == (6, 2, 4)
+    assert [error["row"] for error in body["errors"]] == [1, 2, 3, 4]
+    assert _stored(station) == 2
+
+
+def test_float_overflow_rejects_only_that_row(client, auth_headers, create_station):
+    station = create_station()
+    body = '[{"station_id": "%s", "temp_c": 1%s}, {"station_id": "%s", "temp_c": 3}]' % (
+        station, "0" * 400, station)
+    response = _post(client, auth_headers, body)
+
+    assert response.status_code == 201
+    assert response.json["inserted"] == 1
+    assert [error["row"] for error in response.json["errors"]] == [0]
+
+
+def test_ndjson_and_csv_rows(client, auth_headers, create_station):
+    station = create_station()
+    ndjson = "\n".join([
+        json.dumps({"station_id": station, "ts": "2024-01-01T00:00:00", "temp_c": 1}),
+        "{not json",
+        json.dumps({"station_id": station, "ts": "2024-01-01T00:01:00", "temp_c": 2}),
+    ])
+    response = _post(client, auth_headers, ndjson, "application/x-ndjson")
+    assert response.json["inserted"] == 2
+    assert [error["row"] for error in response.json["errors"]] == [1]
+
+    csv_body = f"station_id,ts,temp_c\n{station},2024-01-01T00:02:00,3\n,,\n"
+    response = _post(client, auth_headers, csv_body, "text/csv")
+    assert (response.json["inserted"], response.json["rejected"]) == (1, 1)
+    assert _stored(station) == 3
+
+
+def test_all_rows_invalid_is_a_400(client, auth_headers):
+    response = _post(client, auth_headers, json.dumps([{"station_id": "bad"}]))
+    assert response.status_code == 400
+    assert response.json["inserted"] == 0
+
+
+def test_row_limit_is_a_413(make_app, auth_headers):
+    client = make_app(BULK_MAX_ROWS=2).test_client()
+    rows = [{"station_id": str(ObjectId()), "temp_c": 1}] * 3
+    response = _post(client, auth_headers, json.dumps(rows))
+    assert response.status_code == 413
@@ -0,0 +1,51 @@
+from cache import response_cache, MemoryBackend
+
+
+def test_cached_station_is_served_until_it_is_updated(client, auth_headers, create_station):
+    station = create_station(avg_temp_c=10)
+
+    assert client.get(f"/weather/{station}").json["avg_temp_c"] == 10
+    hits = response_cache.hits
+    assert client.get(f"/weather/{station}").json["avg_temp_c"] == 10
+    assert response_cache.hits == hits + 1
+
+    response = client.put(f"/weather/{station}", data={"avg_temp_c": 25}, headers=auth_headers)
+    assert response.status_code == 200
+    assert client.get(f"/weather/{station}").json["avg_temp_c"] == 25
+
+
+def _station_names(client):
+    return [station["station_name"] for station in client.get("/weather").json["data"]]
+
+
+def test_station_list_sees_new_and_deleted_stations(client, auth_headers, create_station):
+    first = create_station("First")
+    assert _station_names(client) == ["First"]
+
+    create_station("Second")
+    assert _station_names(client) == ["First", "Second"]
+
+    assert client.delete(f"/weather/{first}", headers=auth_headers).status_code == 200
+    assert _station_names(client) == ["Second"]
+
+
+def test_trends_follow_new_readings(client, auth_headers, create_station):
+    station = create_station()
+    client.post(f"/weather/{station}/readings",
+                json={"ts": "2024-01-01T00:00:00", "temp_c": 5}, headers=auth_headers)
+    assert client.get(f"/weather/{station}/trends").json["total_readings"] == 1
+
+    client.post(f"/weather/{station}/readings",
+                json={"ts": "2024-01-01T01:00:00", "temp_c": 7}, headers=auth_headers)
+    assert client.get(f"/weather/{station}/trends").json["total_readings"] == 2
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryBackend(max_entries=2)
+    backend.set("a", 1, 60)
+    backend.set("b", 2, 60)
+    assert backend.get("a") == 1
+    backend.set("c", 3, 60)
+
+    assert (backend.get("a"), backend.get("b"), backend.get("c")) == (1, None, 3)
+    assert len(backend) == 2
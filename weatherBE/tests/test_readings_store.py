@@ -0,0 +1,72 @@
+import datetime
+
+import pytest
+from bson import ObjectId
+
+from globals import readings_collection
+import readings_store
+
+BUCKET_SIZE = 3
+
+
+@pytest.fixture(autouse=True)
+def small_buckets(app, monkeypatch):
+    monkeypatch.setattr(readings_store, "BUCKET_SIZE", BUCKET_SIZE)
+
+
+def _reading(minute, hour=0, temp_c=1.0):
+    reading = {"_id": str(ObjectId()), "ts": datetime.datetime(2024, 1, 1, hour, minute)}
+    reading.update({metric: temp_c for metric in readings_store.METRICS})
+    return reading
+
+
+def _bucket_counts(oid):
+    return sorted((str(bucket["bucket_start"]), bucket["count"], len(bucket["readings"]))
+                  for bucket in readings_collection.find({"station_id": oid}))
+
+
+def test_insert_reading_opens_a_new_bucket_when_full():
+    oid = ObjectId()
+    for minute in range(BUCKET_SIZE * 2 + 1):
+        readings_store.insert_reading(oid, _reading(minute))
+
+    hour = "2024-01-01 00:00:00"
+    assert _bucket_counts(oid) == [(hour, 1, 1), (hour, 3, 3), (hour, 3, 3)]
+    ts = [reading["ts"].minute for reading in readings_store.iter_readings(oid)]
+    assert ts == list(range(BUCKET_SIZE * 2 + 1))
+
+
+def test_append_readings_only_pushes_into_buckets_with_room():
+    oid = ObjectId()
+    readings_store.insert_reading(oid, _reading(0))
+    readings_store.insert_reading(oid, _reading(1))
+    # A chunk of two does not fit next to the two stored readings
+    readings_store.append_readings({oid: [_reading(2), _reading(3)]})
+    readings_store.append_readings({oid: [_reading(4)]})
+
+    hour = "2024-01-01 00:00:00"
+    assert _bucket_counts(oid) == [(hour, 2, 2), (hour, 3, 3)]
+    assert all(bucket["count"] <= BUCKET_SIZE for bucket in readings_collection.find())
+
+
+def test_update_reading_moves_it_to_the_bucket_of_its_new_hour():
+    oid = ObjectId()
+    first, second = _reading(0), _reading(30)
+    readings_store.insert_bucketed(oid, [first, second])
+
+    previous, updated = readings_store.update_reading(
+        oid, second["_id"], {"ts": datetime.datetime(2024, 1, 1, 5)}
+    )
+    assert previous["ts"].hour == 0 and updated["ts"].hour == 5
+    assert _bucket_counts(oid) == [("2024-01-01 00:00:00", 1, 1), ("2024-01-01 05:00:00", 1, 1)]
+    assert readings_store.find_reading(oid, second["_id"])["ts"].hour == 5
+
+
+def test_deleting_the_last_reading_removes_the_bucket():
+    oid = ObjectId()
+    reading = _reading(0)
+    readings_store.insert_reading(oid, reading)
+
+    assert readings_store.delete_reading(oid, reading["_id"])["_id"] == reading["_id"]
+    assert readings_store.delete_reading(oid, reading["_id"]) is None
+    assert not readings_store.has_readings(oid)
@@ -0,0 +1,112 @@
+import datetime
+
+import pytest
+from bson import ObjectId
+
+from globals import rollups_collection
+import rollups
+
+
+def _rollup(oid, granularity, start):
+    return rollups_collection.find_one(
+        {"station_id": oid, "granularity": granularity, "period_start": start}
+    )
+
+
+def _snapshot(oid):
+    return sorted(
+        (doc["granularity"], str(doc["period_start"]), doc["count"],
+         doc["sum"]["temp_c"], doc["min"]["temp_c"], doc["max"]["temp_c"])
+        for doc in rollups_collection.find({"station_id": oid})
+    )
+
+
+@pytest.fixture
+def station(create_station):
+    return create_station()
+
+
+@pytest.fixture
+def add_reading(client, auth_headers, station):
+    def add(ts, temp_c):
+        response = client.post(f"/weather/{station}/readings",
+                               json={"ts": ts, "temp_c": temp_c}, headers=auth_headers)
+        assert response.status_code == 201, response.json
+        return response.json["reading"]["_id"]
+    return add
+
+
+HOUR_0 = datetime.datetime(2024, 1, 1, 0)
+HOUR_2 = datetime.datetime(2024, 1, 1, 2)
+DAY = datetime.datetime(2024, 1, 1)
+
+
+def test_add_folds_readings_into_every_granularity(station, add_reading):
+    add_reading("2024-01-01T00:10:00", 5)
+    add_reading("2024-01-01T00:20:00", 15)
+    add_reading("2024-01-01T02:00:00", -3)
+
+    oid = ObjectId(station)
+    hour = _rollup(oid, "hour", HOUR_0)
+    assert (hour["count"], hour["sum"]["temp_c"]) == (2, 20)
+    assert (hour["min"]["temp_c"], hour["max"]["temp_c"]) == (5, 15)
+
+    overall = _rollup(oid, "all", None)
+    assert (overall["count"], overall["sum"]["temp_c"]) == (3, 17)
+    assert (overall["min"]["temp_c"], overall["max"]["temp_c"]) == (-3, 15)
+    assert _rollup(oid, "day", DAY)["count"] == 3
+
+
+def test_update_across_hours_moves_the_reading(client, auth_headers, station, add_reading):
+    add_reading("2024-01-01T00:10:00", 5)
+    moved = add_reading("2024-01-01T00:20:00", 30)
+
+    response = client.put(f"/weather/{station}/readings/{moved}",
+                          json={"ts": "2024-01-01T02:30:00", "temp_c": 12},
+                          headers=auth_headers)
+    assert response.status_code == 200
+
+    oid = ObjectId(station)
+    hour_0 = _rollup(oid, "hour", HOUR_0)
+    assert (hour_0["count"], hour_0["sum"]["temp_c"]) == (1, 5)
+    # The old maximum is recomputed, not left behind
+    assert hour_0["max"]["temp_c"] == 5
+
+    hour_2 = _rollup(oid, "hour", HOUR_2)
+    assert (hour_2["count"], hour_2["min"]["temp_c"], hour_2["max"]["temp_c"]) == (1, 12, 12)
+
+    overall = _rollup(oid, "all", None)
+    assert (overall["count"], overall["sum"]["temp_c"]) == (2, 17)
+    assert (overall["min"]["temp_c"], overall["max"]["temp_c"]) == (5, 12)
+
+
+def test_delete_recomputes_extremes_and_drops_empty_periods(client, auth_headers, station,
+                                                            add_reading):
+    add_reading("2024-01-01T00:10:00", 5)
+    hottest = add_reading("2024-01-01T00:20:00", 30)
+    alone = add_reading("2024-01-01T02:00:00", -3)
+
+    assert client.delete(f"/weather/{station}/readings/{hottest}",
+                         headers=auth_headers).status_code == 200
+    oid = ObjectId(station)
+    for granularity, start in (("hour", HOUR_0), ("day", DAY), ("all", None)):
+        assert _rollup(oid, granularity, start)["max"]["temp_c"] == 5
+
+    assert client.delete(f"/weather/{station}/readings/{alone}",
+                         headers=auth_headers).status_code == 200
+    assert _rollup(oid, "hour", HOUR_2) is None
+    overall = _rollup(oid, "all", None)
+    assert (overall["count"], overall["min"]["temp_c"], overall["max"]["temp_c"]) == (1, 5, 5)
+
+
+def test_incremental_rollups_match_a_rebuild(client, auth_headers, station, add_reading):
+    ids = [add_reading(f"2024-01-0{day}T{hour:02d}:00:00", day * 10 + hour)
+           for day in (1, 2) for hour in (0, 5, 5)]
+    client.put(f"/weather/{station}/readings/{ids[1]}",
+               json={"ts": "2024-01-02T07:00:00"}, headers=auth_headers)
+    client.delete(f"/weather/{station}/readings/{ids[4]}", headers=auth_headers)
+
+    oid = ObjectId(station)
+    incremental = _snapshot(oid)
+    rollups.rebuild_station(oid)
+    assert _snapshot(oid) == incremental
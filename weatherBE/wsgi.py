@@ -0,0 +1,10 @@
+# WSGI ENTRY POINT — used by production servers
+#
+#     gunicorn -c gunicorn.conf.py wsgi:app
+#     uwsgi --http :5000 --module wsgi:app --master --processes 4 --lazy-apps
+#
+# Settings come from WEATHER_* environment variables (see config.py).
+
+from app import create_app
+
+app = application = create_app()